@@ -0,0 +1,90 @@
+"""
+放置吞吐基准：在一批大文件上比较原来的逐个 shutil.copy2 与 CopyEngine（内核态复制，1 / N 个线程在途）。
+--dest 指向另一块盘 / NAS 挂载点时才能看出多线程对队列深度的作用；同盘测试主要反映 copy_file_range 的收益。
+每轮开始前丢弃上一轮的目标文件；源文件在页缓存里，结果偏向写入带宽。
+
+    python benchmarks/bench_copy.py --files 200 --size-mb 8 --threads 1 4 8 --dest /mnt/nas/bench
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from photo_organizer.copy_engine import CopyEngine
+
+
+def make_sources(root: Path, files: int, size: int):
+    root.mkdir(parents=True, exist_ok=True)
+    block = os.urandom(1 << 20)
+    for i in range(files):
+        path = root / f"IMG_{i:05d}.jpg"
+        if path.exists() and path.stat().st_size == size:
+            continue
+        with open(path, "wb") as f:
+            for _ in range(size >> 20):
+                f.write(block)
+            f.write(block[:size & ((1 << 20) - 1)])
+
+
+def fresh(dest: Path) -> Path:
+    shutil.rmtree(dest, ignore_errors=True)
+    dest.mkdir(parents=True)
+    return dest
+
+
+def run_copy2(sources, dest: Path) -> float:
+    fresh(dest)
+    t0 = time.perf_counter()
+    for src in sources:
+        shutil.copy2(src, dest / src.name)
+    return time.perf_counter() - t0
+
+
+def run_engine(sources, dest: Path, threads: int):
+    fresh(dest)
+    t0 = time.perf_counter()
+    methods = {}
+    for _, method, err in CopyEngine(threads).run((src, dest / src.name, None) for src in sources):
+        if err is not None:
+            raise err
+        methods[method] = methods.get(method, 0) + 1
+    return time.perf_counter() - t0, methods
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Placement throughput benchmark")
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--size-mb", type=float, default=8.0, help="Size of each file in MiB")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 8], help="CopyEngine thread counts")
+    parser.add_argument("--source", default=None, help="Where source files are generated and reused (default: temp)")
+    parser.add_argument("--dest", default=None, help="Target directory, ideally on another device (default: temp)")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    source = Path(args.source) if args.source else Path(tmp.name) / "src"
+    dest = Path(args.dest) if args.dest else Path(tmp.name) / "dst"
+    size = int(args.size_mb * (1 << 20))
+    make_sources(source, args.files, size)
+    sources = sorted(source.glob("IMG_*.jpg"))[:args.files]
+    total_mb = len(sources) * size / (1 << 20)
+
+    print(f"{len(sources)} files, {total_mb:.0f} MiB → {dest}")
+    print(f"{'method':<28}{'seconds':>10}{'MiB/s':>10}  copy calls")
+    t = run_copy2(sources, dest)
+    print(f"{'shutil.copy2 (legacy)':<28}{t:>10.2f}{total_mb / t:>10.0f}")
+    for threads in args.threads:
+        t, methods = run_engine(sources, dest, threads)
+        label = f"CopyEngine x{threads}"
+        print(f"{label:<28}{t:>10.2f}{total_mb / t:>10.0f}  "
+              + ", ".join(f"{m}={n}" for m, n in sorted(methods.items())))
+
+    shutil.rmtree(dest, ignore_errors=True)
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
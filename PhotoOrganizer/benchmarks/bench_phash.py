@@ -0,0 +1,88 @@
+"""
+感知哈希解码基准：比较全尺寸 RGB 解码（原实现）与降分辨率解码的单张耗时和峰值 RSS。
+每种模式在独立子进程中运行，峰值 RSS 互不干扰。
+
+    python benchmarks/bench_phash.py --width 8000 --height 6000 --count 5
+"""
+import argparse
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+
+def make_images(folder: Path, count: int, size: tuple) -> list:
+    from PIL import Image, ImageDraw, ImageFilter
+    rng = random.Random(0)
+    paths = []
+    for i in range(count):
+        img = Image.new("RGB", size, tuple(rng.randrange(256) for _ in range(3)))
+        draw = ImageDraw.Draw(img)
+        for _ in range(40):
+            x0, y0 = rng.randrange(size[0]), rng.randrange(size[1])
+            draw.ellipse([x0, y0, x0 + rng.randrange(size[0] // 2), y0 + rng.randrange(size[1] // 2)],
+                         fill=tuple(rng.randrange(256) for _ in range(3)))
+        path = folder / f"img_{i}.jpg"
+        img.filter(ImageFilter.GaussianBlur(4)).save(path, quality=90)
+        paths.append(path)
+    return paths
+
+
+def peak_rss_mib() -> float:
+    """
+    峰值 RSS：Linux 下读 /proc/self/status 的 VmHWM（exec 后重新计数）；
+    ru_maxrss 会继承 fork 前父进程的峰值，只作后备。
+    """
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def child(mode: str, paths: list):
+    """子进程：逐张计算 dHash，输出平均耗时（ms）与峰值 RSS（MiB）"""
+    from photo_organizer.digest import perceptual_hash
+    fast = mode == "fast"
+    t0 = time.perf_counter()
+    for p in paths:
+        perceptual_hash(Path(p), fast=fast)
+    per_image = (time.perf_counter() - t0) / len(paths) * 1000
+    print(f"{per_image:.1f} {peak_rss_mib():.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perceptual hash decode benchmark")
+    parser.add_argument("--width", type=int, default=8000)
+    parser.add_argument("--height", type=int, default=6000)
+    parser.add_argument("--count", type=int, default=5)
+    parser.add_argument("--child", choices=["full", "fast"], help=argparse.SUPPRESS)
+    parser.add_argument("paths", nargs="*", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.paths)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_images(Path(tmp), args.count, (args.width, args.height))
+        mp = args.width * args.height / 1e6
+        print(f"{args.count} JPEGs at {args.width}x{args.height} ({mp:.0f} MP)")
+        print(f"{'mode':<8}{'ms/image':>10}{'peak RSS MiB':>14}")
+        for mode in ("full", "fast"):
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", mode, *map(str, paths)],
+                capture_output=True, text=True, check=True,
+            ).stdout.split()
+            print(f"{mode:<8}{float(out[0]):>10.1f}{float(out[1]):>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+整体流程基准：在合成语料（见 corpus.py）上运行 organize_photos（首次运行 / 缓存命中的重复运行），
+记录其返回的分阶段计量（墙钟 / CPU 时间、读写字节数、缓存命中），
+并对 md5sum、perceptual_hash、get_photo_datetime 做单文件微基准。结果写入 JSON，
+用 --compare 与另一次提交的结果逐项对比。
+
+    python benchmarks/bench_pipeline.py --sizes 1000 10000 100000 --json results.json
+    python benchmarks/bench_pipeline.py --sizes 1000 --compare old.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent))
+from corpus import generate_corpus
+from photo_organizer.digest import md5sum, perceptual_hash
+from photo_organizer.metadata import get_photo_datetime
+from photo_organizer.organizer import organize_photos
+
+def run_pipeline(corpus: Path, out_root: Path, **kwargs) -> dict:
+    """运行一次 organize_photos（丢弃输出），返回其分阶段计量（见 stats.RunStats）"""
+    with redirect_stdout(io.StringIO()):
+        stats = organize_photos(corpus, out_root / "out", out_root / "dup", **kwargs)
+    result = stats.to_dict()
+    result["seconds"] = result.pop("wall_s")
+    return result
+
+
+def micro(paths, fn) -> dict:
+    t0 = time.perf_counter()
+    for p in paths:
+        fn(p)
+    dt = time.perf_counter() - t0
+    return {"files": len(paths), "us_per_file": round(dt / max(len(paths), 1) * 1e6, 1)}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def bench_size(count: int, corpus_root: Path, args) -> dict:
+    corpus = corpus_root / f"corpus_{count}"
+    manifest = generate_corpus(corpus, count, (args.width, args.height), args.exif_rate,
+                               args.dup_rate, args.near_rate, seed=args.seed)
+    paths = sorted(corpus.rglob("*.jpg"))
+    sample = paths[:: max(1, len(paths) // args.micro_files)][: args.micro_files]
+    n_bytes = sum(p.stat().st_size for p in sample)
+
+    result = {"files": count, "corpus": manifest, "micro": {
+        "md5sum": micro(sample, md5sum),
+        "perceptual_hash": micro(sample, perceptual_hash),
+        "get_photo_datetime": micro(sample, get_photo_datetime),
+    }}
+    md5 = result["micro"]["md5sum"]
+    md5["mb_per_s"] = round(n_bytes / 1e6 / (md5["us_per_file"] * len(sample) / 1e6), 1)
+
+    out_root = Path(tempfile.mkdtemp(dir=args.work_dir))
+    try:
+        kwargs = dict(workers=args.workers, mode=args.mode)
+        result["cold"] = run_pipeline(corpus, out_root, **kwargs)
+        result["warm"] = run_pipeline(corpus, out_root, **kwargs)
+    finally:
+        shutil.rmtree(out_root)
+    return result
+
+
+def flatten(result: dict, prefix: str = "") -> dict:
+    """嵌套结果展开为 'cold.phases.scan' 形式的数值表，便于对比"""
+    flat = {}
+    for key, value in result.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(new: dict, old: dict):
+    old_by_size = {r["files"]: r for r in old["results"]}
+    print(f"comparing against {old['meta'].get('revision')} ({old['meta'].get('created')})")
+    for res in new["results"]:
+        prev = old_by_size.get(res["files"])
+        if prev is None:
+            continue
+        a, b = flatten(prev), flatten(res)
+        print(f"\n== {res['files']} files ==")
+        print(f"{'metric':<44}{'old':>12}{'new':>12}{'ratio':>8}")
+        for key in sorted(b):
+            if key.startswith("corpus.") or key not in a or not a[key]:
+                continue
+            if key.endswith(("seconds", "wall_s", "cpu_s", "us_per_file", "files_per_s", "mb_per_s")):
+                print(f"{key:<44}{a[key]:>12}{b[key]:>12}{b[key] / a[key]:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Organizer pipeline benchmark on a synthetic corpus")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="Corpus sizes")
+    parser.add_argument("--corpus-root", default=None,
+                        help="Where corpora are generated and reused between runs (default: a temp dir)")
+    parser.add_argument("--work-dir", default=None, help="Where output/duplicates are written (default: temp)")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--exif-rate", type=float, default=0.8)
+    parser.add_argument("--dup-rate", type=float, default=0.05)
+    parser.add_argument("--near-rate", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--mode", default="copy", help="Placement mode passed to organize_photos")
+    parser.add_argument("--micro-files", type=int, default=200, help="Files sampled for the micro benchmarks")
+    parser.add_argument("--json", default="bench_pipeline.json", help="Write results here")
+    parser.add_argument("--compare", default=None, help="Previous results JSON to compare against")
+    args = parser.parse_args()
+
+    tmp = None
+    if args.corpus_root:
+        corpus_root = Path(args.corpus_root)
+    else:
+        tmp = tempfile.TemporaryDirectory()
+        corpus_root = Path(tmp.name)
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "workers": args.workers,
+            "mode": args.mode,
+        },
+        "results": [],
+    }
+    for count in args.sizes:
+        res = bench_size(count, corpus_root, args)
+        report["results"].append(res)
+        phases = ", ".join(f"{k}={v['wall_s']:.2f}s" for k, v in res["cold"]["phases"].items())
+        print(f"{count:>8} files: cold {res['cold']['seconds']:.2f}s ({res['cold']['files_per_s']:.0f}/s; {phases}), "
+              f"warm {res['warm']['seconds']:.2f}s")
+
+    with open(args.json, "w") as f:
+        json.dump(report, f, indent=1)
+    print(f"results written to {args.json}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+目录遍历基准：在合成目录树上比较原 iter_images（rglob + 每文件 resolve 判断排除 + 再次 stat）
+与 os.scandir 剪枝遍历（串行 / 多线程）的耗时。目录树中一部分条目位于被排除的 output 子树内。
+
+    python benchmarks/bench_walk.py --entries 1000000 --threads 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from photo_organizer.record import PhotoRecord
+from photo_organizer.walker import walk_images, IMAGE_EXTS
+
+
+def make_tree(root: Path, entries: int, per_dir: int, excluded_fraction: float):
+    """每个叶目录 per_dir 个文件（9 成图片、1 成其他），按 两级目录 组织；前一部分放进 output/"""
+    n_dirs = max(1, entries // (per_dir + 1))
+    n_excluded = int(n_dirs * excluded_fraction)
+    for d in range(n_dirs):
+        base = root / "output" if d < n_excluded else root / "photos"
+        folder = base / f"{d // 100:04d}" / f"{d % 100:02d}"
+        folder.mkdir(parents=True, exist_ok=True)
+        for i in range(per_dir):
+            name = f"IMG_{i:05d}.jpg" if i % 10 else f"notes_{i:05d}.txt"
+            os.close(os.open(folder / name, os.O_CREAT | os.O_WRONLY, 0o644))
+
+
+def legacy_scan(input_dir: Path, exclude):
+    """改造前：rglob 遍历全部条目（含被排除子树），每个文件 resolve 判断排除，之后 PhotoRecord 再 stat 一次"""
+    def is_under(child, parent):
+        try:
+            child.resolve().relative_to(parent.resolve())
+            return True
+        except Exception:
+            return False
+
+    exclude = [p.resolve() for p in exclude]
+    records = []
+    for p in input_dir.rglob("*"):
+        if not p.is_file() or p.suffix.lower() not in IMAGE_EXTS:
+            continue
+        if any(is_under(p, ex) for ex in exclude):
+            continue
+        records.append(PhotoRecord(p))
+    return records
+
+
+def walker_scan(input_dir: Path, exclude, threads: int):
+    return [PhotoRecord(p, st) for p, st in walk_images(input_dir, IMAGE_EXTS, exclude, threads)]
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    n = len(fn(*args))
+    return n, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Directory walker benchmark")
+    parser.add_argument("--entries", type=int, default=1_000_000, help="Approximate number of files + dirs")
+    parser.add_argument("--per-dir", type=int, default=200, help="Files per leaf directory")
+    parser.add_argument("--excluded-fraction", type=float, default=0.3,
+                        help="Fraction of directories placed under the excluded output/ subtree")
+    parser.add_argument("--threads", type=int, default=8, help="Threads for the parallel walker")
+    parser.add_argument("--root", default=None, help="Reuse / create the tree here instead of a temp dir")
+    parser.add_argument("--skip-legacy", action="store_true", help="Skip the (slow) rglob baseline")
+    args = parser.parse_args()
+
+    tmp = None
+    if args.root:
+        root = Path(args.root)
+    else:
+        tmp = tempfile.TemporaryDirectory()
+        root = Path(tmp.name)
+    if not any(root.iterdir()):
+        t0 = time.perf_counter()
+        make_tree(root, args.entries, args.per_dir, args.excluded_fraction)
+        print(f"built tree with ~{args.entries} entries in {time.perf_counter() - t0:.1f}s")
+
+    exclude = [root / "output", root / "duplicates"]
+    print(f"{'method':<28}{'images':>10}{'seconds':>10}")
+    if not args.skip_legacy:
+        n, t = timed(legacy_scan, root, exclude)
+        print(f"{'rglob + resolve (legacy)':<28}{n:>10}{t:>10.2f}")
+    n, t = timed(walker_scan, root, exclude, 1)
+    print(f"{'scandir walker':<28}{n:>10}{t:>10.2f}")
+    n, t = timed(walker_scan, root, exclude, args.threads)
+    print(f"{f'scandir walker x{args.threads}':<28}{n:>10}{t:>10.2f}")
+
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
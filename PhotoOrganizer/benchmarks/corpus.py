@@ -0,0 +1,139 @@
+"""
+可复现的合成照片语料：同样的参数与 seed 总是生成同样的文件（内容、文件名、mtime）。
+
+- 原始图片：随机低频色块放大 + 少量噪声（dHash 各不相同，JPEG 体积接近真实照片），
+  按 DCIM/100XXXXX 每目录 per_dir 张组织；
+- exif_rate：带 EXIF DateTimeOriginal 的比例，其余只能退回文件时间；
+- dup_rate：精确重复（字节相同的副本，放在 backup/ 下）占总数的比例；
+- near_rate：近似重复（降质量重存或缩小到一半，放在 edited/ 下）占总数的比例。
+
+    python benchmarks/corpus.py --root /tmp/corpus --count 10000
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+MANIFEST = "corpus.json"
+
+
+def _exif_bytes(dt: datetime) -> bytes:
+    import piexif
+    stamp = dt.strftime("%Y:%m:%d %H:%M:%S").encode()
+    return piexif.dump({"0th": {}, "Exif": {piexif.ExifIFD.DateTimeOriginal: stamp}, "1st": {}, "GPS": {}})
+
+
+def _make_image(rng: random.Random, size: tuple):
+    import numpy as np
+    from PIL import Image
+    nrng = np.random.default_rng(rng.randrange(1 << 32))
+    base = Image.fromarray(nrng.integers(0, 256, (6, 8, 3), dtype=np.uint8), "RGB")
+    img = base.resize(size, Image.BILINEAR)
+    noise = nrng.integers(-12, 13, (size[1], size[0], 3), dtype=np.int16)
+    arr = np.clip(np.asarray(img, dtype=np.int16) + noise, 0, 255).astype(np.uint8)
+    return Image.fromarray(arr, "RGB")
+
+
+def generate_corpus(root: Path, count: int, resolution=(640, 480), exif_rate: float = 0.8,
+                    dup_rate: float = 0.05, near_rate: float = 0.05, per_dir: int = 500,
+                    quality: int = 88, seed: int = 0) -> dict:
+    """
+    在 root 下生成 count 个文件，返回清单（参数 + 各类文件数）。
+    root 下已有参数相同的清单时直接复用，不再重新生成。
+    """
+    params = {"count": count, "resolution": list(resolution), "exif_rate": exif_rate, "dup_rate": dup_rate,
+              "near_rate": near_rate, "per_dir": per_dir, "quality": quality, "seed": seed}
+    manifest_path = root / MANIFEST
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text())
+        if manifest.get("params") == params:
+            return manifest
+        shutil.rmtree(root)
+    root.mkdir(parents=True, exist_ok=True)
+
+    rng = random.Random(seed)
+    n_dup = int(count * dup_rate)
+    n_near = int(count * near_rate)
+    n_orig = count - n_dup - n_near
+    epoch = datetime(2015, 1, 1)
+    t0 = time.perf_counter()
+
+    originals = []
+    n_exif = 0
+    for i in range(n_orig):
+        folder = root / "DCIM" / f"{100 + i // per_dir}PHOTO"
+        folder.mkdir(parents=True, exist_ok=True)
+        path = folder / f"IMG_{i:06d}.jpg"
+        taken = epoch + timedelta(seconds=rng.randrange(10 * 365 * 86400))
+        img = _make_image(rng, tuple(resolution))
+        if rng.random() < exif_rate:
+            img.save(path, quality=quality, exif=_exif_bytes(taken))
+            n_exif += 1
+        else:
+            img.save(path, quality=quality)
+        ts = taken.timestamp()
+        os.utime(path, (ts, ts))
+        originals.append((path, ts))
+
+    # 精确重复：字节相同的副本（保留 mtime）
+    for i in range(n_dup):
+        src, _ = originals[rng.randrange(n_orig)]
+        folder = root / "backup" / f"{i // per_dir:03d}"
+        folder.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(src, folder / f"copy_{i:06d}_{src.name}")
+
+    # 近似重复：从磁盘重新解码原图后降质量重存，或缩小到一半（不在内存中保留原图）
+    from PIL import Image
+    n_resized = 0
+    for i in range(n_near):
+        src, ts = originals[rng.randrange(n_orig)]
+        with Image.open(src) as im:
+            img = im.convert("RGB")
+        folder = root / "edited" / f"{i // per_dir:03d}"
+        folder.mkdir(parents=True, exist_ok=True)
+        path = folder / f"edit_{i:06d}_{src.name}"
+        if rng.random() < 0.5:
+            img.resize((img.width // 2, img.height // 2)).save(path, quality=quality)
+            n_resized += 1
+        else:
+            img.save(path, quality=max(quality - 30, 30))
+        os.utime(path, (ts + 60, ts + 60))
+
+    manifest = {
+        "params": params,
+        "originals": n_orig,
+        "with_exif": n_exif,
+        "exact_duplicates": n_dup,
+        "near_duplicates": n_near,
+        "resized": n_resized,
+        "bytes": sum(p.stat().st_size for p in root.rglob("*.jpg")),
+        "generated_seconds": round(time.perf_counter() - t0, 2),
+    }
+    manifest_path.write_text(json.dumps(manifest, indent=1))
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a reproducible synthetic photo corpus")
+    parser.add_argument("--root", required=True, help="Target directory")
+    parser.add_argument("--count", type=int, default=1000, help="Total number of files")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--exif-rate", type=float, default=0.8, help="Fraction of originals with EXIF DateTimeOriginal")
+    parser.add_argument("--dup-rate", type=float, default=0.05, help="Fraction of byte-identical copies")
+    parser.add_argument("--near-rate", type=float, default=0.05, help="Fraction of re-encoded / resized copies")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    manifest = generate_corpus(Path(args.root), args.count, (args.width, args.height), args.exif_rate,
+                               args.dup_rate, args.near_rate, seed=args.seed)
+    json.dump(manifest, sys.stdout, indent=1)
+    print()
+
+
+if __name__ == "__main__":
+    main()
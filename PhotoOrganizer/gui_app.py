@@ -1,9 +1,10 @@
 # gui_app.py
 import sys
+from collections import deque
 from pathlib import Path
 from PySide6 import QtCore, QtWidgets
 from PySide6.QtCore import Signal, QObject, QThread
-from PySide6.QtGui import QTextCursor, QPixmap
+from PySide6.QtGui import QPixmap
 
 ROOT = Path(__file__).resolve().parent
 SRC = ROOT / "src"
@@ -11,15 +12,92 @@ if str(SRC) not in sys.path:
     sys.path.insert(0, str(SRC))
 
 from photo_organizer.organizer import organize_photos
+from photo_organizer.events import subscribe
+from photo_organizer.groups import GroupStore, GROUP_KINDS
+from photo_organizer.thumbnails import ThumbnailCache, default_cache_dir
+
+MAX_LOG_LINES = 5000      # 日志窗口最多保留的行数
+FLUSH_INTERVAL_MS = 50    # 事件合并后刷新到界面的间隔（约 20 帧/秒）
+
+
+class EventBatcher(QObject):
+    """
+    工作线程 → 界面的事件合并器：
+    - sink / write 在工作线程中调用，只往 deque 里追加一行、记下最新进度，不发任何 Qt 信号；
+    - GUI 线程中的 QTimer 每 FLUSH_INTERVAL_MS 取走全部积压，合成一次 log_ready，进度只发最新值；
+    - 积压超过 MAX_LOG_LINES 时丢弃最旧的行（日志窗口本来也只保留这么多），刷新时提示丢弃了多少行。
+    无论处理多少文件，界面每帧最多处理一次日志追加和一次进度更新。
+    """
+    log_ready = Signal(str)
+    progress_ready = Signal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._lines = deque(maxlen=MAX_LOG_LINES)
+        self._progress = None
+        self._dropped = 0        # 仅工作线程写
+        self._dropped_shown = 0  # 仅 GUI 线程写
+        self._timer = QtCore.QTimer(self)
+        self._timer.setInterval(FLUSH_INTERVAL_MS)
+        self._timer.timeout.connect(self.flush)
+
+    # ---------- 工作线程侧 ----------
+
+    def sink(self, event):
+        """organizer 事件订阅者（见 photo_organizer.events.subscribe）"""
+        if event.kind == "progress":
+            self._progress = event.value
+        else:
+            self._append(event.message)
+
+    def write(self, text: str):
+        """兼作 stdout / stderr：未经事件接口的输出（第三方库等）也走同一条合并通道"""
+        for line in text.splitlines():
+            if line:
+                self._append(line)
+
+    def _append(self, line: str):
+        if len(self._lines) == MAX_LOG_LINES:
+            self._dropped += 1
+        self._lines.append(line)
 
+    # ---------- GUI 线程侧 ----------
+
+    def start(self):
+        self._timer.start()
+
+    def stop(self):
+        self._timer.stop()
+        self.flush()
+
+    @QtCore.Slot()
+    def flush(self):
+        progress, self._progress = self._progress, None
+        if progress is not None:
+            self.progress_ready.emit(progress)
+        lines = []
+        try:
+            while True:
+                lines.append(self._lines.popleft())
+        except IndexError:
+            pass
+        dropped = self._dropped - self._dropped_shown
+        self._dropped_shown += dropped
+        if dropped:
+            lines.insert(0, f"... {dropped} lines omitted ...")
+        if lines:
+            self.log_ready.emit("\n".join(lines))
 
-class EmittingStream(QObject):
-    text_emitted = Signal(str)
+
+class _StreamAdapter:
+    """把 sys.stdout / sys.stderr 的写入转给 EventBatcher"""
+
+    def __init__(self, batcher: EventBatcher):
+        self.batcher = batcher
 
     def write(self, text: str):
         if text:
-            for line in text.splitlines(True):
-                self.text_emitted.emit(line)
+            self.batcher.write(text)
 
     def flush(self):
         pass
@@ -27,36 +105,28 @@ class EmittingStream(QObject):
 
 # --- 后台工作线程 ---
 class OrganizeWorker(QThread):
-    log = Signal(str)
     done = Signal(int)     # 0=success, 1=error
     error = Signal(str)
-    progress = Signal(int)
 
-    review_ready = Signal(list)  # 处理结束后的分组数据
+    review_ready = Signal(object)  # 处理结束后的分组数据（GroupStore）
 
-    def __init__(self, input_dir: Path, output_dir: Path, dup_dir: Path, parent=None):
+    def __init__(self, input_dir: Path, output_dir: Path, dup_dir: Path, batcher: EventBatcher, parent=None):
         super().__init__(parent)
         self.input_dir = input_dir
         self.output_dir = output_dir
         self.dup_dir = dup_dir
+        self.batcher = batcher  # 日志与进度经事件接口交给合并器，不再逐行发信号
 
     def run(self):
         import sys as _sys
         # 备份 stdout/stderr
         old_stdout, old_stderr = _sys.stdout, _sys.stderr
-        out_stream, err_stream = EmittingStream(), EmittingStream()
-        out_stream.text_emitted.connect(self.log.emit)
-        err_stream.text_emitted.connect(self.log.emit)
 
         try:
-            _sys.stdout, _sys.stderr = out_stream, err_stream
-            review_groups = organize_photos(
-                self.input_dir, self.output_dir, self.dup_dir,
-                progress_callback=lambda *args: self.progress.emit(args[0])
-            )
-            if review_groups is None:
-                review_groups = []
-            self.review_ready.emit(review_groups)
+            _sys.stdout = _sys.stderr = _StreamAdapter(self.batcher)
+            with subscribe(self.batcher.sink):
+                stats = organize_photos(self.input_dir, self.output_dir, self.dup_dir)
+            self.review_ready.emit(stats.review_groups)
             self.done.emit(0)
         except Exception as e:
             # 直接把异常消息打到日志
@@ -85,8 +155,9 @@ class MainWindow(QtWidgets.QMainWindow):
         self.review_btn.setEnabled(False)
         self.progress = QtWidgets.QProgressBar()
         self.progress.setTextVisible(False)
-        self.log_view = QtWidgets.QTextEdit()
+        self.log_view = QtWidgets.QPlainTextEdit()
         self.log_view.setReadOnly(True)
+        self.log_view.setMaximumBlockCount(MAX_LOG_LINES)
         self.status_label = QtWidgets.QLabel("Ready")
 
         # 布局
@@ -133,7 +204,14 @@ class MainWindow(QtWidgets.QMainWindow):
 
         self.worker = None  # type: OrganizeWorker | None
 
-        self.last_groups = []
+        # 工作线程的日志 / 进度按帧合并后再刷新到界面
+        self.batcher = EventBatcher(self)
+        self.batcher.log_ready.connect(self.append_log)
+        self.batcher.progress_ready.connect(self.on_progress)
+
+        self.last_groups = GroupStore()
+        # 回顾对话框的缩略图缓存：跨对话框复用，磁盘缓存跨会话复用
+        self.thumbs = ThumbnailCache(default_cache_dir())
 
     # 选择文件夹
     def pick_dir(self, line_edit: QtWidgets.QLineEdit):
@@ -184,22 +262,20 @@ class MainWindow(QtWidgets.QMainWindow):
         self.progress.setValue(0)       # 进度归零
         self.progress.setFormat("%p%")  # 显示“xx%”
         self.status_label.setText("Running...")
-        self.log_view.append("\n=== Start organizing ===\n")
+        self.log_view.appendPlainText("\n=== Start organizing ===\n")
 
         # 后台线程
-        self.worker = OrganizeWorker(in_dir, out_dir, dup_dir, parent=self)
+        self.worker = OrganizeWorker(in_dir, out_dir, dup_dir, self.batcher, parent=self)
 
-        self.worker.log.connect(self.append_log)
         self.worker.done.connect(self.on_done)
         self.worker.error.connect(self.on_error)
 
-        self.worker.progress.connect(self.on_progress) # 绑定进度信号
-
         self.worker.finished.connect(self._on_worker_finished)
         self.worker.finished.connect(self.worker.deleteLater)
 
         self.worker.review_ready.connect(self.on_review_ready)
 
+        self.batcher.start()
         self.worker.start()
     
     def _on_worker_finished(self):
@@ -208,9 +284,7 @@ class MainWindow(QtWidgets.QMainWindow):
 
     @QtCore.Slot(str)
     def append_log(self, text: str):
-        self.log_view.moveCursor(QTextCursor.End)
-        self.log_view.insertPlainText(text)
-        self.log_view.moveCursor(QTextCursor.End)
+        self.log_view.appendPlainText(text)
     
     @QtCore.Slot(int)
     def on_progress(self, value: int):
@@ -218,55 +292,126 @@ class MainWindow(QtWidgets.QMainWindow):
 
     @QtCore.Slot(int)
     def on_done(self, code: int):
+        self.batcher.stop()  # 先把积压的日志刷完
         self.progress.setRange(0, 1)  # 停止旋转
         self.run_btn.setEnabled(True)
         if code == 0:
             self.status_label.setText("Completed")
-            self.log_view.append("\n=== Completed ===")
+            self.log_view.appendPlainText("\n=== Completed ===")
         else:
             self.status_label.setText("Finished with errors")
-            self.log_view.append("\n=== Finished with errors ===")
+            self.log_view.appendPlainText("\n=== Finished with errors ===")
         #self.worker = None
     
-    @QtCore.Slot(list)
-    def on_review_ready(self, groups: list):
+    @QtCore.Slot(object)
+    def on_review_ready(self, groups: GroupStore):
         # 处理完成后收到分组数据，弹出查看对话框
+        self.batcher.flush()  # 先显示积压的日志（含 SUMMARY），保持顺序
         self.last_groups = groups
         if groups:
-            self.log_view.append(f"\n{len(groups)} duplicate groups detected."
-                                 f"\nClick 'Review Duplicates' to inspect.")
+            self.log_view.appendPlainText(f"\n{len(groups)} duplicate groups detected."
+                                          f"\nClick 'Review Duplicates' to inspect.")
             self.review_btn.setEnabled(True)  # 🆕 启用按钮
         else:
-            self.log_view.append("\nNo duplicates found.")
+            self.log_view.appendPlainText("\nNo duplicates found.")
             self.review_btn.setEnabled(False)
 
     def open_review(self):
         if not self.last_groups:
             QtWidgets.QMessageBox.information(self, "No Duplicates", "No duplicate groups were found.")
             return
-        dlg = ReviewDialog(self.last_groups, self)
+        dlg = ReviewDialog(self.last_groups, self.thumbs, self)
         dlg.exec()
 
     @QtCore.Slot(str)
     def on_error(self, msg: str):
-        self.log_view.append(f"\n[ERROR] {msg}")
+        self.log_view.appendPlainText(f"\n[ERROR] {msg}")
+
+    def closeEvent(self, event):
+        # 关闭窗口时停掉缩略图的后台生成线程（摘要缓存由 organize_photos 自行关闭）
+        self.thumbs.close()
+        super().closeEvent(event)
+
+class GroupListModel(QtCore.QAbstractListModel):
+    """
+    回顾分组的惰性列表模型：数据留在 GroupStore 中，视图滚动到底部时才通过 fetchMore 按批加入行，
+    每行的显示文本在 data() 中按需生成。打开对话框的开销与分组数量无关。
+    """
+    FETCH_BATCH = 256
+
+    def __init__(self, store: GroupStore, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self._rows = store.indices()  # 当前过滤下的分组序号（不过滤时为 range，不占内存）
+        self._loaded = 0
+
+    def set_kind(self, kind=None):
+        """按种类过滤（None = 全部）"""
+        self.beginResetModel()
+        self._rows = self.store.indices(kind)
+        self._loaded = 0
+        self.endResetModel()
+
+    def total(self) -> int:
+        return len(self._rows)
+
+    def group_index(self, row: int) -> int:
+        return self._rows[row]
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else self._loaded
+
+    def canFetchMore(self, parent=QtCore.QModelIndex()):
+        return not parent.isValid() and self._loaded < len(self._rows)
+
+    def fetchMore(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return
+        n = min(self.FETCH_BATCH, len(self._rows) - self._loaded)
+        if n <= 0:
+            return
+        self.beginInsertRows(QtCore.QModelIndex(), self._loaded, self._loaded + n - 1)
+        self._loaded += n
+        self.endInsertRows()
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self._loaded:
+            return None
+        i = self._rows[index.row()]
+        if role == QtCore.Qt.DisplayRole:
+            return f"[{self.store.kind(i)}] {Path(self.store.keep(i)).name}"
+        if role == QtCore.Qt.ToolTipRole:
+            return self.store.keep(i)
+        if role == QtCore.Qt.UserRole:
+            return i
+        return None
+
 
 class ReviewDialog(QtWidgets.QDialog):
-    def __init__(self, groups: list, parent=None):
+    PREFETCH_GROUPS = 2  # 前后各预取几组
+
+    def __init__(self, groups: GroupStore, thumbs: ThumbnailCache, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Duplicates Review")
         self.resize(1000, 680)
-        self.groups = groups
-        self.current_group_index = 0
+        self.store = groups
+        self.thumbs = thumbs
+        self.current_row = -1          # 当前分组在（过滤后）列表中的行
         self.current_dupe_index = 0
 
-        # 左侧：分组列表
-        self.list_groups = QtWidgets.QListWidget()
-        for g in self.groups:
-            kind = g.get("kind", "?")
-            keep = Path(g.get("keep", "")).name
-            item = QtWidgets.QListWidgetItem(f"[{kind}] {keep}")
-            self.list_groups.addItem(item)
+        # 左侧：种类过滤 + 分组列表（惰性模型，见 GroupListModel）
+        self.kind_filter = QtWidgets.QComboBox()
+        counts = self.store.counts()
+        self.kind_filter.addItem(f"All ({len(self.store)})", None)
+        for kind in GROUP_KINDS:
+            self.kind_filter.addItem(f"{kind} ({counts[kind]})", kind)
+        self.model = GroupListModel(self.store, self)
+        self.list_groups = QtWidgets.QListView()
+        self.list_groups.setUniformItemSizes(True)
+        self.list_groups.setModel(self.model)
+        left_col_list = QtWidgets.QVBoxLayout()
+        left_col_list.addWidget(self.kind_filter)
+        left_col_list.addWidget(self.list_groups, 1)
 
         # 右侧：图片显示（保留图 vs 重复图）
         self.lbl_keep = QtWidgets.QLabel("KEEP")
@@ -275,7 +420,6 @@ class ReviewDialog(QtWidgets.QDialog):
             lbl.setAlignment(QtCore.Qt.AlignCenter)
             lbl.setMinimumSize(400, 300)
             lbl.setFrameShape(QtWidgets.QFrame.Box)
-            lbl.setScaledContents(True)
 
         # 右侧控制区
         self.info_label = QtWidgets.QLabel("")
@@ -319,37 +463,73 @@ class ReviewDialog(QtWidgets.QDialog):
 
         # 总体布局
         main = QtWidgets.QHBoxLayout(self)
-        main.addWidget(self.list_groups, 1)
+        main.addLayout(left_col_list, 1)
         right_widget = QtWidgets.QWidget()
         right_widget.setLayout(right_layout)
         main.addWidget(right_widget, 3)
 
         # 信号
-        self.list_groups.currentRowChanged.connect(self.on_group_changed)
+        self.list_groups.selectionModel().currentRowChanged.connect(
+            lambda current, previous: self.on_group_changed(current.row()))
+        self.kind_filter.currentIndexChanged.connect(self.on_filter_changed)
         self.btn_prev.clicked.connect(self.prev_dupe)
         self.btn_next.clicked.connect(self.next_dupe)
         self.btn_close.clicked.connect(self.accept)
 
         # 初始化
-        if self.groups:
-            self.list_groups.setCurrentRow(0)
+        self.select_row(0)
 
     def load_pix(self, path: str, target_label: QtWidgets.QLabel):
+        # 显示缩略图而不是原图：GUI 线程中只解码几百像素的 JPEG（多数已由后台预取到内存）
         p = Path(path)
-        if p.exists():
-            #pix = QtWidgets.QPixmap(str(p))
-            pix = QPixmap(str(p))
-            # 简单缩放适配
-            target_label.setPixmap(pix)
-        else:
+        if not p.exists():
             target_label.setText(f"Missing:\n{path}")
+            return
+        pix = QPixmap()
+        try:
+            pix.loadFromData(self.thumbs.get(p), "JPEG")
+        except Exception as e:
+            target_label.setText(f"Cannot load:\n{path}\n{e}")
+            return
+        target_label.setPixmap(pix.scaled(target_label.size(), QtCore.Qt.KeepAspectRatio,
+                                          QtCore.Qt.SmoothTransformation))
+
+    def prefetch_around(self):
+        """后台预取当前组前后各 PREFETCH_GROUPS 组的全部图片（近的组先提交）"""
+        paths = []
+        for offset in range(0, self.PREFETCH_GROUPS + 1):
+            for row in {self.current_row + offset, self.current_row - offset}:
+                if 0 <= row < self.model.total():
+                    i = self.model.group_index(row)
+                    paths.append(Path(self.store.keep(i)))
+                    paths.extend(Path(d) for d in self.store.dupes(i))
+        self.thumbs.prefetch(paths)
+
+    def select_row(self, row: int):
+        if self.model.canFetchMore():
+            self.model.fetchMore()
+        if row < self.model.rowCount():
+            self.list_groups.setCurrentIndex(self.model.index(row))
+        else:
+            self.on_group_changed(-1)
+
+    def on_filter_changed(self, _index: int):
+        self.model.set_kind(self.kind_filter.currentData())
+        self.select_row(0)
+
+    def current_group(self) -> int:
+        return self.model.group_index(self.current_row)
 
     def refresh_view(self):
-        if not self.groups:
+        if self.current_row < 0:
+            self.lbl_keep.setText("KEEP")
+            self.lbl_dupe.setText("DUPE")
+            self.info_label.setText("No groups")
             return
-        g = self.groups[self.current_group_index]
-        keep_path = g.get("keep", "")
-        dupes = g.get("dupes", []) or []
+        i = self.current_group()
+        keep_path = self.store.keep(i)
+        dupes = self.store.dupes(i)
+        position = f"Group {self.current_row+1}/{self.model.total()}"
         # 保留图
         self.load_pix(keep_path, self.lbl_keep)
         # 当前重复图
@@ -357,36 +537,33 @@ class ReviewDialog(QtWidgets.QDialog):
             di = max(0, min(self.current_dupe_index, len(dupes)-1))
             self.current_dupe_index = di
             self.load_pix(dupes[di], self.lbl_dupe)
-            self.info_label.setText(f"Group {self.current_group_index+1}/{len(self.groups)}  •  Dupe {di+1}/{len(dupes)}")
+            self.info_label.setText(f"{position}  •  Dupe {di+1}/{len(dupes)}")
         else:
             self.lbl_dupe.setText("No duplicates")
-            self.info_label.setText(f"Group {self.current_group_index+1}/{len(self.groups)}  •  No dupes")
+            self.info_label.setText(f"{position}  •  No dupes")
+        self.prefetch_around()
 
     def on_group_changed(self, row: int):
-        if row < 0:
-            return
-        self.current_group_index = row
+        self.current_row = row
         self.current_dupe_index = 0
         self.refresh_view()
 
     def prev_dupe(self):
-        if not self.groups:
+        if self.current_row < 0:
             return
-        g = self.groups[self.current_group_index]
-        dupes = g.get("dupes", []) or []
-        if not dupes:
+        n = self.store.n_dupes(self.current_group())
+        if not n:
             return
-        self.current_dupe_index = (self.current_dupe_index - 1) % len(dupes)
+        self.current_dupe_index = (self.current_dupe_index - 1) % n
         self.refresh_view()
 
     def next_dupe(self):
-        if not self.groups:
+        if self.current_row < 0:
             return
-        g = self.groups[self.current_group_index]
-        dupes = g.get("dupes", []) or []
-        if not dupes:
+        n = self.store.n_dupes(self.current_group())
+        if not n:
             return
-        self.current_dupe_index = (self.current_dupe_index + 1) % len(dupes)
+        self.current_dupe_index = (self.current_dupe_index + 1) % n
         self.refresh_view()
 
 
@@ -1,9 +1,32 @@
 import argparse
 import sys
+from contextlib import contextmanager
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
-from photo_organizer.organizer import organize_photos
+from photo_organizer.organizer import organize_photos, plan_photos
+from photo_organizer.plan import OrganizePlan, apply_plan, print_summary
+from photo_organizer.streaming import organize_streaming
+from photo_organizer.watch import watch_photos
+from photo_organizer.shard import build_shard, merge_shards, default_shard_cache
+from photo_organizer.cache import DigestCache, CACHE_FILENAME
+from photo_organizer.digest import DEFAULT_ALGO, SUPPORTED_ALGOS, CONFIRM_METHODS, CONFIRM_DISTANCE
+from photo_organizer.placement import DEFAULT_MODE, PLACEMENT_MODES
+from photo_organizer.copy_engine import DEFAULT_COPY_THREADS
+from photo_organizer.stats import RunStats
+from photo_organizer.events import emit, subscribe, text_sink, json_sink
+
+def report_stats(stats: RunStats, args):
+    """--stats-json / --profile：打印各阶段计量并按需写出 JSON"""
+    if not (args.stats_json or args.profile):
+        return
+    stats.describe()
+    if args.stats_json:
+        stats.save(Path(args.stats_json))
+        emit("info", f"[STATS] written to {args.stats_json}")
+    if args.profile:
+        emit("info", f"[STATS] profiles written to {args.profile}/<phase>.pstats")
+
 
 def main():
     parser = argparse.ArgumentParser(description=(
@@ -12,18 +35,213 @@ def main():
         "detect visual duplicates via perceptual hash, "
         "and rename files with structured filenames."
     ))
-    parser.add_argument("--input", required=True, help="Path to input folder with images")
-    parser.add_argument("--output", required=True, help="Path to output folder for organized photos")
-    parser.add_argument("--duplicates", required=True, help="Path to folder to store duplicates")
+    parser.add_argument("--input", help="Path to input folder with images")
+    parser.add_argument("--output", help="Path to output folder for organized photos")
+    parser.add_argument("--duplicates", help="Path to folder to store duplicates")
+    parser.add_argument("--cache", default=None,
+                        help=f"Path to the digest cache (default: <output>/{CACHE_FILENAME})")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the persistent digest cache")
+    parser.add_argument("--clear-cache", action="store_true", help="Invalidate all cache entries before running")
+    parser.add_argument("--compact-cache", action="store_true",
+                        help="Drop entries for missing/changed files and vacuum the cache after running")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes for hashing (default: 1 = serial)")
+    parser.add_argument("--hash", default=DEFAULT_ALGO, choices=SUPPORTED_ALGOS,
+                        help=f"Digest algorithm for exact duplicate detection (default: {DEFAULT_ALGO})")
+    parser.add_argument("--visual-distance", type=int, default=0,
+                        help="Max Hamming distance between dHashes to count as visual duplicates (default: 0 = identical)")
+    parser.add_argument("--visual-confirm", default=None, choices=CONFIRM_METHODS,
+                        help="Use dHash only to find candidate visual duplicates and confirm each candidate "
+                             "with this more expensive hash plus aspect ratio; unique images are never re-hashed. "
+                             "It can only split dHash groups, never merge images the dHash did not pair, so it "
+                             "trades recall for precision: it may find fewer visual duplicates (batch mode only)")
+    parser.add_argument("--confirm-distance", type=int, default=CONFIRM_DISTANCE,
+                        help=f"Max Hamming distance of the --visual-confirm hash (default: {CONFIRM_DISTANCE})")
+    parser.add_argument("--mode", default=DEFAULT_MODE, choices=PLACEMENT_MODES,
+                        help="How files are placed into output/duplicates: copy, hardlink, reflink "
+                             "(copy-on-write clone, falls back to copy) or move (default: copy)")
+    parser.add_argument("--copy-threads", type=int, default=DEFAULT_COPY_THREADS,
+                        help="Placements kept in flight at once, using in-kernel copy_file_range/sendfile; "
+                             "raise for SSD arrays and NAS targets (default: 1 = one at a time)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Streaming mode: scan, hash and place concurrently so output appears immediately "
+                             "(--workers then sets the number of preprocessing threads)")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and organize new photos as they land in --input, "
+                             "processing only the new files in each batch (stop with Ctrl+C)")
+    parser.add_argument("--watch-interval", type=float, default=2.0, metavar="SECONDS",
+                        help="Seconds between scans of --input in watch mode (default: 2)")
+    parser.add_argument("--settle", type=float, default=2.0, metavar="SECONDS",
+                        help="In watch mode, a file must keep the same size and mtime for this long "
+                             "before it is processed, so files still being copied are skipped (default: 2)")
+    parser.add_argument("--scan-threads", type=int, default=1,
+                        help="Threads for scanning sibling directories in parallel, useful on NAS/network mounts (default: 1)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Resume an interrupted run from its operation journal: finish pending operations "
+                             "and reuse completed placements without re-reading them (batch mode only)")
+    parser.add_argument("--dry-run", nargs="?", const="", default=None, metavar="PLAN_JSON",
+                        help="Only compute and print the plan without placing files into output/duplicates; "
+                             "optionally save it to PLAN_JSON for --apply-plan. The digest cache is still updated "
+                             f"(default: <output>/{CACHE_FILENAME}); use --no-cache or --cache to avoid that")
+    parser.add_argument("--apply-plan", default=None, metavar="PLAN_JSON",
+                        help="Execute a plan saved by --dry-run (--input/--output/--duplicates are taken from the plan)")
+    parser.add_argument("--shard", default=None, metavar="SHARD_FILE",
+                        help="Only scan and hash --input and write an index shard to SHARD_FILE for a later --merge; "
+                             "run one per disk or machine where the photos live")
+    parser.add_argument("--merge", nargs="+", default=None, metavar="SHARD_FILE",
+                        help="Combine index shards written by --shard, dedup across all of them and organize into "
+                             "--output/--duplicates (with --dry-run: only build the global plan)")
+    parser.add_argument("--stats-json", default=None, metavar="PATH",
+                        help="Write per-phase wall/CPU time, bytes read/written, files/s and cache hits to PATH")
+    parser.add_argument("--profile", default=None, metavar="DIR",
+                        help="Run each phase under cProfile and write one <phase>.pstats file per phase into DIR")
+    parser.add_argument("--log-format", default="text", choices=("text", "json"),
+                        help="Render organizer events as text lines (default) or one JSON object per line")
     args = parser.parse_args()
 
+    with subscribe(json_sink if args.log_format == "json" else text_sink):
+        run(parser, args)
+
+
+def run_plan(plan: OrganizePlan, args, stats: RunStats):
+    """执行计划（--apply-plan 读入的，或 --merge 刚生成的）：源文件在规划后有变化的操作会被跳过"""
+    cache_path = Path(args.cache) if args.cache else plan.output_dir / CACHE_FILENAME
+    cache = None if args.no_cache else DigestCache(cache_path, algo=plan.header["hash"])
+    with stats.phase("apply") as ph:
+        applied = apply_plan(plan, cache, stats=ph, copy_threads=args.copy_threads)
+    if cache is not None:
+        stats.cache_hits, stats.cache_misses = cache.hits, cache.misses
+        cache.close()
+    print_summary(plan, applied, stats.cache_hits)
+    stats.finish()
+    report_stats(stats, args)
+
+
+def run_shard(parser: argparse.ArgumentParser, args):
+    """--shard：只扫描与哈希 --input，写出索引分片；--output/--duplicates 给出时从扫描中排除"""
+    if not args.input:
+        parser.error("--input is required with --shard")
+    if args.stream or args.resume or args.watch or args.dry_run is not None:
+        emit("warn", "[WARN] --stream/--resume/--watch/--dry-run are ignored with --shard")
+    stats = RunStats(args.profile)
+    exclude = [Path(p) for p in (args.output, args.duplicates) if p]
+    build_shard(Path(args.input), Path(args.shard), exclude, cache_path=Path(args.cache) if args.cache else None,
+                use_cache=not args.no_cache, workers=args.workers, hash_algo=args.hash,
+                scan_threads=args.scan_threads, stats=stats)
+    report_stats(stats, args)
+
+
+def run_merge(parser: argparse.ArgumentParser, args):
+    """--merge：合并分片生成整体计划；--dry-run 时只打印 / 保存计划，否则立即执行"""
+    if args.input:
+        emit("warn", "[WARN] --input is ignored with --merge; sources come from the shards")
+    if args.stream or args.resume or args.watch:
+        emit("warn", "[WARN] --stream/--resume/--watch are ignored with --merge")
+    if args.visual_confirm:
+        emit("warn", "[WARN] --visual-confirm is not supported with --merge; ignoring it")
+    output_dir = Path(args.output)
+    stats = RunStats(args.profile)
+    plan = merge_shards([Path(p) for p in args.merge], output_dir, Path(args.duplicates),
+                        cache_path=Path(args.cache) if args.cache else None, use_cache=not args.no_cache,
+                        visual_distance=args.visual_distance, mode=args.mode, stats=stats, workers=args.workers)
+    if args.dry_run is None:
+        run_plan(plan, args, stats)
+        return
+    plan.describe()
+    if args.dry_run:
+        plan.save(Path(args.dry_run))
+        emit("info", f"[PLAN] saved to {args.dry_run}")
+    report_stats(stats, args)
+
+
+@contextmanager
+def cache_maintenance(args, cache_path: Path):
+    """--clear-cache 在运行前、--compact-cache 在运行后作用于本次运行所用的摘要缓存（--no-cache 时不做任何事）"""
+    if not args.no_cache and args.clear_cache:
+        with DigestCache(cache_path, algo=args.hash) as cache:
+            n = cache.invalidate()
+        emit("info", f"[CACHE] cleared {n} entries")
+    yield
+    if not args.no_cache and args.compact_cache:
+        with DigestCache(cache_path, algo=args.hash) as cache:
+            n = cache.compact()
+        emit("info", f"[CACHE] compacted: removed {n} stale entries, {len(cache)} kept")
+
+
+def run(parser: argparse.ArgumentParser, args):
+    cache_arg = Path(args.cache) if args.cache else None
+    if args.apply_plan:
+        plan = OrganizePlan.load(Path(args.apply_plan))
+        with cache_maintenance(args, cache_arg or plan.output_dir / CACHE_FILENAME):
+            run_plan(plan, args, RunStats(args.profile))
+        return
+    if args.shard:
+        with cache_maintenance(args, cache_arg or default_shard_cache(Path(args.shard).resolve())):
+            run_shard(parser, args)
+        return
+    if args.merge:
+        if not (args.output and args.duplicates):
+            parser.error("--output and --duplicates are required with --merge")
+        with cache_maintenance(args, cache_arg or Path(args.output).resolve() / CACHE_FILENAME):
+            run_merge(parser, args)
+        return
+    if not (args.input and args.output and args.duplicates):
+        parser.error("--input, --output and --duplicates are required (unless --apply-plan is given)")
+    cache_path = cache_arg or Path(args.output).resolve() / CACHE_FILENAME
+    with cache_maintenance(args, cache_path):
+        run_local(args, cache_path)
+
+
+def run_local(args, cache_path: Path):
+    """默认流程：分阶段整理，或 --dry-run / --watch / --stream"""
     input_dir = Path(args.input)
     output_dir = Path(args.output)
     duplicate_dir = Path(args.duplicates)
 
-    duplicate_dir.mkdir(parents=True, exist_ok=True)
+    if args.dry_run is None:
+        duplicate_dir.mkdir(parents=True, exist_ok=True)
+
+    kwargs = dict(cache_path=cache_path, use_cache=not args.no_cache, workers=args.workers, hash_algo=args.hash,
+                  visual_distance=args.visual_distance, mode=args.mode, scan_threads=args.scan_threads)
+    cascade = dict(visual_confirm=args.visual_confirm, confirm_distance=args.confirm_distance)
+    if args.dry_run is not None:
+        if args.stream or args.resume or args.watch:
+            emit("warn", "[WARN] --stream/--resume/--watch are ignored with --dry-run")
+        stats = RunStats(args.profile)
+        plan = plan_photos(input_dir, output_dir, duplicate_dir, stats=stats, **cascade, **kwargs)
+        plan.describe()
+        if args.dry_run:
+            plan.save(Path(args.dry_run))
+            emit("info", f"[PLAN] saved to {args.dry_run}")
+    elif args.watch:
+        if args.stream or args.resume:
+            emit("warn", "[WARN] --stream/--resume are ignored with --watch")
+        if args.stats_json or args.profile:
+            emit("warn", "[WARN] --stats-json/--profile are not supported with --watch; ignoring them")
+        if args.visual_confirm:
+            emit("warn", "[WARN] --visual-confirm is not supported with --watch; ignoring it")
+        if args.copy_threads != DEFAULT_COPY_THREADS:
+            emit("warn", "[WARN] --copy-threads is not supported with --watch; ignoring it")
+        stats = None
+        watch_photos(input_dir, output_dir, duplicate_dir, interval=args.watch_interval, settle=args.settle,
+                     **kwargs)
+    elif args.stream:
+        if args.resume:
+            emit("warn", "[WARN] --resume is not supported with --stream; ignoring it")
+        if args.stats_json or args.profile:
+            emit("warn", "[WARN] --stats-json/--profile are not supported with --stream; ignoring them")
+        if args.visual_confirm:
+            emit("warn", "[WARN] --visual-confirm is not supported with --stream; ignoring it")
+        if args.copy_threads != DEFAULT_COPY_THREADS:
+            emit("warn", "[WARN] --copy-threads is not supported with --stream; ignoring it")
+        stats = None
+        organize_streaming(input_dir, output_dir, duplicate_dir, **kwargs)
+    else:
+        stats = organize_photos(input_dir, output_dir, duplicate_dir, resume=args.resume,
+                                profile_dir=args.profile, copy_threads=args.copy_threads, **cascade, **kwargs)
+    if stats is not None:
+        report_stats(stats, args)
 
-    organize_photos(input_dir, output_dir, duplicate_dir)
 
 if __name__ == "__main__":
     main()
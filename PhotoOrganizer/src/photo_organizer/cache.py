@@ -0,0 +1,207 @@
+# cache.py
+from pathlib import Path
+from datetime import datetime
+from collections import namedtuple
+from typing import Dict, Iterable, Optional
+import os
+import sqlite3
+
+CACHE_FILENAME = ".photo_organizer_cache.sqlite3"
+SCHEMA_VERSION = 5
+
+# 缓存命中时返回的内容（任一字段可能为 None：表示该项尚未计算过）
+# origin：输出文件由哪个源文件放置而来（见 origin_key），用于免哈希的幂等判断
+CacheEntry = namedtuple("CacheEntry", ["digest", "phash", "date", "edge", "origin"])
+
+
+def _stat_key(st: os.stat_result) -> tuple:
+    """文件“指纹”：大小 + 修改时间(ns) + inode，任一变化即视为缓存失效"""
+    return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+
+def origin_key(path: Path, fingerprint: tuple) -> str:
+    """
+    源文件身份：路径 + 放置时的指纹。
+    输出文件指纹未变、且其 origin 与源文件当前的 origin_key 相同 → 两者内容必然一致，无需读取。
+    """
+    return "{}:{}:{}:{}".format(*fingerprint, path)
+
+
+class DigestCache:
+    """
+    持久化摘要缓存（SQLite）：
+    - 以文件路径为键，记录 size / mtime_ns / inode；
+    - 保存内容摘要、首尾块哈希、pHash 与提取出的拍摄时间；
+    - 摘要按算法（algo）区分：换用其他算法时旧摘要自动视为未命中，其余字段照常复用；
+    - 打开时一次性读入内存，查询只是字典查找；写入先攒批，flush() 时统一提交。
+    """
+
+    def __init__(self, db_path: Path, algo: str = "md5"):
+        self.db_path = Path(db_path)
+        self.algo = algo
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._init_schema()
+
+        # path → (size, mtime_ns, inode, digest, phash, date_iso, edge, origin)
+        # 其他算法的摘要 / 首尾块哈希在读入时即丢弃
+        self._rows: Dict[str, tuple] = {}
+        for row in self.conn.execute(
+            "SELECT path, size, mtime_ns, inode, digest, phash, taken, edge, origin, algo FROM files"
+        ):
+            if row[9] != algo:
+                row = row[:4] + (None, row[5], row[6], None, row[8])
+            self._rows[row[0]] = row[1:9]
+        self._dirty: Dict[str, tuple] = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    def _init_schema(self):
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            # 版本不符时直接重建：缓存可以随时丢弃
+            self.conn.execute("DROP TABLE IF EXISTS files")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                path     TEXT PRIMARY KEY,
+                size     INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                inode    INTEGER NOT NULL,
+                digest   TEXT,
+                phash    TEXT,
+                taken    TEXT,
+                edge     TEXT,
+                origin   TEXT,
+                algo     TEXT
+            )
+            """
+        )
+        self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.conn.commit()
+
+    # ---------- 查询 / 写入 ----------
+
+    def get(self, path: Path, st: os.stat_result) -> Optional[CacheEntry]:
+        """若缓存中的文件指纹与 st 一致，返回 CacheEntry；否则返回 None"""
+        row = self._rows.get(str(path))
+        if row is None or row[:3] != _stat_key(st):
+            self.misses += 1
+            return None
+        self.hits += 1
+        digest, phash, taken, edge, origin = row[3:]
+        return CacheEntry(digest, phash, datetime.fromisoformat(taken) if taken else None, edge, origin)
+
+    def load_record(self, rec) -> bool:
+        """按 PhotoRecord 的 stat 快照查询缓存，命中时把摘要 / 首尾块哈希 / pHash / 拍摄时间填回记录"""
+        row = self._rows.get(str(rec.path))
+        if row is None or row[:3] != rec.fingerprint:
+            self.misses += 1
+            return False
+        self.hits += 1
+        digest, phash, taken, edge = row[3:7]
+        rec.digest = rec.digest or digest
+        rec.edge = rec.edge or edge
+        rec.phash = rec.phash or phash
+        if rec.date is None and taken:
+            rec.date = datetime.fromisoformat(taken)
+        return True
+
+    def store_record(self, rec):
+        """把 PhotoRecord 上已算好的字段写入缓存"""
+        self._store(str(rec.path), rec.fingerprint, rec.digest, rec.phash, rec.date, rec.edge)
+
+    def put(self, path: Path, st: os.stat_result, digest: Optional[str] = None,
+            phash: Optional[str] = None, date: Optional[datetime] = None, edge: Optional[str] = None,
+            origin: Optional[str] = None):
+        """
+        写入/更新一条缓存记录。
+        指纹未变时与旧记录合并（未提供的字段保留旧值）；指纹变化时整条替换。
+        """
+        self._store(str(path), _stat_key(st), digest, phash, date, edge, origin)
+
+    def _store(self, key: str, fp: tuple, digest: Optional[str], phash: Optional[str],
+               date: Optional[datetime], edge: Optional[str] = None, origin: Optional[str] = None):
+        old = self._rows.get(key)
+        if old is not None and old[:3] == fp:
+            digest = digest if digest is not None else old[3]
+            phash = phash if phash is not None else old[4]
+            taken = date.isoformat() if date is not None else old[5]
+            edge = edge if edge is not None else old[6]
+            origin = origin if origin is not None else old[7]
+        else:
+            taken = date.isoformat() if date is not None else None
+        row = fp + (digest, phash, taken, edge, origin)
+        self._rows[key] = row
+        self._dirty[key] = row
+
+    def flush(self):
+        """把攒下的写入一次性提交到磁盘"""
+        if not self._dirty:
+            return
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO files (path, size, mtime_ns, inode, digest, phash, taken, edge, origin, algo) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(k,) + v + (self.algo,) for k, v in self._dirty.items()],
+        )
+        self.conn.commit()
+        self._dirty.clear()
+
+    # ---------- 维护 ----------
+
+    def invalidate(self, paths: Optional[Iterable[Path]] = None) -> int:
+        """
+        显式失效：
+        - paths 为 None：清空整个缓存；
+        - 否则仅删除给定路径的记录。
+        返回删除的条数。
+        """
+        self.flush()
+        if paths is None:
+            n = len(self._rows)
+            self._rows.clear()
+            self.conn.execute("DELETE FROM files")
+        else:
+            keys = [str(p) for p in paths]
+            n = 0
+            for k in keys:
+                if self._rows.pop(k, None) is not None:
+                    n += 1
+            self.conn.executemany("DELETE FROM files WHERE path = ?", [(k,) for k in keys])
+        self.conn.commit()
+        return n
+
+    def compact(self) -> int:
+        """
+        压缩缓存：删除已不存在或已变化的文件对应的记录，然后 VACUUM 回收空间。
+        返回删除的条数。
+        """
+        self.flush()
+        stale = []
+        for key, row in self._rows.items():
+            try:
+                st = os.stat(key)
+            except OSError:
+                stale.append(key)
+                continue
+            if row[:3] != _stat_key(st):
+                stale.append(key)
+        n = self.invalidate(Path(k) for k in stale)
+        self.conn.execute("VACUUM")
+        return n
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
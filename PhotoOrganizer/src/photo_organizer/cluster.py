@@ -0,0 +1,114 @@
+# cluster.py
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+
+class UnionFind:
+    """
+    并查集（不相交集合），把候选近邻对合并成可传递的分组（A~B、B~C ⇒ A、B、C 同组）。
+    条目编号 0..n-1；合并时总是把序号较大的根挂到较小的根下，因此根即集合内序号最小者——
+    调用方按“保留优先”的顺序编号时（见 cluster_pairs），根就是该组的代表，不必再比较拍摄时间。
+
+    parent 为 NumPy 数组：
+    - find / union 逐个操作，find 带路径减半；
+    - union_pairs 一次合并整批候选对：反复“指针跳跃（完全路径压缩）→ 各对较大的根挂到较小的根下”，
+      每轮都是向量化操作，只涉及出现在候选对中的条目。
+    """
+
+    __slots__ = ("parent",)
+
+    def __init__(self, n: int):
+        self.parent = np.arange(n, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return int(x)
+
+    def union(self, a: int, b: int) -> int:
+        """合并 a、b 所在的集合，返回新的根"""
+        ra, rb = self.find(a), self.find(b)
+        if ra > rb:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        return ra
+
+    def _compress(self, nodes=None):
+        """指针跳跃：每轮 parent[x] = parent[parent[x]]，直到 nodes（默认全部）都直接指向根"""
+        parent = self.parent
+        if nodes is None:
+            while True:
+                grand = parent[parent]
+                if np.array_equal(grand, parent):
+                    return
+                parent[:] = grand
+        while True:
+            p = parent[nodes]
+            grand = parent[p]
+            if np.array_equal(grand, p):
+                return
+            parent[nodes] = grand
+
+    def union_pairs(self, a, b):
+        """合并每一对 (a[k], b[k])"""
+        a = np.asarray(a, dtype=np.int64)
+        b = np.asarray(b, dtype=np.int64)
+        if len(a) == 0:
+            return
+        nodes = np.sort(np.concatenate((a, b)))
+        nodes = nodes[np.append(True, nodes[1:] != nodes[:-1])]  # 去重（比 np.unique 快）
+        parent = self.parent
+        while True:
+            self._compress(nodes)
+            ra, rb = parent[a], parent[b]
+            diff = ra != rb
+            if not diff.any():
+                return
+            a, b, ra, rb = a[diff], b[diff], ra[diff], rb[diff]
+            # 同一个根可能同时挂向几个更小的根：取最小者，其余的下一轮再合并
+            np.minimum.at(parent, np.maximum(ra, rb), np.minimum(ra, rb))
+
+    def group_arrays(self, min_size: int = 2) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        各集合（只含不少于 min_size 个条目者）的扁平形式：members[starts[g]:starts[g + 1]] 为第 g 组，
+        组按根升序、组内按序号升序
+        """
+        self._compress()
+        roots = self.parent
+        members = np.flatnonzero(np.bincount(roots, minlength=len(roots))[roots] >= min_size)
+        r = roots[members]
+        by_root = np.argsort(r, kind="stable")
+        members, r = members[by_root], r[by_root]
+        starts = np.flatnonzero(np.append(True, r[1:] != r[:-1])) if len(r) else np.zeros(0, dtype=np.int64)
+        return members, np.append(starts, len(members))
+
+    def groups(self, min_size: int = 2) -> List[List[int]]:
+        return _split(*self.group_arrays(min_size))
+
+
+def _split(members: np.ndarray, starts: np.ndarray) -> List[List[int]]:
+    # 先整体转成 list 再切片：比 np.split 出几十万个小数组快一个数量级
+    flat, bounds = members.tolist(), starts.tolist()
+    return [flat[lo:hi] for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+
+def cluster_pairs(order: Sequence[int], a, b, min_size: int = 2) -> List[List[int]]:
+    """
+    把候选对 (a[k], b[k]) 合并成可传递的分组。
+    order 为全部条目按保留优先级（如 拍摄时间, 路径）排好的序列，order[r] 为排第 r 的条目；
+    返回的每组按此顺序排列，首个即代表（保留者）；各组按代表的先后排列。
+    组的序号因而只取决于条目与候选对的集合，与候选对的枚举顺序无关，可作为稳定的组 id。
+    """
+    order = np.asarray(order, dtype=np.int64)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    uf = UnionFind(len(order))
+    uf.union_pairs(rank[np.asarray(a, dtype=np.int64)], rank[np.asarray(b, dtype=np.int64)])
+    members, starts = uf.group_arrays(min_size)
+    return _split(order[members], starts)
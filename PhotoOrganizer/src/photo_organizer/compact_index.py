@@ -0,0 +1,407 @@
+# compact_index.py
+from array import array
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import hashlib
+import os
+
+import numpy as np
+
+from photo_organizer.cluster import cluster_pairs
+from photo_organizer.digest import (DEFAULT_ALGO, CONFIRM_DISTANCE, confirm_split, perceptual_hash)
+from photo_organizer.neardup import MultiIndexHash
+from photo_organizer.record import PhotoRecord
+
+_EPOCH = datetime(1970, 1, 1)
+_US = timedelta(microseconds=1)
+
+# 每个条目的状态位
+_HAS_EDGE = 1
+_HAS_DIGEST = 2
+_HAS_PHASH = 4       # pHash 已计算
+_PHASH_EMPTY = 8     # 计算失败（pHash 为空串）
+_IN_PMAP = 16        # 已加入视觉去重
+_DISCARDED = 32
+
+
+def _to_us(date: datetime) -> int:
+    """本地时间（naive datetime）→ 自 1970-01-01 起的微秒数；保留微秒，排序与 datetime 完全一致"""
+    return (date - _EPOCH) // _US
+
+
+def _from_us(us: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=us)
+
+
+class PathTable:
+    """
+    路径表：目录与文件名分开存放。目录各存一份（dict 查重，图库里目录数远少于文件数），
+    文件名 UTF-8 编码后首尾相接存进一个 bytearray；每个条目只占 目录 id + 文件名偏移 + 文件名本身。
+    """
+
+    __slots__ = ("_dirs", "_dir_ids", "_dir_of", "_names", "_offsets")
+
+    def __init__(self):
+        self._dirs: List[str] = []
+        self._dir_ids: Dict[str, int] = {}
+        self._dir_of = array("I")
+        self._names = bytearray()
+        self._offsets = array("Q", [0])
+
+    def __len__(self) -> int:
+        return len(self._dir_of)
+
+    def _intern(self, folder: str) -> int:
+        dir_id = self._dir_ids.get(folder)
+        if dir_id is None:
+            dir_id = self._dir_ids[folder] = len(self._dirs)
+            self._dirs.append(folder)
+        return dir_id
+
+    def add(self, path) -> int:
+        folder, name = os.path.split(str(path))
+        self._dir_of.append(self._intern(folder))
+        self._names += name.encode("utf-8", "surrogateescape")
+        self._offsets.append(len(self._names))
+        return len(self._dir_of) - 1
+
+    def get(self, pid: int) -> str:
+        name = self._names[self._offsets[pid]:self._offsets[pid + 1]].decode("utf-8", "surrogateescape")
+        return os.path.join(self._dirs[self._dir_of[pid]], name)
+
+
+class CompactDigestIndex:
+    """
+    DigestIndex 的列式版本，供几百万文件的图库使用：每个文件不是一个 PhotoRecord 对象，
+    而是各列数组中的一行（整数 id 即加入顺序）：
+    - 路径：PathTable（目录去重 + 文件名字节串）；
+    - 尺寸：uint64；拍摄时间：int64 微秒（自 1970 年起）；
+    - 首尾块哈希 / 完整摘要：原始字节，按摘要长度（补齐到 8 字节）定宽存放；pHash：uint64；
+    - 状态位：每条 1 字节（见 _HAS_*）。
+    每个文件约 80 字节加文件名长度；分组时用 NumPy 排序找相等的连续段，不建 dict-of-lists。
+
+    接口与 DigestIndex 一一对应，只是以 id 代替记录：分级漏斗（needs_edge_hash / needs_full_hash +
+    set_edge / set_digest）、add_phash、get_deduplicated、get_visual_duplicates_map。
+    给出的分组、组内顺序与保留者都与 DigestIndex 相同（见 tests/test_compact_index.py）；
+    超大图库可用 iter_deduplicated 逐组取用，不一次性展开成列表。
+
+    目前只有分片整理用到它（shard.build_shard / merge_shards）；默认的 organize_photos / plan_photos、
+    --stream 与 --watch 仍然为每个文件建一个 PhotoRecord 并使用 DigestIndex，内存占用没有因此降低。
+    """
+
+    def __init__(self, algo: str = DEFAULT_ALGO):
+        self.algo = algo
+        self.digest_size = hashlib.new(algo).digest_size
+        self._width = -(-self.digest_size // 8) * 8
+        self.paths = PathTable()
+        self._size = array("Q")
+        self._date = array("q")
+        self._edge = bytearray()
+        self._digest = bytearray()
+        self._phash = array("Q")
+        self._flags = bytearray()
+        self._pmap = array("I")  # 按 add_phash 顺序记下加入视觉去重的 id
+
+    def __len__(self) -> int:
+        return len(self._flags)
+
+    # ---------- 写入 ----------
+
+    def _pack(self, hexdigest: Optional[str]) -> bytes:
+        if hexdigest is None:
+            return bytes(self._width)
+        return bytes.fromhex(hexdigest).ljust(self._width, b"\0")
+
+    def add(self, path, size: int, date: datetime, edge: Optional[str] = None, digest: Optional[str] = None,
+            phash: Optional[str] = None) -> int:
+        """加入一个文件，返回其 id；date 须已知。phash 给出时只记下，add_phash 才把它加入视觉去重"""
+        self.paths.add(path)
+        self._size.append(size)
+        self._date.append(_to_us(date))
+        self._edge += self._pack(edge)
+        self._digest += self._pack(digest)
+        self._phash.append(int(phash, 16) if phash else 0)
+        self._flags.append((_HAS_EDGE if edge is not None else 0) | (_HAS_DIGEST if digest is not None else 0)
+                           | (_HAS_PHASH if phash is not None else 0) | (_PHASH_EMPTY if phash == "" else 0))
+        return len(self._flags) - 1
+
+    def add_record(self, rec: PhotoRecord) -> int:
+        return self.add(rec.path, rec.size, rec.date, rec.edge, rec.digest, rec.phash)
+
+    @classmethod
+    def from_records(cls, records: Iterable[PhotoRecord], algo: str = DEFAULT_ALGO) -> "CompactDigestIndex":
+        index = cls(algo)
+        for rec in records:
+            index.add_record(rec)
+        return index
+
+    def discard(self, i: int):
+        """移出索引（如读取失败的文件）；id 保持不变"""
+        self._flags[i] |= _DISCARDED
+
+    def set_edge(self, i: int, edge: str):
+        self._edge[i * self._width:(i + 1) * self._width] = self._pack(edge)
+        self._flags[i] |= _HAS_EDGE
+
+    def set_digest(self, i: int, digest: str):
+        self._digest[i * self._width:(i + 1) * self._width] = self._pack(digest)
+        self._flags[i] |= _HAS_DIGEST
+
+    def add_phash(self, i: int, phash: Optional[str] = None) -> str:
+        """加入感知哈希索引；phash 为空且尚未计算时读取文件计算。返回 pHash"""
+        if phash is None:
+            phash = self.phash(i)
+            if phash is None:
+                phash = perceptual_hash(Path(self.paths.get(i)))
+        self._phash[i] = int(phash, 16) if phash else 0
+        self._flags[i] |= _HAS_PHASH if phash else _HAS_PHASH | _PHASH_EMPTY
+        if phash:
+            self._flags[i] |= _IN_PMAP
+            self._pmap.append(i)
+        return phash
+
+    # ---------- 序列化（索引分片，见 shard.py） ----------
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """各列转成 NumPy 数组（可直接交给 np.savez）；视觉去重的加入状态（pmap）不保存"""
+        paths = self.paths
+        dirs = [d.encode("utf-8", "surrogateescape") for d in paths._dirs]
+        return {
+            "dirs": np.frombuffer(b"".join(dirs), dtype=np.uint8),
+            "dir_offsets": np.cumsum([0] + [len(d) for d in dirs], dtype=np.uint64),
+            "dir_of": np.frombuffer(paths._dir_of, dtype=np.uint32),
+            "names": np.frombuffer(paths._names, dtype=np.uint8),
+            "name_offsets": np.frombuffer(paths._offsets, dtype=np.uint64),
+            "size": np.frombuffer(self._size, dtype=np.uint64),
+            "date": np.frombuffer(self._date, dtype=np.int64),
+            "edge": np.frombuffer(self._edge, dtype=np.uint8).reshape(-1, self._width),
+            "digest": np.frombuffer(self._digest, dtype=np.uint8).reshape(-1, self._width),
+            "phash": np.frombuffer(self._phash, dtype=np.uint64),
+            "flags": self._flags_np() & np.uint8(~_IN_PMAP & 0xFF),
+        }
+
+    @classmethod
+    def from_arrays(cls, parts: Iterable[Dict[str, np.ndarray]], algo: str = DEFAULT_ALGO) -> "CompactDigestIndex":
+        """
+        由 to_arrays 的结果重建索引；给出多份时按顺序首尾相接（id 依次接续，目录重新去重），用于合并索引分片。
+        各份须使用同一摘要算法。
+        """
+        index = cls(algo)
+        paths = index.paths
+        for part in parts:
+            if part["digest"].shape[1] != index._width:
+                raise ValueError(f"index part has {part['digest'].shape[1]}-byte digests, expected {algo}")
+            blob, offsets = part["dirs"].tobytes(), part["dir_offsets"].tolist()
+            remap = np.array([paths._intern(blob[lo:hi].decode("utf-8", "surrogateescape"))
+                              for lo, hi in zip(offsets[:-1], offsets[1:])], dtype=np.uint32)
+            paths._dir_of.frombytes(remap[part["dir_of"]].tobytes() if len(remap) else b"")
+            base = len(paths._names)
+            paths._names += part["names"].tobytes()
+            paths._offsets.frombytes((part["name_offsets"][1:] + np.uint64(base)).astype(np.uint64).tobytes())
+            index._size.frombytes(part["size"].astype(np.uint64).tobytes())
+            index._date.frombytes(part["date"].astype(np.int64).tobytes())
+            index._edge += part["edge"].tobytes()
+            index._digest += part["digest"].tobytes()
+            index._phash.frombytes(part["phash"].astype(np.uint64).tobytes())
+            index._flags += (part["flags"] & np.uint8(~_IN_PMAP & 0xFF)).tobytes()
+        return index
+
+    # ---------- 单条读取 ----------
+
+    def path(self, i: int) -> Path:
+        return Path(self.paths.get(i))
+
+    def size(self, i: int) -> int:
+        return self._size[i]
+
+    def date(self, i: int) -> datetime:
+        return _from_us(self._date[i])
+
+    def _hex(self, blob: bytearray, i: int) -> str:
+        return bytes(blob[i * self._width:i * self._width + self.digest_size]).hex()
+
+    def edge(self, i: int) -> Optional[str]:
+        return self._hex(self._edge, i) if self._flags[i] & _HAS_EDGE else None
+
+    def digest(self, i: int) -> Optional[str]:
+        return self._hex(self._digest, i) if self._flags[i] & _HAS_DIGEST else None
+
+    def phash(self, i: int) -> Optional[str]:
+        if not self._flags[i] & _HAS_PHASH:
+            return None
+        return "" if self._flags[i] & _PHASH_EMPTY else f"{self._phash[i]:016x}"
+
+    def nbytes(self) -> int:
+        """各列占用的字节数（不含目录字符串与对象头）"""
+        columns = (self._size, self._date, self._phash, self._pmap, self.paths._dir_of, self.paths._offsets)
+        return (sum(a.itemsize * len(a) for a in columns) + len(self._edge) + len(self._digest)
+                + len(self._flags) + len(self.paths._names))
+
+    # ---------- 列视图 ----------
+
+    def _flags_np(self) -> np.ndarray:
+        return np.frombuffer(self._flags, dtype=np.uint8)
+
+    def _words(self, blob: bytearray) -> np.ndarray:
+        """定宽摘要列 → (n, width / 8) 的 uint64 视图，供排序比较"""
+        return np.frombuffer(blob, dtype=np.uint64).reshape(len(self), self._width // 8)
+
+    @staticmethod
+    def _runs(keys: List[np.ndarray]) -> np.ndarray:
+        """已排序的各键列 → 每段相等连续区间的起点（含末尾 n）"""
+        n = len(keys[0])
+        change = np.zeros(n, dtype=bool)
+        change[0] = True
+        for k in keys:
+            change[1:] |= k[1:] != k[:-1]
+        return np.append(np.flatnonzero(change), n)
+
+    # ---------- 分级漏斗 ----------
+
+    def _size_collisions(self) -> np.ndarray:
+        """尺寸与其他（未移出的）条目相同的 id，升序。只对尺寸一列排序，尺寸唯一的绝大多数文件到此为止"""
+        ids = np.flatnonzero((self._flags_np() & _DISCARDED) == 0)
+        if len(ids) == 0:
+            return ids
+        size = np.frombuffer(self._size, dtype=np.uint64)[ids]
+        order = np.argsort(size, kind="stable")
+        ids, size = ids[order], size[order]
+        del order
+        lengths = np.diff(self._runs([size]))
+        return np.sort(ids[np.repeat(lengths > 1, lengths)])
+
+    def _key_columns(self, ids: np.ndarray, digest: bool) -> List[np.ndarray]:
+        """ids 的分组键列：尺寸、状态位、首尾块哈希（及完整摘要）的各 64 位字"""
+        keys = [np.frombuffer(self._size, dtype=np.uint64)[ids],
+                self._flags_np()[ids] & ((_HAS_EDGE | _HAS_DIGEST) if digest else _HAS_EDGE)]
+        keys += list(self._words(self._edge)[ids].T)
+        if digest:
+            keys += list(self._words(self._digest)[ids].T)
+        return keys
+
+    def _sort_runs(self, ids: np.ndarray, keys: List[np.ndarray]) -> Tuple[np.ndarray, List[np.ndarray], np.ndarray]:
+        """按 keys 稳定排序（同键者保持 id 升序），返回 (排序后的 ids, 排序后的 keys, 相等段起点)"""
+        order = np.lexsort(keys[::-1])
+        keys = [k[order] for k in keys]
+        return ids[order], keys, self._runs(keys)
+
+    def needs_edge_hash(self) -> List[int]:
+        """第 2 级候选：尺寸冲突、且尚无首尾块哈希的 id"""
+        return [i for i in self._size_collisions().tolist() if not self._flags[i] & _HAS_EDGE]
+
+    def needs_full_hash(self) -> List[int]:
+        """第 3 级候选：尺寸与首尾块哈希都冲突、且尚无完整摘要的 id"""
+        ids = self._size_collisions()
+        if len(ids) == 0:
+            return []
+        ids, _, starts = self._sort_runs(ids, self._key_columns(ids, digest=False))
+        lengths = np.diff(starts)
+        hit = np.sort(ids[np.repeat(lengths > 1, lengths)])
+        return [i for i in hit.tolist() if not self._flags[i] & _HAS_DIGEST]
+
+    # ---------- 精确去重 ----------
+
+    def _dedup_parts(self):
+        """
+        精确重复分组，分两部分给出（都不为每个文件建 Python 对象）：
+        - singles：尺寸唯一、自成一组的 id（升序），绝大多数文件属于此类；
+        - 尺寸冲突者的各组：members[starts[g]:starts[g + 1]] 为第 g 组，组内按拍摄时间（同时间按加入顺序）排列，
+          首个即保留者；组按 (所在尺寸的最小 id, 组内最小 id) 排序，firsts[g] 为前者。
+        两部分按 id / firsts 归并即得到与 DigestIndex.groups 相同的组顺序（先按尺寸首次出现，再按组首次出现）。
+        """
+        live = np.flatnonzero((self._flags_np() & _DISCARDED) == 0)
+        coll = self._size_collisions()
+        if len(coll) == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return live, empty, np.zeros(1, dtype=np.int64), empty
+        singles = np.setdiff1d(live, coll, assume_unique=True)
+
+        ids, keys, starts = self._sort_runs(coll, self._key_columns(coll, digest=True))
+        lengths = np.diff(starts)
+        # 多于一个条目却没有完整摘要的段（理论上不会出现）拆成单独的条目，与 DigestIndex.groups 一致
+        bad = (lengths > 1) & ((keys[1][starts[:-1]] & _HAS_DIGEST) == 0)
+        if bad.any():
+            is_start = np.repeat(bad, lengths)
+            is_start[starts[:-1]] = True
+            starts = np.append(np.flatnonzero(is_start), len(ids))
+            lengths = np.diff(starts)
+
+        # 尺寸段的最小 id（段内还按摘要排过序，段首不一定最小）；组内 id 升序，组首即最小
+        size_starts = self._runs([keys[0]])
+        size_first = np.repeat(np.minimum.reduceat(ids, size_starts[:-1]), np.diff(size_starts))
+        group_first = ids[starts[:-1]]
+        group_size_first = size_first[starts[:-1]]
+        label = np.repeat(np.arange(len(lengths)), lengths)
+        rank = np.empty(len(lengths), dtype=np.int64)
+        rank[np.lexsort((group_first, group_size_first))] = np.arange(len(lengths))
+        date = np.frombuffer(self._date, dtype=np.int64)[ids]
+        members = ids[np.lexsort((ids, date, rank[label]))]
+        by_rank = np.argsort(rank)
+        return singles, members, np.append(0, np.cumsum(lengths[by_rank])), group_size_first[by_rank]
+
+    def iter_deduplicated(self) -> Iterator[Tuple[int, List[int]]]:
+        """逐组产出 (保留者 id, [重复 id])，顺序与 get_deduplicated 相同"""
+        singles, members, starts, firsts = self._dedup_parts()
+        pos = np.searchsorted(singles, firsts).tolist() + [len(singles)]
+        prev = 0
+        for g, cut in enumerate(pos):
+            for a in range(prev, cut, 1 << 16):
+                for i in singles[a:min(cut, a + (1 << 16))].tolist():
+                    yield i, []
+            prev = cut
+            if g < len(firsts):
+                a, b = int(starts[g]), int(starts[g + 1])
+                yield int(members[a]), members[a + 1:b].tolist()
+
+    def get_deduplicated(self) -> List[Tuple[int, List[int]]]:
+        return list(self.iter_deduplicated())
+
+    def groups(self) -> Iterator[List[int]]:
+        """按 (size, edge, digest) 给出的精确重复分组（组内按加入顺序）"""
+        for keep, dupes in self.iter_deduplicated():
+            yield sorted([keep] + dupes)
+
+    # ---------- 视觉去重 ----------
+
+    def _exact_phash_groups(self) -> List[List[int]]:
+        """pHash 完全相同的分组：组按首次加入的顺序、组内按加入顺序（与 DigestIndex.pmap 相同）"""
+        pmap = np.frombuffer(self._pmap, dtype=np.uint32).astype(np.int64)
+        if len(pmap) == 0:
+            return []
+        ph = np.frombuffer(self._phash, dtype=np.uint64)[pmap]
+        order = np.argsort(ph, kind="stable")
+        starts = self._runs([ph[order]])
+        groups = [order[a:b] for a, b in zip(starts[:-1], starts[1:])]
+        groups.sort(key=lambda g: g[0])
+        return [pmap[g].tolist() for g in groups]
+
+    def _sort_key(self, i: int):
+        return self._date[i], self.paths.get(i)
+
+    def visual_candidates(self, max_distance: int = 0) -> List[List[int]]:
+        """按 pHash 给出的候选组（只含多于一张图的组），算法与 DigestIndex.visual_candidates 相同"""
+        groups = self._exact_phash_groups()
+        if max_distance > 0 and len(groups) > 1:
+            groups = sorted(groups, key=lambda g: min(self._sort_key(i) for i in g))
+            mih = MultiIndexHash(max_distance)
+            for g in groups:
+                mih.add(self._phash[g[0]])
+            i, j = mih.pair_arrays()
+            clusters = cluster_pairs(range(len(groups)), i, j, min_size=1)
+            groups = [[k for g in members for k in groups[g]] for members in clusters]
+        return [g for g in groups if len(g) > 1]
+
+    def get_visual_duplicates_map(self, max_distance: int = 0, confirm: Optional[Dict[int, str]] = None,
+                                  confirm_distance: int = CONFIRM_DISTANCE) -> Dict[int, List[int]]:
+        """视觉重复分组：{最早的 id: [其余 id]}，与 DigestIndex.get_visual_duplicates_map 相同"""
+        groups = self.visual_candidates(max_distance)
+        if confirm is not None:
+            groups = [sub for g in groups
+                      for sub in confirm_split(g, self._sort_key, confirm, confirm_distance)]
+        result = {}
+        for g in groups:
+            if len(g) > 1:
+                ordered = sorted(g, key=lambda i: self._date[i])
+                result[ordered[0]] = ordered[1:]
+        return result
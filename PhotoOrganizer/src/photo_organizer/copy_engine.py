@@ -0,0 +1,78 @@
+# copy_engine.py
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+from photo_organizer.placement import place_file, DEFAULT_MODE
+
+DEFAULT_COPY_THREADS = 1
+
+
+class CopyEngine:
+    """
+    并发放置：同时保持 threads 个放置在途，让 SSD 阵列 / NAS 的队列深度吃满（单个 copy 在途时带宽大多闲置）。
+    复制本身走 copy_file_range / sendfile（见 placement.copy_file），数据不经过用户态、拷贝期间释放 GIL，
+    因此线程即可并发，不需要多进程。
+
+    run(jobs) 按完成顺序逐个产出 (tag, 实际放置方式, 异常)：
+    - jobs 在调用线程中惰性取用，在途任务不超过 threads * 2 个，源文件再多也不会一次性提交；
+    - 完成事件同样在调用线程中产出，调用方可直接写预写日志 / 缓存 / 事件，无需加锁；
+    - 单个文件失败只在其结果中带回异常，不影响其他文件；
+    - 放置中出现 KeyboardInterrupt 等非 Exception 的异常时不再提交新任务、取消尚未开始的，
+      把已完成的照常产出（调用方得以记下日志）后再抛出。
+    threads=1（默认）时在调用线程中逐个执行，不建线程池（与原来的串行放置相同）。
+    place 为实际的放置函数 place(src, dst, mode)，默认 placement.place_file。
+    目标目录须由调用方事先创建（见 OrganizePlan.mkdirs，每个年 / 月目录只建一次）。
+    """
+
+    def __init__(self, threads: int = DEFAULT_COPY_THREADS, mode: str = DEFAULT_MODE,
+                 place: Callable[[Path, Path, str], str] = place_file):
+        self.threads = max(1, threads)
+        self.mode = mode
+        self.place = place
+
+    def _place(self, src: Path, dst: Path) -> str:
+        return self.place(src, dst, self.mode)
+
+    def run(self, jobs: Iterable[Tuple[Path, Path, Any]]) -> Iterator[Tuple[Any, Optional[str], Optional[Exception]]]:
+        """jobs 为 (源, 目标, tag) 序列；产出 (tag, method, error)，成功时 error 为 None"""
+        if self.threads == 1:
+            for src, dst, tag in jobs:
+                try:
+                    yield tag, self._place(src, dst), None
+                except Exception as e:
+                    yield tag, None, e
+            return
+
+        depth = self.threads * 2
+        fatal: Optional[BaseException] = None
+        with ThreadPoolExecutor(self.threads, thread_name_prefix="copy") as pool:
+            pending = {}
+            jobs = iter(jobs)
+            exhausted = False
+            while pending or not exhausted:
+                while not exhausted and len(pending) < depth:
+                    job = next(jobs, None)
+                    if job is None:
+                        exhausted = True
+                        break
+                    src, dst, tag = job
+                    pending[pool.submit(self._place, src, dst)] = tag
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    tag = pending.pop(fut)
+                    if fut.cancelled():
+                        continue
+                    err = fut.exception()
+                    if err is not None and not isinstance(err, Exception):
+                        if fatal is None:
+                            fatal = err
+                            exhausted = True
+                            for other in pending:
+                                other.cancel()
+                        continue
+                    yield tag, (fut.result() if err is None else None), err
+        if fatal is not None:
+            raise fatal
@@ -1,73 +1,315 @@
 from pathlib import Path
 import hashlib
-from datetime import datetime
+import mmap
+import os
+import threading
 from collections import defaultdict
 import imagehash
 from PIL import Image
-from photo_organizer.metadata import get_photo_datetime
+from photo_organizer.events import emit
+from photo_organizer.record import PhotoRecord
+from photo_organizer.neardup import MultiIndexHash, hash_to_int
+from photo_organizer.cluster import cluster_pairs
+
+DEFAULT_ALGO = "md5"
+SUPPORTED_ALGOS = ("md5", "sha1", "sha256", "blake2b", "blake2s")
+
+_buffers = threading.local()
+
+
+def _read_buffer(size: int) -> memoryview:
+    """每个线程（进程）复用一块预分配的读缓冲区，热循环中不再为每块数据分配新的 bytes"""
+    buf = getattr(_buffers, "buf", None)
+    if buf is None or len(buf) < size:
+        buf = bytearray(size)
+        _buffers.buf = buf
+    return memoryview(buf)[:size]
+
+
+class DigestBackend:
+    """
+    内容摘要后端：封装算法（hashlib 中的 md5 / sha1 / sha256 / blake2b / blake2s）与读取方式。
+    - 小文件：readinto 复用缓冲区 + memoryview 切片，零额外分配；
+    - 大文件（>= mmap_threshold）：mmap 整体映射后一次 update（hashlib 会释放 GIL）。
+    对象很小、可 pickle，可直接传入子进程。
+    """
+
+    __slots__ = ("algo", "block_size", "mmap_threshold")
+
+    def __init__(self, algo: str = DEFAULT_ALGO, block_size: int = 1 << 20, mmap_threshold: int = 64 << 20):
+        if algo not in SUPPORTED_ALGOS:
+            raise ValueError(f"Unsupported digest algorithm: {algo} (choose from {', '.join(SUPPORTED_ALGOS)})")
+        self.algo = algo
+        self.block_size = block_size
+        self.mmap_threshold = mmap_threshold
+
+    def new(self):
+        return hashlib.new(self.algo)
+
+    def file_digest(self, path: Path) -> str:
+        """完整读取文件计算摘要"""
+        h = self.new()
+        with open(path, "rb", buffering=0) as f:
+            size = os.fstat(f.fileno()).st_size
+            if self.mmap_threshold and size >= self.mmap_threshold:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    h.update(mm)
+                return h.hexdigest()
+            view = _read_buffer(self.block_size)
+            while True:
+                n = f.readinto(view)
+                if not n:
+                    break
+                h.update(view[:n])
+        return h.hexdigest()
+
+    def edge_digest(self, path: Path, block_size: int = 1 << 16) -> str:
+        """只读首、尾各 block_size 字节计算摘要（见 edge_hash）"""
+        h = self.new()
+        view = _read_buffer(block_size)
+        with open(path, "rb", buffering=0) as f:
+            n = f.readinto(view)
+            h.update(view[:n])
+            size = os.fstat(f.fileno()).st_size
+            if size > block_size:
+                f.seek(max(block_size, size - block_size))
+                n = f.readinto(view)
+                h.update(view[:n])
+        return h.hexdigest()
+
+    def __repr__(self):
+        return f"DigestBackend({self.algo!r})"
+
 
 def md5sum(path: Path, block_size: int = 1 << 20) -> str:
     """分块读取文件，计算 MD5 摘要"""
-    h = hashlib.md5()
-    with path.open("rb") as f:
-        for chunk in iter(lambda: f.read(block_size), b""):
-            h.update(chunk)
-    return h.hexdigest()
-
-def head_block(path: Path, length: int = 512) -> bytes:
-    """读取文件前 length 字节（用于头部对比）"""
-    with path.open("rb") as f:
-        return f.read(length)
-    
-def perceptual_hash(path: Path) -> str:
-    """计算图像的感知哈希（dHash）"""
+    return DigestBackend("md5", block_size).file_digest(path)
+
+def edge_hash(path: Path, block_size: int = 1 << 16, backend: DigestBackend = None) -> str:
+    """
+    只读取文件首、尾各 block_size 字节计算摘要（分级去重的第二级，默认 MD5）。
+    同尺寸但内容不同的照片几乎总在头部（EXIF / 缩略图）或尾部就已不同，
+    这样只有首尾都相同的文件才需要完整读取。
+    """
+    return (backend or DigestBackend()).edge_digest(path, block_size)
+
+PHASH_DRAFT_SIZE = 128    # JPEG 缩放解码的最小边长
+PHASH_REDUCE_SIZE = 512   # 其他格式 reduce() 后的最小边长
+
+
+def load_reduced_gray(img: Image.Image, draft_size: int = PHASH_DRAFT_SIZE,
+                      reduce_size: int = PHASH_REDUCE_SIZE) -> Image.Image:
+    """
+    以尽量低的分辨率得到灰度图，供感知哈希使用：
+    - JPEG：draft() 让解码器直接按 1/2 ~ 1/8 缩放并输出灰度（短边不小于 draft_size），
+      4800 万像素的照片也只解码出几百像素宽的图，内存只与草稿尺寸相关；
+    - 其他格式：无法缩放解码，完整解码后先 reduce() 到短边不小于 reduce_size 再转灰度，
+      省去整幅 RGB 转换。
+    dHash 最终只取 9×8 像素，结果与全尺寸解码一致（见 tests/test_phash_fast.py）。
+    """
+    img.draft("L", (draft_size, draft_size))
+    factor = min(img.size) // reduce_size
+    if factor >= 2:
+        try:
+            img = img.reduce(factor)
+        except ValueError:
+            pass  # 个别模式（如调色板图）不支持 reduce，直接转灰度
+    return img.convert("L")
+
+
+def perceptual_hash(path: Path, fast: bool = True) -> str:
+    """计算图像的感知哈希（dHash）；fast=True 时走降分辨率解码（load_reduced_gray）"""
+    try:
+        with Image.open(path) as img:
+            if fast:
+                return str(imagehash.dhash(load_reduced_gray(img)))
+            return str(imagehash.dhash(img.convert("RGB")))
+    except Exception as e:
+        emit("warn", f"[WARN] Cannot compute perceptual hash for {path.name}: {e}")
+        return ""
+
+
+# 视觉去重的复核哈希：只为 dHash 已落入同一候选组的图片计算（见 DigestIndex.get_visual_duplicates_map）
+CONFIRM_METHODS = ("phash", "whash")
+CONFIRM_DISTANCE = 8       # 复核哈希的最大汉明距离（64 位）
+ASPECT_TOLERANCE = 0.02    # 宽高比的最大相对差
+
+
+def confirm_hash(path: Path, method: str = "phash") -> str:
+    """
+    复核签名 "<宽>x<高>:<哈希>"：尺寸取自文件头（不解码），哈希为 DCT（phash）或小波（whash）感知哈希，
+    同样走降分辨率解码。比 dHash 贵，但只为少数候选图片计算。失败时返回空串。
+    """
+    fn = {"phash": imagehash.phash, "whash": imagehash.whash}[method]
     try:
-        img = Image.open(path).convert("RGB")
-        return str(imagehash.dhash(img))
+        with Image.open(path) as img:
+            width, height = img.size
+            return f"{width}x{height}:{fn(load_reduced_gray(img))}"
     except Exception as e:
-        print(f"[WARN] Cannot compute perceptual hash for {path.name}: {e}")
+        emit("warn", f"[WARN] Cannot compute {method} for {path.name}: {e}")
         return ""
 
+
+def confirm_match(a: str, b: str, max_distance: int = CONFIRM_DISTANCE) -> bool:
+    """两个复核签名是否视为同一画面：宽高比一致（缩放过的副本仍算）且哈希距离不超过 max_distance"""
+    if not a or not b:
+        return False
+    (dims_a, hash_a), (dims_b, hash_b) = a.split(":"), b.split(":")
+    wa, ha = map(int, dims_a.split("x"))
+    wb, hb = map(int, dims_b.split("x"))
+    ra, rb = wa / ha, wb / hb
+    if abs(ra - rb) > ASPECT_TOLERANCE * max(ra, rb):
+        return False
+    return bin(hash_to_int(hash_a) ^ hash_to_int(hash_b)).count("1") <= max_distance
+
+def confirm_split(items, key, confirm, max_distance: int = CONFIRM_DISTANCE):
+    """把一个候选组按复核签名细分：按 key（拍摄时间, 路径）依次作为组首，吸收与之 confirm_match 的其余条目"""
+    pending = sorted(items, key=key)
+    while pending:
+        head, rest = pending[0], pending[1:]
+        matched = {r for r in rest if confirm_match(confirm.get(head), confirm.get(r), max_distance)}
+        pending = [r for r in rest if r not in matched]
+        yield [head] + [r for r in rest if r in matched]
+
+
 class DigestIndex:
+    """
+    去重索引，条目均为 PhotoRecord（拍摄时间 / 大小 / 摘要都取自记录本身，
+    分组与排序时不再重新打开文件）。
+
+    精确去重按“漏斗”分级进行，越往后越贵、参与的文件越少：
+    1. 按 st_size 分桶：尺寸唯一的文件不可能有完全重复，无需读取内容；
+    2. 尺寸冲突的文件计算首尾块哈希（edge_hash）；
+    3. 首尾块仍然冲突的文件才计算完整 MD5。
+
+    视觉去重同样由便宜到贵：dHash（降分辨率解码，每张主图都算，可缓存）先给出候选组，
+    可选的复核哈希（confirm_hash：尺寸 / 宽高比 + pHash 或 wHash）只为落在候选组里的图片计算，
+    图库中绝大多数画面唯一的图片不必计算。
+    """
+
     def __init__(self):
-        self.map = defaultdict(list)  # MD5 → list of (path, date)
-        self.pmap = defaultdict(list) # pHash → list of path
+        self.sizes = defaultdict(list) # size → list of PhotoRecord
+        self.pmap = defaultdict(list)  # pHash → list of PhotoRecord
+
+    def add(self, rec: PhotoRecord):
+        """加入精确去重索引（此时只需 rec.size；rec.date 须已填好）"""
+        self.sizes[rec.size].append(rec)
 
-    def add_md5(self, path: Path, digest: str, date: datetime):
-        self.map[digest].append((path, date))
+    def discard(self, rec: PhotoRecord):
+        """移出索引（如读取失败的文件）"""
+        bucket = self.sizes.get(rec.size)
+        if bucket and rec in bucket:
+            bucket.remove(rec)
+            if not bucket:
+                del self.sizes[rec.size]
 
-    def add_phash(self, path: Path):
-        phash = perceptual_hash(path)
-        if phash:
-            self.pmap[phash].append(path)
+    def needs_edge_hash(self):
+        """第 2 级候选：尺寸冲突、且尚无首尾块哈希的记录"""
+        return [rec for recs in self.sizes.values() if len(recs) > 1
+                for rec in recs if rec.edge is None]
+
+    def needs_full_hash(self):
+        """第 3 级候选：尺寸与首尾块哈希都冲突、且尚无完整摘要的记录"""
+        todo = []
+        for recs in self.sizes.values():
+            if len(recs) < 2:
+                continue
+            by_edge = defaultdict(list)
+            for rec in recs:
+                by_edge[rec.edge].append(rec)
+            for group in by_edge.values():
+                if len(group) > 1:
+                    todo.extend(rec for rec in group if rec.digest is None)
+        return todo
+
+    def add_phash(self, rec: PhotoRecord) -> str:
+        """加入感知哈希索引；rec.phash 已知（如来自缓存）时不再重新计算。返回 pHash"""
+        if rec.phash is None:
+            rec.phash = perceptual_hash(rec.path)
+        if rec.phash:
+            self.pmap[rec.phash].append(rec)
+        return rec.phash
+
+    def fill_from_cache(self, cache, records):
+        """
+        用持久化缓存（DigestCache）填充记录（拍摄时间 / 首尾块哈希 / 摘要 / pHash）。
+        返回仍缺拍摄时间的记录列表（需重新解析元数据）。
+        """
+        return [rec for rec in records if not cache.load_record(rec) or rec.date is None]
+
+    def groups(self):
+        """
+        按 (size, edge, digest) 给出精确重复分组。
+        漏斗中途就被排除的文件（尺寸或首尾块唯一）各自单独成组。
+        """
+        for recs in self.sizes.values():
+            if len(recs) == 1:
+                yield recs
+                continue
+            by_key = defaultdict(list)
+            for rec in recs:
+                by_key[(rec.edge, rec.digest)].append(rec)
+            for group in by_key.values():
+                if len(group) > 1 and group[0].digest is None:
+                    # 理论上不会出现：首尾块冲突者都已计算完整摘要
+                    yield from ([rec] for rec in group)
+                else:
+                    yield group
 
     def get_deduplicated(self):
         results = []
-        for _, files in self.map.items():
+        for files in self.groups():
             if len(files) == 1:
-                results.append((files[0][0], []))
+                results.append((files[0], []))
                 continue
-            sorted_files = sorted(files, key=lambda x: x[1])
-            keep = sorted_files[0][0]
-            keep_head = head_block(keep)
-
-            duplicates = []
-            for f, _ in sorted_files[1:]:
-                if f.stat().st_size != keep.stat().st_size:
-                    continue
-                if head_block(f) == keep_head:
-                    duplicates.append(f)
-                else:
-                    print(f"[WARN] Same digest but head differs: {f.name}")
-            results.append((keep, duplicates))
+            # 同组内 size / 首尾块 / 完整 MD5 都已相同，无需再比对文件头
+            sorted_files = sorted(files, key=lambda r: r.date)
+            results.append((sorted_files[0], sorted_files[1:]))
         return results
 
-    def get_visual_duplicates_map(self):
+    def visual_candidates(self, max_distance: int = 0):
+        """
+        按 dHash 给出的候选组（只含多于一张图的组）：max_distance=0 时只合并 dHash 完全相同者；
+        >0 时借助多索引哈希找出汉明距离不超过 max_distance 的哈希对，再用并查集传递地合并（见 cluster.cluster_pairs），
+        组按其中最早拍摄的图片排序
+        """
+        groups = list(self.pmap.values())
+        if max_distance > 0 and len(groups) > 1:
+            groups = self._near_groups(groups, max_distance)
+        return [recs for recs in groups if len(recs) > 1]
+
+    def get_visual_duplicates_map(self, max_distance: int = 0, confirm=None,
+                                  confirm_distance: int = CONFIRM_DISTANCE):
+        """
+        视觉重复分组：{最早的记录: [其余记录]}，候选组见 visual_candidates。
+        confirm 为 记录 → 复核签名（confirm_hash）时，每个候选组再按复核签名细分：
+        按拍摄时间依次作为组首，吸收与之 confirm_match 的其余记录；没有签名的记录不并入任何组。
+        复核只会拆分候选组、不会合并 dHash 未配对的记录，因此只能提高精度，召回率可能下降。
+        """
+        groups = self.visual_candidates(max_distance)
+        if confirm is not None:
+            groups = [sub for recs in groups for sub in self._confirm_split(recs, confirm, confirm_distance)]
+
         result = {}
-        for _, paths in self.pmap.items():
-            if len(paths) > 1:
-                sorted_group = sorted(paths, key=lambda p: get_photo_datetime(p))
+        for recs in groups:
+            if len(recs) > 1:
+                sorted_group = sorted(recs, key=lambda r: r.date)
                 keep = sorted_group[0]
                 dupes = sorted_group[1:]
                 result[keep] = dupes
         return result
+
+    @staticmethod
+    def _confirm_split(recs, confirm, max_distance: int):
+        return confirm_split(recs, lambda r: (r.date, str(r.path)), confirm, max_distance)
+
+    def _near_groups(self, exact_groups, max_distance: int):
+        """在“完全相同的 pHash”分组之上，把汉明距离不超过 max_distance 的分组用并查集传递地合并（A~B、B~C ⇒ 同组）"""
+        # 组按组内最早的 (拍摄时间, 路径) 排序，合并后的组依次由最早者所在的组打头
+        exact_groups = sorted(exact_groups, key=lambda recs: min((r.date, str(r.path)) for r in recs))
+        mih = MultiIndexHash(max_distance)
+        for recs in exact_groups:
+            mih.add(hash_to_int(recs[0].phash))
+        i, j = mih.pair_arrays()
+        clusters = cluster_pairs(range(len(exact_groups)), i, j, min_size=1)
+        return [[rec for g in members for rec in exact_groups[g]] for members in clusters]
@@ -0,0 +1,105 @@
+# events.py
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Optional, Union
+import json
+
+# 事件种类：
+# info / warn / error —— 一般提示；placed —— 主图放入输出目录；duplicate —— 精确 / 视觉重复放入 duplicates；
+# skipped —— 幂等跳过；resume —— 断点续跑；progress —— 0..100 的累计进度；summary —— 结束时的汇总
+EVENT_KINDS = ("info", "warn", "error", "placed", "duplicate", "skipped", "resume", "progress", "summary")
+
+
+class Event:
+    """一条结构化事件。message 为渲染好的一行文本（与原先 print 的内容相同），src / dst / value 供程序使用"""
+
+    __slots__ = ("kind", "message", "src", "dst", "value")
+
+    def __init__(self, kind: str, message: str, src: Optional[Path] = None, dst: Optional[Path] = None,
+                 value: Optional[int] = None):
+        self.kind = kind
+        self.message = message
+        self.src = src
+        self.dst = dst
+        self.value = value
+
+    def to_dict(self) -> dict:
+        d = {"kind": self.kind, "message": self.message}
+        if self.src is not None:
+            d["src"] = str(self.src)
+        if self.dst is not None:
+            d["dst"] = str(self.dst)
+        if self.value is not None:
+            d["value"] = self.value
+        return d
+
+    def __repr__(self):
+        return f"Event({self.kind}, {self.message!r})"
+
+
+Sink = Callable[[Event], None]
+
+# 当前订阅者。订阅 / 退订时整体替换元组，emit 无需加锁即可在任意线程中遍历
+_sinks: tuple = ()
+
+
+def emit(kind: str, message: str, src: Optional[Path] = None, dst: Optional[Path] = None,
+         value: Optional[int] = None):
+    """
+    发出一条事件。没有订阅者时退回 print(message)（progress 不打印），
+    因此直接调用库函数的脚本 / 测试看到的输出与以前一致。
+    """
+    sinks = _sinks
+    if not sinks:
+        if kind != "progress":
+            print(message)
+        return
+    event = Event(kind, message, src, dst, value)
+    for sink in sinks:
+        sink(event)
+
+
+@contextmanager
+def subscribe(sink: Sink):
+    """在 with 块内把事件交给 sink（可在任意线程中被调用，应尽快返回）"""
+    global _sinks
+    _sinks = _sinks + (sink,)
+    try:
+        yield sink
+    finally:
+        _sinks = tuple(s for s in _sinks if s is not sink)
+
+
+# ---------- 命令行渲染 ----------
+
+def text_sink(event: Event):
+    """与原先的 print 输出相同"""
+    if event.kind != "progress":
+        print(event.message)
+
+
+def json_sink(event: Event):
+    """每个事件一行 JSON（--log-format json）"""
+    print(json.dumps(event.to_dict(), ensure_ascii=False))
+
+
+class ProgressThrottle:
+    """
+    包装 progress_callback：只在百分比变化时回调，并同时发出 progress 事件。
+    每个文件都会调用一次，但 0..100 之间最多真正回调 101 次。
+    """
+
+    __slots__ = ("callback", "last")
+
+    def __init__(self, callback: Optional[Callable[[int], None]] = None):
+        self.callback = callback
+        self.last = -1
+
+    def __call__(self, percent: Union[int, float]):
+        percent = max(0, min(100, int(percent)))
+        if percent == self.last:
+            return
+        self.last = percent
+        if self.callback:
+            self.callback(percent)
+        emit("progress", f"{percent}%", value=percent)
@@ -0,0 +1,122 @@
+# groups.py
+from array import array
+from typing import Iterable, Iterator, List, Optional, Sequence, Union
+
+# 分组种类：精确重复 / 视觉重复
+GROUP_KINDS = ("md5", "visual")
+_KIND_CODES = {kind: code for code, kind in enumerate(GROUP_KINDS)}
+
+
+class _PathTable:
+    """路径表：所有路径 UTF-8 编码后首尾相接存进一个 bytearray，按整数 id 取回（不为每条路径保留 str 对象）"""
+
+    __slots__ = ("_blob", "_offsets")
+
+    def __init__(self):
+        self._blob = bytearray()
+        self._offsets = array("Q", [0])
+
+    def add(self, path) -> int:
+        self._blob += str(path).encode("utf-8", "surrogateescape")
+        self._offsets.append(len(self._blob))
+        return len(self._offsets) - 2
+
+    def get(self, pid: int) -> str:
+        return self._blob[self._offsets[pid]:self._offsets[pid + 1]].decode("utf-8", "surrogateescape")
+
+    def nbytes(self) -> int:
+        return len(self._blob) + self._offsets.itemsize * len(self._offsets)
+
+
+class GroupStore:
+    """
+    供回顾的重复分组的紧凑存储（替代 list[dict]）：每组一个种类字节、保留图与其源文件的路径 id，
+    重复图的路径 id 连续存放在一个数组里，按偏移取出。10 万组也只是几个数组加一块路径字节。
+
+    为兼容原来的 list[dict] 用法，store[i] / 迭代 / len 仍按
+    {"kind", "keep", "keep_src", "dupes"} 的字典形式给出（按需构造，不常驻内存）；
+    界面等热路径应直接用 kind(i) / keep(i) / dupes(i) / indices(kind)。
+    """
+
+    def __init__(self, groups: Optional[Iterable[dict]] = None):
+        self._paths = _PathTable()
+        self._kinds = array("B")
+        self._keep = array("I")
+        self._keep_src = array("I")
+        self._dupe_start = array("I", [0])
+        self._dupes = array("I")
+        for g in groups or ():
+            self.add(g["kind"], g["keep"], g.get("keep_src", g["keep"]), g["dupes"])
+
+    def add(self, kind: str, keep, keep_src, dupes: Sequence) -> int:
+        """追加一组，返回其序号"""
+        self._kinds.append(_KIND_CODES[kind])
+        self._keep.append(self._paths.add(keep))
+        self._keep_src.append(self._paths.add(keep_src))
+        self._dupes.extend(self._paths.add(d) for d in dupes)
+        self._dupe_start.append(len(self._dupes))
+        return len(self._kinds) - 1
+
+    # ---------- 单组访问 ----------
+
+    def __len__(self) -> int:
+        return len(self._kinds)
+
+    def kind(self, i: int) -> str:
+        return GROUP_KINDS[self._kinds[i]]
+
+    def keep(self, i: int) -> str:
+        return self._paths.get(self._keep[i])
+
+    def keep_src(self, i: int) -> str:
+        return self._paths.get(self._keep_src[i])
+
+    def n_dupes(self, i: int) -> int:
+        return self._dupe_start[i + 1] - self._dupe_start[i]
+
+    def dupes(self, i: int) -> List[str]:
+        return [self._paths.get(pid) for pid in self._dupes[self._dupe_start[i]:self._dupe_start[i + 1]]]
+
+    def __getitem__(self, i: int) -> dict:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return {"kind": self.kind(i), "keep": self.keep(i), "keep_src": self.keep_src(i), "dupes": self.dupes(i)}
+
+    def __iter__(self) -> Iterator[dict]:
+        return (self[i] for i in range(len(self)))
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (GroupStore, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    # ---------- 过滤 / 统计 ----------
+
+    def indices(self, kind: Optional[str] = None) -> Union[range, array]:
+        """kind 为空时返回 range（不占内存），否则返回该种类各组的序号"""
+        if kind is None:
+            return range(len(self))
+        code = _KIND_CODES[kind]
+        return array("I", (i for i, k in enumerate(self._kinds) if k == code))
+
+    def counts(self) -> dict:
+        return {kind: self._kinds.count(code) for kind, code in _KIND_CODES.items()}
+
+    def nbytes(self) -> int:
+        """近似占用的字节数（不含对象头）"""
+        arrays = (self._kinds, self._keep, self._keep_src, self._dupe_start, self._dupes)
+        return self._paths.nbytes() + sum(a.itemsize * len(a) for a in arrays)
+
+    # ---------- 序列化（计划文件中仍是字典列表） ----------
+
+    def to_list(self) -> List[dict]:
+        return list(self)
+
+    @classmethod
+    def from_list(cls, groups: Iterable[dict]) -> "GroupStore":
+        return cls(groups)
+
+    def __repr__(self):
+        return f"GroupStore({len(self)} groups, {self.counts()})"
@@ -0,0 +1,134 @@
+# journal.py
+from pathlib import Path
+from typing import Dict, Optional
+import json
+import os
+
+from photo_organizer.cache import DigestCache
+from photo_organizer.events import emit
+from photo_organizer.placement import part_path
+
+JOURNAL_FILENAME = ".photo_organizer_journal.jsonl"
+
+
+class Journal:
+    """
+    预写操作日志（append-only JSONL），每次运行一份，放在输出目录下：
+    - 每个放置先写一行计划（"place"，带自增 id），完成后再写一行 "done"；
+    - 计划行带上内容摘要与来源（origin），done 行带上目标文件的指纹，恢复时据此确认结果而不必重新读取内容；
+    - 运行正常结束时删除日志文件：日志存在即表示上次运行被中断。
+    每行写完即 flush 到操作系统（进程被杀不丢）；每 fsync_every 行以及结束时 fsync（断电最多丢最后一批）。
+    """
+
+    def __init__(self, path: Path, fsync_every: int = 256):
+        self.path = Path(path)
+        self.fsync_every = fsync_every
+        self._f = None
+        self._next_id = 0
+        self._unsynced = 0
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def open(self, **header):
+        """开始新的一份日志（覆盖旧日志），首行记录本次运行的参数"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = open(self.path, "w", encoding="utf-8")
+        self._write({"op": "begin", **header})
+
+    def _write(self, entry: dict):
+        self._f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._f.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        if self._f is not None and self._unsynced:
+            os.fsync(self._f.fileno())
+            self._unsynced = 0
+
+    def plan(self, op: str, **fields) -> int:
+        """记录一个即将执行的操作，返回其 id"""
+        op_id = self._next_id
+        self._next_id += 1
+        self._write({"op": op, "id": op_id, **fields})
+        return op_id
+
+    def done(self, op_id: int, **fields):
+        self._write({"op": "done", "id": op_id, **fields})
+
+    def close(self, completed: bool = True):
+        """completed=True：运行完整结束，删除日志；否则保留以便 --resume"""
+        if self._f is None:
+            return
+        self.sync()
+        self._f.close()
+        self._f = None
+        if completed:
+            self.path.unlink(missing_ok=True)
+
+    @staticmethod
+    def load(path: Path):
+        """
+        读取日志，返回 (header, ops)：ops 为 id → 计划行，已完成的计划行带有 "result"（对应的 done 行）。
+        崩溃时可能写了一半的最后一行会被忽略。
+        """
+        header, ops = {}, {}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                op = entry.get("op")
+                if op == "begin":
+                    header = entry
+                elif op == "done":
+                    if entry["id"] in ops:
+                        ops[entry["id"]]["result"] = entry
+                else:
+                    ops[entry["id"]] = entry
+        return header, ops
+
+
+def replay(path: Path, cache: Optional[DigestCache] = None) -> Dict[str, Path]:
+    """
+    恢复被中断的运行：
+    - 放置已完成（有 done 行，或 rename 已完成但 done 行未写入）且目标未被改动：
+      把摘要与来源写回缓存（之后的幂等判断不读内容），并返回 源文件 → 目标路径，
+      供本次运行把这些文件当作“已放置”；跨文件系统的 move 若已放到位而源文件还在，补做删除；
+    - 计划了但未完成的放置：清理残留的 .part（最终文件名下不会有半个文件），交给本次运行重新放置。
+    """
+    header, ops = Journal.load(path)
+    placed: Dict[str, Path] = {}
+    n_done = n_redo = n_finished = 0
+    for entry in ops.values():
+        if entry["op"] != "place":
+            continue
+        result = entry.get("result")
+        rec, dst = Path(entry["rec"]), Path(entry["dst"])
+        if result is None:
+            part = part_path(dst)
+            if os.path.lexists(part):
+                os.unlink(part)
+            if not dst.exists():
+                n_redo += 1
+                continue
+            if entry.get("how") == "move" and rec.exists():
+                # 已复制到位（.part 先完整写好才 rename），只差删除源文件
+                rec.unlink()
+                n_finished += 1
+        try:
+            st = dst.stat()
+        except OSError:
+            continue  # 之后又被挪走：以本次运行的判断为准
+        if result is not None and (st.st_size, st.st_mtime_ns, st.st_ino) != tuple(result["fingerprint"]):
+            continue  # 之后被改动过
+        if cache is not None:
+            cache.put(dst, st, digest=entry.get("digest"), origin=entry.get("origin"))
+        placed[entry["rec"]] = dst
+        n_done += 1
+    emit("resume", f"[RESUME] journal from {header.get('started', '?')}: {n_done} placements confirmed, "
+                   f"{n_finished} pending moves finished, {n_redo} to redo")
+    return placed
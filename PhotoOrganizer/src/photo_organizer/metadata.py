@@ -2,19 +2,178 @@ from pathlib import Path
 from PIL import Image
 import piexif
 import os
+import struct
 from datetime import datetime
 from typing import Optional
 
-def get_photo_datetime(path: Path) -> Optional[datetime]:
-    """从 EXIF 中提取 DateTimeOriginal，否则 fallback 到文件创建时间"""
+EXIF_DATE_FORMAT = "%Y:%m:%d %H:%M:%S"
+HEADER_PROBE_BYTES = 8 * 1024   # 绝大多数照片的 EXIF 日期都在前几 KB 内
+HEADER_READ_BYTES = 128 * 1024  # JPEG APP1 最长 64 KiB，前面通常只有一个很小的 APP0
+
+TAG_EXIF_IFD = 0x8769
+TAG_DATETIME_ORIGINAL = 0x9003
+
+# 快速读取器无法判断时返回的哨兵（结构异常等），此时回退到 Pillow + piexif
+UNDECIDED = object()
+# 内部哨兵：所需数据超出已读范围，需要多读一些再试
+_TRUNCATED = object()
+
+
+def _parse_exif_date(raw: bytes) -> Optional[datetime]:
+    """解析 "YYYY:MM:DD HH:MM:SS"；标准 19 字节格式直接切片转换，其余交给 strptime"""
+    try:
+        if len(raw) == 19 and raw[4] == raw[7] == 0x3A and raw[10] == 0x20:
+            return datetime(int(raw[0:4]), int(raw[5:7]), int(raw[8:10]),
+                            int(raw[11:13]), int(raw[14:16]), int(raw[17:19]))
+        return datetime.strptime(raw.decode(), EXIF_DATE_FORMAT)
+    except (UnicodeDecodeError, ValueError):
+        return None  # 与原路径一致：无法解析的日期按“没有日期”处理
+
+
+def _tiff_datetime_original(tiff: bytes, complete: bool = True):
+    """
+    直接遍历 TIFF 结构：IFD0 → Exif IFD → DateTimeOriginal。
+    返回 datetime；确定没有该标签（或值无法解析）时返回 None；结构异常时返回 UNDECIDED。
+    complete=False 表示 tiff 只是 EXIF 段的前一部分：越界时返回 _TRUNCATED 以便多读一些再试
+    （日期所在的 IFD 通常紧跟在段首，缩略图等大块数据在段尾，往往不必读完整段）。
+    """
+    incomplete = UNDECIDED if complete else _TRUNCATED
+    if len(tiff) < 8:
+        return incomplete
+    bo = {b"II": "<", b"MM": ">"}.get(tiff[:2])
+    if bo is None or struct.unpack(bo + "H", tiff[2:4])[0] != 42:
+        return UNDECIDED
+
+    def find_tag(ifd_offset: int, wanted: int):
+        """在指定 IFD 中查找标签，返回 (type, count, value_field_offset)；未找到返回 None"""
+        (n,) = struct.unpack_from(bo + "H", tiff, ifd_offset)
+        if ifd_offset + 2 + n * 12 > len(tiff):
+            raise struct.error("IFD entries out of range")
+        for i in range(n):
+            entry = ifd_offset + 2 + i * 12
+            tag, typ, count = struct.unpack_from(bo + "HHI", tiff, entry)
+            if tag == wanted:
+                return typ, count, entry + 8
+        return None
+
     try:
-        img = Image.open(path)
-        exif_dict = piexif.load(img.info.get("exif", b""))
+        (ifd0,) = struct.unpack_from(bo + "I", tiff, 4)
+        found = find_tag(ifd0, TAG_EXIF_IFD)
+        if found is None:
+            return None
+        (exif_ifd,) = struct.unpack_from(bo + "I", tiff, found[2])
+        found = find_tag(exif_ifd, TAG_DATETIME_ORIGINAL)
+        if found is None:
+            return None
+        typ, count, field = found
+        if typ != 2:  # 非 ASCII：交给 piexif 判断
+            return UNDECIDED
+        if count > 4:
+            (field,) = struct.unpack_from(bo + "I", tiff, field)
+        raw = tiff[field:field + count]
+        if len(raw) < count:
+            return incomplete
+    except struct.error:
+        return incomplete
+
+    raw = raw.rstrip(b"\x00")
+    return _parse_exif_date(raw) if raw else None
+
+
+def _jpeg_exif_datetime(data: bytes):
+    """遍历 JPEG 标记段，找到第一个 APP1 Exif 段；遇到 SOS 仍未找到则确定没有 EXIF"""
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return UNDECIDED
+        marker = data[pos + 1]
+        if marker == 0xFF:  # 填充字节
+            pos += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:  # 无长度的独立标记
+            pos += 2
+            continue
+        if marker in (0xDA, 0xD9):  # 图像数据开始 / 结束
+            return None
+        (length,) = struct.unpack_from(">H", data, pos + 2)
+        end = pos + 2 + length
+        if marker == 0xE1 and data[pos + 4:pos + 10] == b"Exif\x00\x00":
+            return _tiff_datetime_original(data[pos + 10:end], complete=end <= len(data))
+        pos = end
+    return _TRUNCATED  # 已读部分里还没见到图像数据
+
+
+def _png_exif_datetime(data: bytes):
+    """遍历 PNG 块，找到 IDAT 之前的 eXIf 块（与 Pillow 打开文件时读取的范围一致）"""
+    pos = 8
+    while pos + 8 <= len(data):
+        length, ctype = struct.unpack_from(">I4s", data, pos)
+        if ctype == b"IDAT" or ctype == b"IEND":
+            return None
+        if ctype == b"eXIf":
+            chunk = data[pos + 8:pos + 8 + length]
+            return _tiff_datetime_original(chunk, complete=len(chunk) == length)
+        pos += 12 + length
+    return _TRUNCATED
+
+
+def read_exif_datetime_fast(path: Path):
+    """
+    只读取文件头部（先 8 KB，不够再补到 128 KB），直接解析 JPEG APP1 / PNG eXIf 中的
+    DateTimeOriginal，不经过 Pillow 的图像解析，也不把整段 EXIF 交给 piexif。
+    返回 datetime / None（确定没有）/ UNDECIDED（无法判断，调用方应回退到完整路径）。
+    """
+    # os.open / os.read：避免为读几 KB 创建缓冲文件对象
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        data = os.read(fd, HEADER_PROBE_BYTES)
+        if data[:2] == b"\xff\xd8":
+            parse = _jpeg_exif_datetime
+        elif data[:8] == b"\x89PNG\r\n\x1a\n":
+            parse = _png_exif_datetime
+        else:
+            return UNDECIDED
+        result = parse(data)
+        if result is _TRUNCATED and len(data) == HEADER_PROBE_BYTES:
+            data += os.read(fd, HEADER_READ_BYTES - len(data))
+            result = parse(data)
+    finally:
+        os.close(fd)
+    return UNDECIDED if result is _TRUNCATED else result
+
+
+def _pillow_exif_datetime(path: Path) -> Optional[datetime]:
+    """完整路径：Pillow 打开文件，交给 piexif 解析整段 EXIF"""
+    try:
+        with Image.open(path) as img:
+            exif_raw = img.info.get("exif", b"")
+        exif_dict = piexif.load(exif_raw)
         dt_raw = exif_dict["Exif"].get(piexif.ExifIFD.DateTimeOriginal)
         if dt_raw:
-            return datetime.strptime(dt_raw.decode(), "%Y:%m:%d %H:%M:%S")
+            return datetime.strptime(dt_raw.decode(), EXIF_DATE_FORMAT)
     except Exception as e:
         pass
-    
+    return None
+
+
+def get_photo_datetime(path: Path, ctime: Optional[float] = None, fast: bool = True) -> Optional[datetime]:
+    """
+    从 EXIF 中提取 DateTimeOriginal，否则 fallback 到文件创建时间。
+    ctime 已知（如来自扫描时的 stat 快照）时直接使用，避免再次 stat。
+    fast=True 时先用 read_exif_datetime_fast 只解析文件头，无法判断时才走 Pillow + piexif。
+    """
+    dt = UNDECIDED
+    if fast:
+        try:
+            dt = read_exif_datetime_fast(path)
+        except OSError:
+            pass
+    if dt is UNDECIDED:
+        dt = _pillow_exif_datetime(path)
+    if dt is not None:
+        return dt
+
     # fallback
-    return datetime.fromtimestamp(os.path.getctime(path))
+    if ctime is None:
+        ctime = os.path.getctime(path)
+    return datetime.fromtimestamp(ctime)
@@ -0,0 +1,177 @@
+# neardup.py
+from collections import defaultdict
+from itertools import combinations
+from math import comb
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+
+def hash_to_int(phash: str) -> int:
+    """imagehash 输出的十六进制字符串 → 整数（64 位 dHash）"""
+    return int(phash, 16)
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def _flip_masks(width: int, radius: int) -> List[int]:
+    """宽度为 width 的段内，汉明距离 <= radius 的所有翻转掩码（含 0）"""
+    masks = [0]
+    for r in range(1, radius + 1):
+        for bits in combinations(range(width), r):
+            m = 0
+            for b in bits:
+                m |= 1 << b
+            masks.append(m)
+    return masks
+
+
+class MultiIndexHash:
+    """
+    多索引哈希（multi-index hashing），用于在大量 64 位感知哈希中查找汉明近邻：
+    - 把哈希切成 n_bands 段，每段各建一张 段值 → id 列表 的表；
+    - 鸽巢原理：若两哈希距离 <= max_distance，则至少有一段的段内距离 <= max_distance // n_bands；
+    - 查询时每段只探测这个小半径内的段值，再对候选做精确的 popcount 校验。
+    每段 16 位时，百万级哈希的桶平均只有十几个元素，整体远低于 O(n²)。
+
+    query() 适合增量查找；一次性枚举全部近邻对时 pairs() 会按数据量重新选择分段，
+    用 NumPy 排序 + 二分批量完成，百万级哈希可在数秒内完成。
+    """
+
+    def __init__(self, max_distance: int = 0, bits: int = 64, n_bands: int = 4):
+        if max_distance < 0:
+            raise ValueError("max_distance must be >= 0")
+        n_bands = max(1, min(n_bands, bits))
+        self.max_distance = max_distance
+        self.bits = bits
+        self.radius = max_distance // n_bands
+
+        # 各段 (起始位, 宽度)，尽量均分
+        base, extra = divmod(bits, n_bands)
+        self.bands: List[Tuple[int, int]] = []
+        start = 0
+        for i in range(n_bands):
+            width = base + (1 if i < extra else 0)
+            self.bands.append((start, width))
+            start += width
+        self._masks = {w: _flip_masks(w, self.radius) for _, w in self.bands}
+
+        self.hashes: List[int] = []
+        # 段表按需构建：只做批量 pairs() 时完全不需要
+        self.tables: List[Dict[int, List[int]]] = [defaultdict(list) for _ in self.bands]
+        self._n_indexed = 0
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def _segments(self, h: int):
+        for start, width in self.bands:
+            yield (h >> start) & ((1 << width) - 1)
+
+    def add(self, h: int) -> int:
+        """加入一个哈希，返回其 id（按加入顺序递增）"""
+        self.hashes.append(h)
+        return len(self.hashes) - 1
+
+    def _ensure_tables(self):
+        for idx in range(self._n_indexed, len(self.hashes)):
+            for table, seg in zip(self.tables, self._segments(self.hashes[idx])):
+                table[seg].append(idx)
+        self._n_indexed = len(self.hashes)
+
+    def query(self, h: int) -> List[int]:
+        """返回与 h 距离 <= max_distance 的所有 id（按 id 升序）"""
+        self._ensure_tables()
+        found = set()
+        for (start, width), table, seg in zip(self.bands, self.tables, self._segments(h)):
+            for mask in self._masks[width]:
+                for idx in table.get(seg ^ mask, ()):
+                    if idx not in found and hamming(self.hashes[idx], h) <= self.max_distance:
+                        found.add(idx)
+        return sorted(found)
+
+    def pairs(self) -> Iterator[Tuple[int, int]]:
+        """枚举所有距离 <= max_distance 的 (i, j)，i < j，每对只出现一次"""
+        if self.bits > 64:
+            for i, h in enumerate(self.hashes):
+                for j in self.query(h):
+                    if j > i:
+                        yield i, j
+            return
+        yield from self._pairs_batch()
+
+    def _choose_banding(self, n: int) -> List[Tuple[int, int]]:
+        """
+        批量枚举时按数据量重新选择分段：段越宽桶越小、但段内半径越大要探测的掩码越多。
+        用 “段数 × 掩码数 × (n + 候选对数)” 估算代价，取最小者（段宽约为 log2(n) 时最优）。
+        """
+        best, best_cost = 1, None
+        for m in range(1, 9):
+            width = self.bits // m
+            radius = self.max_distance // m
+            n_masks = sum(comb(width, r) for r in range(radius + 1))
+            cost = m * n_masks * (n + n * n / (1 << width))
+            if best_cost is None or cost < best_cost:
+                best, best_cost = m, cost
+        base, extra = divmod(self.bits, best)
+        bands, start = [], 0
+        for i in range(best):
+            width = base + (1 if i < extra else 0)
+            bands.append((start, width))
+            start += width
+        return bands
+
+    def pair_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """与 pairs() 相同的近邻对，以两个 int64 数组 (i, j) 给出（供 cluster.UnionFind 批量合并，不逐对建元组）"""
+        if self.bits > 64:
+            pairs = list(self.pairs())
+            return (np.array([i for i, _ in pairs], dtype=np.int64),
+                    np.array([j for _, j in pairs], dtype=np.int64))
+        chunks = list(self._pair_chunks())
+        if not chunks:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        return (np.concatenate([i for i, _ in chunks]).astype(np.int64),
+                np.concatenate([j for _, j in chunks]).astype(np.int64))
+
+    def _pairs_batch(self) -> Iterator[Tuple[int, int]]:
+        for i, j in self._pair_chunks():
+            yield from zip(i.tolist(), j.tolist())
+
+    def _pair_chunks(self) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        NumPy 批量版本：每段把段值排序后，对每个翻转掩码 m 用 searchsorted 找出
+        段值恰为 seg ^ m 的区间，展开成候选对后统一做 popcount 校验。
+        同一对可能在多段同时命中，只在“第一个段内距离 <= 半径的段”输出，避免去重集合。
+        """
+        n = len(self.hashes)
+        if n < 2:
+            return
+        bands = self._choose_banding(n)
+        radius = self.max_distance // len(bands)
+        h = np.fromiter(self.hashes, dtype=np.uint64, count=n)
+        segs = [(h >> np.uint64(start)) & np.uint64((1 << width) - 1) for start, width in bands]
+        for b, ((_, width), seg) in enumerate(zip(bands, segs)):
+            order = np.argsort(seg, kind="stable")
+            sorted_seg = seg[order]
+            for mask in _flip_masks(width, radius):
+                target = sorted_seg ^ np.uint64(mask)
+                lo = np.searchsorted(sorted_seg, target, "left")
+                hi = np.searchsorted(sorted_seg, target, "right")
+                counts = hi - lo
+                total = int(counts.sum())
+                if not total:
+                    continue
+                # 展开区间：第 p 个位置与 sorted 中 [lo[p], hi[p]) 的每个位置配对
+                src = np.repeat(np.arange(n), counts)
+                offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+                i, j = order[src], order[np.repeat(lo, counts) + offsets]
+                ok = i < j
+                i, j = i[ok], j[ok]
+                ok = np.bitwise_count(h[i] ^ h[j]) <= self.max_distance
+                for earlier in segs[:b]:
+                    ok &= np.bitwise_count(earlier[i] ^ earlier[j]) > radius
+                if ok.any():
+                    yield i[ok], j[ok]
@@ -1,321 +1,270 @@
 # organizer.py
+from datetime import datetime
+from functools import partial
 from pathlib import Path
-import shutil
-from typing import Iterable, Dict, List, Optional
-import os
-
-from photo_organizer.metadata import get_photo_datetime
-from photo_organizer.digest import md5sum, DigestIndex
-from photo_organizer.renamer import build_new_filename
+from typing import Dict, List, Optional
+
+from photo_organizer.record import PhotoRecord
+from photo_organizer.digest import (DigestBackend, DEFAULT_ALGO, perceptual_hash, DigestIndex, confirm_hash,
+                                    CONFIRM_DISTANCE)
+from photo_organizer.events import emit
+from photo_organizer.parallel import run_chunked
+from photo_organizer.cache import DigestCache, CACHE_FILENAME
+from photo_organizer.output_index import OutputIndex
+from photo_organizer.planning import (decide_plan, date_task, digest_task, edge_task, guarded, make_reporter,
+                                      name_keepers)
+from photo_organizer.copy_engine import DEFAULT_COPY_THREADS
+from photo_organizer.journal import JOURNAL_FILENAME, replay
+from photo_organizer.placement import DEFAULT_MODE, PLACEMENT_MODES
+from photo_organizer.plan import OrganizePlan, apply_plan, print_summary, summary_counts
+from photo_organizer.stats import RunStats
+from photo_organizer.walker import walk_images, IMAGE_EXTS
+
+
+# ---------- 规划 ----------
+
+def _build_plan(input_dir: Path, output_dir: Path, duplicate_dir: Path, cache: Optional[DigestCache],
+                workers: int, hash_algo: str, visual_distance: int, mode: str, scan_threads: int,
+                report, resumed: Dict[str, Path], stats: RunStats, visual_confirm: Optional[str] = None,
+                confirm_distance: int = CONFIRM_DISTANCE) -> OrganizePlan:
+    """
+    Phase 1: 分级构建精确去重索引（size → 首尾块哈希 → 完整摘要，算法由 hash_algo 指定）
+    Phase 2: 对所有精确去重后的主图计算感知哈希（直接读源文件）
+    Phase 3: 视觉去重（保留拍摄时间最早者）；visual_confirm 不为空时，
+             只为 dHash 候选组中的图片计算复核哈希（phash / whash）并据此细分
+    Phase 4: 为每个文件决定最终位置：主图 → 输出目录，精确 / 视觉重复 → duplicates/，
+             同名冲突通过 OutputIndex 解决，尚未写入的目标先预留。
+    全程不写入输出目录（缓存除外），视觉重复不会先放进输出目录再删掉。
+    resumed 为断点续跑时上次已放好的 源文件 → 目标，落点仍然正确的直接沿用。
+    各阶段的耗时与读取量记入 stats。
+    """
+    # 递归遍历图片，output_dir 与 duplicate_dir 在进入前即被剪掉；
+    # 每个文件只在扫描时 stat 一次，之后各阶段都使用同一个 PhotoRecord
+    with stats.phase("scan") as ph:
+        records: List[PhotoRecord] = [
+            PhotoRecord(path, st)
+            for path, st in walk_images(input_dir, IMAGE_EXTS, [output_dir, duplicate_dir], scan_threads)
+        ]
+        ph.files = len(records)
+    emit("info", f"[INFO] Found {len(records)} images in {input_dir}")
+
+    backend = DigestBackend(hash_algo)
+    index = DigestIndex()
 
+    # 输出 / duplicates 目录索引：同名冲突判断只查字典，尽量复用已知摘要；缺失的目录留到执行时统一创建
+    outputs = OutputIndex(cache, backend, create_dirs=False)
 
-# ---------- 基础工具 ----------
+    # -----------------------------
+    # Phase 1: 分级构建精确去重索引
+    # -----------------------------
+    def run_stage(phase: str, fn, todo: List[PhotoRecord]):
+        """并行执行一级计算，按输入顺序返回 (rec, value)；失败的记录移出索引"""
+        results = run_chunked(
+            partial(guarded, fn), todo, workers,
+            on_progress=lambda done: report(phase, done, len(todo)),
+        )
+        for rec, (value, err) in zip(todo, results):
+            if err is not None:
+                emit("error", f"[ERROR] Failed to process {phase} for {rec.path}: {err}")
+                index.discard(rec)
+                continue
+            yield rec, value
+
+    # 1a. 缓存填充 + 拍摄时间（每个文件都要用它命名）
+    with stats.phase("meta") as ph:
+        todo = index.fill_from_cache(cache, records) if cache is not None else records
+        for rec in records:
+            index.add(rec)
+        for rec, date in run_stage("meta", date_task, todo):
+            rec.date = date
+        ph.files = len(todo)
+
+    # 1b. 仅对尺寸冲突者读取首尾块
+    n_edge = 0
+    with stats.phase("edge") as ph:
+        for rec, edge in run_stage("edge", partial(edge_task, backend), index.needs_edge_hash()):
+            rec.edge = edge
+            n_edge += 1
+            ph.bytes_read += min(rec.size, 2 << 16)
+        ph.files = n_edge
+
+    # 1c. 首尾块仍冲突者才完整读取
+    n_full = 0
+    with stats.phase("digest") as ph:
+        for rec, digest in run_stage("md5", partial(digest_task, backend), index.needs_full_hash()):
+            rec.digest = digest
+            n_full += 1
+            ph.bytes_read += rec.size
+        ph.files = n_full
+
+    emit("info", f"[INFO] Exact dedup funnel: {len(index.sizes)} size buckets, "
+                 f"{n_edge} edge-hashed, {n_full} fully hashed")
+
+    if cache is not None:
+        for rec in records:
+            cache.store_record(rec)
+        cache.flush()
+
+    dedup_groups, names = name_keepers(index.get_deduplicated())
 
-def _is_under(child: Path, parent: Path) -> bool:
-    try:
-        child.resolve().relative_to(parent.resolve())
-        return True
-    except Exception:
-        return False
+    # -----------------------------
+    # Phase 2: 对 MD5 主图做感知哈希
+    # -----------------------------
+    keepers = [keep for keep, _ in dedup_groups]
+    n_phash_total = len(keepers)
+
+    # 缓存命中的记录已带 pHash，只为其余记录计算
+    todo = [rec for rec in keepers if rec.phash is None]
+    n_cached = n_phash_total - len(todo)
+    report("phash", n_cached, n_phash_total)
+
+    with stats.phase("phash") as ph:
+        hashes = run_chunked(
+            perceptual_hash, [rec.path for rec in todo], workers,
+            on_progress=lambda done: report("phash", n_cached + done, n_phash_total),
+        )
+        for rec, phash in zip(todo, hashes):
+            rec.phash = phash
+            if cache is not None and phash:
+                cache.store_record(rec)
+
+        for rec in keepers:
+            try:
+                index.add_phash(rec)
+            except Exception as e:
+                emit("error", f"[ERROR] Failed to process pHash for {rec.name}: {e}")
+
+        if cache is not None:
+            cache.flush()
+        ph.files = len(todo)
+        ph.bytes_read = sum(rec.size for rec in todo)
 
+    # -----------------------------
+    # Phase 3: 视觉去重
+    # -----------------------------
+    with stats.phase("visual") as ph:
+        confirm = None
+        if visual_confirm:
+            candidates = [rec for recs in index.visual_candidates(visual_distance) for rec in recs]
+            sigs = run_chunked(partial(confirm_hash, method=visual_confirm), [rec.path for rec in candidates],
+                               workers)
+            confirm = dict(zip(candidates, sigs))
+            ph.bytes_read = sum(rec.size for rec in candidates)
+            emit("info", f"[INFO] Visual cascade: {len(candidates)} of {n_phash_total} images "
+                         f"were dHash candidates and got a {visual_confirm} check")
+        visual_dupe_map = index.get_visual_duplicates_map(visual_distance, confirm, confirm_distance)
+        ph.files = n_phash_total
+
+    header = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "input": str(input_dir),
+        "output": str(output_dir),
+        "duplicates": str(duplicate_dir),
+        "mode": mode,
+        "hash": hash_algo,
+        "visual_distance": visual_distance,
+        "visual_confirm": visual_confirm,
+    }
+    return decide_plan(header, records, dedup_groups, names, visual_dupe_map, outputs, resumed, report, stats)
 
-def files_same(a: Path, b: Path) -> bool:
-    """快速判断两文件是否相同：先比大小，相同则比 MD5。"""
-    try:
-        if a.stat().st_size != b.stat().st_size:
-            return False
-        # 大小一样再算 MD5，避免无谓开销
-        return md5sum(a) == md5sum(b)
-    except Exception:
-        return False
 
+# ---------- 主流程 ----------
 
-def unique_target_path(target: Path) -> Path:
-    """
-    若目标已存在，则在文件名后追加 -1, -2, ...，直到找到一个不存在的路径。
-    """
-    if not target.exists():
-        return target
-    stem, suffix = target.stem, target.suffix
-    i = 1
-    while True:
-        cand = target.with_name(f"{stem}-{i}{suffix}")
-        if not cand.exists():
-            return cand
-        i += 1
-
-
-def resolve_target_for_copy(src: Path, dst_folder: Path, dst_name: str) -> Optional[Path]:
+def plan_photos(input_dir: Path, output_dir: Path, duplicate_dir: Path, progress_callback=None,
+                cache_path: Optional[Path] = None, use_cache: bool = True, workers: int = 1,
+                hash_algo: str = DEFAULT_ALGO, visual_distance: int = 0,
+                mode: str = DEFAULT_MODE, scan_threads: int = 1,
+                stats: Optional[RunStats] = None, visual_confirm: Optional[str] = None,
+                confirm_distance: int = CONFIRM_DISTANCE) -> OrganizePlan:
     """
-    生成复制目标路径（幂等）：
-    - 若 dst_folder/dst_name 不存在：直接返回该路径；
-    - 若已存在且内容相同：返回 None（跳过复制）；
-    - 若已存在但内容不同：返回追加 -1/-2… 的唯一路径。
+    只规划不执行（--dry-run）：参数与 organize_photos 相同，返回可保存、可稍后用 apply_plan 执行的计划。
+    除摘要缓存外不写入任何文件。传入 stats 时，各规划阶段的计量记入其中。
     """
-    dst_folder.mkdir(parents=True, exist_ok=True)
-    target = dst_folder / dst_name
-    if target.exists():
-        if files_same(src, target):
-            # 完全一样 → 跳过
-            return None
-        # 不同 → 生成唯一名称
-        return unique_target_path(target)
-    return target
-
-
-def iter_images(input_dir: Path, exts: Iterable[str], exclude: Iterable[Path]) -> List[Path]:
-    """
-    递归获取输入目录下的所有图片（大小写不敏感），并排除 exclude 列表中的子树。
-    """
-    exts = {e.lower() for e in exts}
-    exclude = [p.resolve() for p in exclude]
-    results = []
-    for p in input_dir.rglob("*"):
-        if not p.is_file():
-            continue
-        if p.suffix.lower() not in exts:
-            continue
-        # 排除 output 与 duplicates（避免二次扫描产物）
-        if any(_is_under(p, ex) for ex in exclude):
-            continue
-        results.append(p)
-    return results
-
-
-# ---------- 主流程 ----------
-
-def organize_photos(input_dir: Path, output_dir: Path, duplicate_dir: Path, progress_callback=None):
+    if mode not in PLACEMENT_MODES:
+        raise ValueError(f"unknown placement mode: {mode!r} (expected one of {PLACEMENT_MODES})")
+    input_dir, output_dir, duplicate_dir = input_dir.resolve(), output_dir.resolve(), duplicate_dir.resolve()
+    cache = DigestCache(cache_path or output_dir / CACHE_FILENAME, algo=hash_algo) if use_cache else None
+    stats = stats if stats is not None else RunStats()
+    try:
+        return _build_plan(input_dir, output_dir, duplicate_dir, cache, workers, hash_algo, visual_distance,
+                           mode, scan_threads, make_reporter(progress_callback), {}, stats,
+                           visual_confirm, confirm_distance)
+    finally:
+        if cache is not None:
+            stats.cache_hits, stats.cache_misses = cache.hits, cache.misses
+            cache.close()
+        stats.finish()
+
+
+def organize_photos(input_dir: Path, output_dir: Path, duplicate_dir: Path, progress_callback=None,
+                    cache_path: Optional[Path] = None, use_cache: bool = True, workers: int = 1,
+                    hash_algo: str = DEFAULT_ALGO, visual_distance: int = 0,
+                    mode: str = DEFAULT_MODE, scan_threads: int = 1, resume: bool = False,
+                    profile_dir: Optional[Path] = None, copy_threads: int = DEFAULT_COPY_THREADS,
+                    visual_confirm: Optional[str] = None, confirm_distance: int = CONFIRM_DISTANCE) -> RunStats:
     """
-    Phase 1: 构建 MD5 索引（精确去重候选）
-    Phase 2: 精确去重 & 输出“主图”；重复图移动到 duplicates/
-    Phase 3: 对所有主图计算感知哈希（视觉去重）
-    Phase 4: 视觉去重（保留拍摄时间最早者），其余移入 duplicates/
+    先规划（见 _build_plan：精确去重 → 感知哈希 → 视觉去重 → 决定落点），再一次性执行计划（见 plan.apply_plan）。
+    返回本次运行的计量（见 stats.RunStats：各阶段耗时 / 读写字节数 / 缓存命中），
+    其中 review_groups 为供 GUI 回顾的重复分组（见 groups.GroupStore）。
+
+    use_cache=True 时，MD5 / pHash / 拍摄时间会持久化到 SQLite 缓存
+    （默认 output_dir/.photo_organizer_cache.sqlite3），未变化的文件在下次运行时不再重新读取。
+    workers > 1 时，Phase 1 与 Phase 2 的哈希计算分块分发到多进程并行执行，结果与串行一致。
+    visual_distance > 0 时，dHash 汉明距离不超过该值的图片也视为视觉重复。
+    visual_confirm 为 "phash" / "whash" 时，dHash 只用来找候选组，组内再以该哈希与宽高比复核
+    （距离不超过 confirm_distance 才算重复）；画面唯一的图片不计算复核哈希。
+    mode 决定文件如何放入输出 / duplicates 目录：copy（默认）、hardlink、reflink 或 move，
+    各模式下的分组、统计与幂等判断完全一致；move 模式下幂等跳过的源文件保持原样不删除。
+    scan_threads > 1 时并行扫描兄弟目录（适合 NAS / 网络盘）。
+    copy_threads 为同时在途的放置数（见 copy_engine.CopyEngine；1 = 逐个串行放置）。
+
+    所有文件操作都先写入输出目录下的预写日志（见 journal.py），正常结束时删除。
+    上次运行中断时，resume=True 会回放日志：补做未完成的操作，已完成的放置直接沿用，不再读取文件内容。
+    profile_dir 不为空时，每个阶段在 cProfile 下运行，各写出一个 <阶段>.pstats。
     """
-    visual_dupe_map = {}
-
-    review_groups = []  # 新增：用于 GUI 回顾
+    if mode not in PLACEMENT_MODES:
+        raise ValueError(f"unknown placement mode: {mode!r} (expected one of {PLACEMENT_MODES})")
 
     # 目录规范化
     input_dir = input_dir.resolve()
     output_dir = output_dir.resolve()
     duplicate_dir = duplicate_dir.resolve()
 
-    # 递归遍历图片，排除 output_dir 与 duplicate_dir
-    all_images = iter_images(
-        input_dir,
-        exts=(".jpg", ".jpeg", ".png"),
-        exclude=[output_dir, duplicate_dir],
-    )
-    print(f"[INFO] Found {len(all_images)} images in {input_dir}")
-    
-    index = DigestIndex()
-
-    # 映射：原始路径 -> 实际输出路径（便于视觉去重时回收）
-    output_map: Dict[Path, Path] = {}
-
-    # 统计
-    stat_total = len(all_images)
-    stat_kept_md5 = 0
-    stat_dupe_md5 = 0
-    stat_dupe_visual = 0
-    stat_skip_same = 0  # 幂等跳过次数（同名同内容）
-
-    # ---------- 累计百分比进度条配置 ----------
-    WEIGHTS = {"md5": 0.40, "copy": 0.40, "phash": 0.10, "visual": 0.10}
-    ORDER = ["md5", "copy", "phash", "visual"]
-    prefix = {}
-    acc = 0.0
-    for ph in ORDER:
-        prefix[ph] = acc
-        acc += WEIGHTS[ph]
-
-    def report(phase: str, done: int, total: int):
-        """把各阶段进度折算到 0..100 的累计百分比"""
-        if not progress_callback or total <= 0:
-            return
-        frac = min(max(done / total, 0.0), 1.0)  # 0..1
-        percent = int(round((prefix[phase] + WEIGHTS[phase] * frac) * 100))
-        percent = max(0, min(100, percent))
-        progress_callback(percent)
-
-    # -----------------------------
-    # Phase 1: 构建 MD5 索引
-    # -----------------------------
-    n_md5_total = len(all_images)
-    n_md5_done = 0
-
-    for path in all_images:
-        try:
-            date = get_photo_datetime(path)
-            digest = md5sum(path)
-            index.add_md5(path, digest, date)
-        except Exception as e:
-            print(f"[ERROR] Failed to process MD5 for {path}: {e}")
-    
-        n_md5_done += 1
-        report("md5", n_md5_done, n_md5_total)
-
-    # -----------------------------
-    # Phase 2: 精确去重（输出主图）
-    # -----------------------------
-    md5_keep_paths: List[Path] = []
-    dedup_groups = index.get_deduplicated()
-    n_copy_total = len(dedup_groups)
-    n_copy_done = 0
-
-    for keep_path, dupes in index.get_deduplicated():
-        try:
-            date = get_photo_datetime(keep_path)
-            y, m = date.year, date.month
-            new_name = build_new_filename(date, keep_path.name, keep_path.suffix.lower())
-            target_folder = output_dir / f"{y:04d}" / f"{m:02d}"
-
-            # 幂等：若已有同名同内容 → 跳过；否则按需生成唯一文件名
-            target_path = resolve_target_for_copy(keep_path, target_folder, new_name)
-            if target_path is None:
-                stat_skip_same += 1
-                # 已经存在且内容一致，不再记录到 output_map（但它确实在输出目录）
-                print(f"[SKIP] already organized: {keep_path.name} → {y:04d}/{m:02d}/{new_name}")
+    stats = RunStats(profile_dir)
+    cache = DigestCache(cache_path or output_dir / CACHE_FILENAME, algo=hash_algo) if use_cache else None
+    report = make_reporter(progress_callback)
 
+    try:
+        # 预写日志：上次中断时按需回放，resumed 为 源文件 → 上次已放置的目标
+        journal_path = output_dir / JOURNAL_FILENAME
+        resumed: Dict[str, Path] = {}
+        if journal_path.exists():
+            if resume:
+                resumed = replay(journal_path, cache)
             else:
-                shutil.copy2(keep_path, target_path)
-                output_map[keep_path] = target_path
-                stat_kept_md5 += 1
-                print(f"[OK] {keep_path.name} → {target_path.relative_to(output_dir)}")
-
-            # 重复图移动到 duplicates（同样做幂等判断）
-            for dup_path in dupes:
-                dup_target = resolve_target_for_copy(dup_path, duplicate_dir, dup_path.name)
-
-                if dup_target is None:
-                    stat_skip_same += 1
-                    print(f"[SKIP] duplicate already saved: {dup_path.name}")
-
-                else:
-                    shutil.copy2(dup_path, dup_target)
-                    stat_dupe_md5 += 1
-                    print(f"[DUPLICATE] {dup_path.name} → {dup_target.relative_to(duplicate_dir)}")
-            
-            # 新增：为 GUI 回顾收集 MD5 重复分组
-            if dupes:
-                keep_output_path = output_map.get(keep_path)
-                if keep_output_path is None:
-                    keep_output_path = (output_dir / f"{y:04d}" / f"{m:02d}" / new_name)
-                group = {
-                    "kind": "md5",
-                    "keep": str(keep_output_path),
-                    "keep_src": str(keep_path),
-                    "dupes": []
-                }
-                for dup_path in dupes:
-                    # 推断 duplicates 内的展示路径；幂等跳过时用默认位置
-                    dup_target = resolve_target_for_copy(dup_path, duplicate_dir, dup_path.name)
-                    if dup_target is None:
-                        dup_target = duplicate_dir / dup_path.name
-                    group["dupes"].append(str(dup_target))
-                review_groups.append(group)
-
-            # 记录“主图”用于视觉去重
-            md5_keep_paths.append(keep_path)
-
-        except Exception as e:
-            print(f"[ERROR] Failed to process main photo {keep_path.name}: {e}")
-        
-        n_copy_done += 1
-        report("copy", n_copy_done, n_copy_total)
-
-        
-
-    # -----------------------------
-    # Phase 3: 对 MD5 主图做感知哈希
-    # -----------------------------
-    n_phash_total = len(md5_keep_paths)
-    n_phash_done = 0
-
-    for path in md5_keep_paths:
-        try:
-            index.add_phash(path)
-        except Exception as e:
-            print(f"[ERROR] Failed to process pHash for {path.name}: {e}")
-        
-        n_phash_done += 1
-        report("phash", n_phash_done, n_phash_total)
-
-    # -----------------------------
-    # Phase 4: 视觉去重
-    # -----------------------------
-    visual_groups = list(visual_dupe_map.items())
-    n_visual_total = len(visual_groups)
-    n_visual_done = 0
-
-    visual_dupe_map = index.get_visual_duplicates_map()
-    for keep, dupes in visual_dupe_map.items():
-        # 在同组中按“拍摄时间”排序，选择最早的为保留
-        all_group = [keep] + dupes
-        sorted_group = sorted(all_group, key=lambda p: get_photo_datetime(p))
-        new_keep = sorted_group[0]
-
-        for p in all_group:
-            if p == new_keep:
-                continue
+                emit("warn", "[WARN] The previous run was interrupted; pass --resume to reuse its progress")
+        elif resume:
+            emit("resume", "[RESUME] No interrupted run found, starting a normal run")
+
+        plan = _build_plan(input_dir, output_dir, duplicate_dir, cache, workers, hash_algo, visual_distance,
+                           mode, scan_threads, report, resumed, stats, visual_confirm, confirm_distance)
+        with stats.phase("apply") as ph:
+            applied = apply_plan(plan, cache, verify=False,
+                                 on_progress=lambda done, total: report("copy", done, total), stats=ph,
+                                 copy_threads=copy_threads)
+
+        report.progress(100)
+    finally:
+        # 出错 / 中断时同样提交缓存中已算好的摘要并关闭
+        if cache is not None:
+            stats.cache_hits, stats.cache_misses = cache.hits, cache.misses
+            cache.close()
+        stats.finish()
 
-            # 若该图片已在输出目录里（作为主图），删除输出文件并从映射中移除
-            out = output_map.pop(p, None)
-            if out:
-                try:
-                    out.unlink(missing_ok=True)
-                except Exception as e:
-                    print(f"[WARN] Failed to delete existing output file: {out} - {e}")
-
-            # 将其放入 duplicates（幂等判断）
-            dup_target = resolve_target_for_copy(p, duplicate_dir, p.name)
-            if dup_target is None:
-                stat_skip_same += 1
-                print(f"[SKIP] Visual duplicate already saved: {p.name}")
-            else:
-                try:
-                    shutil.copy2(p, dup_target)
-                    stat_dupe_visual += 1
-                    print(f"[VISUAL DUPLICATE] {p.name} → {dup_target.relative_to(duplicate_dir)}")
-                except Exception as e:
-                    print(f"[ERROR] Failed to move visual duplicate {p.name}: {e}")
-
-        print(f"[VISUAL KEEP] {new_keep.name}")
-
-        # 新增：为 GUI 回顾收集视觉重复分组
-        group = {
-            "kind": "visual",
-            "keep": str(output_map.get(new_keep, output_dir / f"{get_photo_datetime(new_keep).year:04d}" / f"{get_photo_datetime(new_keep).month:02d}" / build_new_filename(get_photo_datetime(new_keep), new_keep.name, new_keep.suffix.lower()))),
-            "keep_src": str(new_keep),
-            "dupes": []
-        }
-        for p in all_group:
-            if p == new_keep: 
-                continue
-            # 和上面逻辑一致，推断或记录 duplicates 内的目标展示路径
-            dup_target = resolve_target_for_copy(p, duplicate_dir, p.name)
-            if dup_target is None:
-                dup_target = duplicate_dir / p.name
-            group["dupes"].append(str(dup_target))
-        review_groups.append(group)
-
-        n_visual_done += 1
-        report("visual", n_visual_done, n_visual_total)
-
-    if progress_callback:
-        progress_callback(100)
-    
     # -----------------------------
     # Summary
     # -----------------------------
-    print(
-        "[SUMMARY] "
-        f"total={stat_total}, "
-        f"kept_md5={stat_kept_md5}, "
-        f"dupe_md5={stat_dupe_md5}, "
-        f"dupe_visual={stat_dupe_visual}, "
-        f"skipped_same={stat_skip_same}, "
-        f"output_dir={output_dir}, duplicates_dir={duplicate_dir}"
-    )
-
-    return review_groups
+    print_summary(plan, applied, stats.cache_hits)
+    stats.counts = summary_counts(plan, applied)
+    stats.review_groups = plan.review_groups
+    return stats
@@ -0,0 +1,154 @@
+# output_index.py
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple, Union
+import os
+import re
+
+from photo_organizer.cache import DigestCache, origin_key
+from photo_organizer.digest import DigestBackend, DEFAULT_ALGO
+from photo_organizer.record import PhotoRecord
+
+_SUFFIX_RE = re.compile(r"^(.*)-(\d+)$")
+
+
+class _Folder:
+    """
+    单个目标目录的快照：文件名 → stat（或预留该文件名的 PhotoRecord，见 OutputIndex.reserve），
+    以及每个 (stem, 扩展名) 已用过的最大 -N 后缀
+    """
+
+    __slots__ = ("entries", "max_suffix")
+
+    def __init__(self):
+        self.entries: Dict[str, Union[os.stat_result, PhotoRecord]] = {}
+        self.max_suffix: Dict[Tuple[str, str], int] = {}
+
+    def add(self, name: str, st: Union[os.stat_result, PhotoRecord]):
+        self.entries[name] = st
+        stem, ext = os.path.splitext(name)
+        m = _SUFFIX_RE.match(stem)
+        if m:
+            key = (m.group(1), ext)
+            self.max_suffix[key] = max(self.max_suffix.get(key, 0), int(m.group(2)))
+
+
+class OutputIndex:
+    """
+    输出 / duplicates 目录的内存索引，每个目录在一次运行中只 scandir 一次（不存在时只 mkdir 一次）：
+    - 同名冲突判断是字典查找；大小不同直接判定为不同文件；
+    - 大小相同时依次尝试免读取的证明：同一 inode（硬链接）、
+      缓存中记录的放置来源（origin）与源文件当前指纹一致、两边摘要都已知（Phase 1 / 缓存）；
+      都不成立才真正计算摘要，并写回缓存供下次使用；
+    - 需要改名时直接取该 stem 已用最大后缀 + 1，不再逐个 exists() 探测。
+    因此对已整理好的图库重复运行，不会再读取任何文件内容。
+    create_dirs=False 时不创建缺失的目录，只记入 missing（规划阶段不产生任何副作用）。
+    """
+
+    def __init__(self, cache: Optional[DigestCache] = None, backend: Optional[DigestBackend] = None,
+                 create_dirs: bool = True):
+        self.cache = cache
+        self.backend = backend or DigestBackend(cache.algo if cache is not None else DEFAULT_ALGO)
+        self.create_dirs = create_dirs
+        self._folders: Dict[Path, _Folder] = {}
+        self.missing: Set[Path] = set()  # create_dirs=False 时遇到的不存在的目录
+        self.n_hashed = 0  # 冲突判断中实际读取文件计算摘要的次数
+
+    def _folder(self, folder: Path) -> _Folder:
+        entry = self._folders.get(folder)
+        if entry is not None:
+            return entry
+        entry = _Folder()
+        try:
+            with os.scandir(folder) as it:
+                for e in it:
+                    if e.is_file():
+                        entry.add(e.name, e.stat())
+        except FileNotFoundError:
+            if self.create_dirs:
+                folder.mkdir(parents=True, exist_ok=True)
+            else:
+                self.missing.add(folder)
+        self._folders[folder] = entry
+        return entry
+
+    # ---------- 内容比较 ----------
+
+    def _digest(self, path: Path, st: os.stat_result) -> str:
+        if self.cache is not None:
+            hit = self.cache.get(path, st)
+            if hit is not None and hit.digest is not None:
+                return hit.digest
+        digest = self.backend.file_digest(path)
+        self.n_hashed += 1
+        if self.cache is not None:
+            self.cache.put(path, st, digest=digest)
+        return digest
+
+    def _same_planned(self, rec: PhotoRecord, planned: PhotoRecord) -> bool:
+        """目标尚未写入，内容将与 planned 的源文件相同"""
+        if planned is rec:
+            return True
+        if planned.size != rec.size:
+            return False
+        if planned.edge is not None and rec.edge is not None and planned.edge != rec.edge:
+            return False
+        for r in (rec, planned):
+            if r.digest is None:
+                r.digest = self._digest(r.path, r.path.stat())
+        return rec.digest == planned.digest
+
+    def _same(self, rec: PhotoRecord, src: Path, target: Path, tst: Union[os.stat_result, PhotoRecord]) -> bool:
+        """src 为 rec 的源文件，或本次由 rec 放置出的副本（内容与 rec 相同）"""
+        if isinstance(tst, PhotoRecord):
+            return self._same_planned(rec, tst)
+        from_source = src == rec.path
+        size = rec.size if from_source else src.stat().st_size
+        if tst.st_size != size:
+            return False
+        if from_source and tst.st_ino == rec.ino and os.path.samestat(tst, src.stat()):
+            return True  # 硬链接：同一文件
+
+        hit = self.cache.get(target, tst) if self.cache is not None else None
+        if hit is not None and hit.origin == origin_key(rec.path, rec.fingerprint):
+            return True  # 目标正是由未变化的该源文件放置而来（src 是其副本时同样成立）
+
+        if rec.digest is None:
+            rec.digest = self._digest(src, src.stat())
+        target_digest = hit.digest if hit is not None and hit.digest is not None else self._digest(target, tst)
+        return rec.digest == target_digest
+
+    # ---------- 对外接口 ----------
+
+    def resolve(self, rec: PhotoRecord, folder: Path, name: str, src: Optional[Path] = None) -> Optional[Path]:
+        """
+        解析 folder / name 的放置目标（src 默认为 rec.path）：
+        - folder/name 不存在：返回该路径；
+        - 已存在且内容相同：返回 None（跳过）；
+        - 已存在但内容不同：返回 stem-N 形式的新路径（N 为该 stem 已用最大后缀 + 1）。
+        返回的路径应在放置成功后用 add() 登记（只做规划时用 reserve() 预留）。
+        """
+        entry = self._folder(folder)
+        tst = entry.entries.get(name)
+        if tst is None:
+            return folder / name
+        if self._same(rec, src or rec.path, folder / name, tst):
+            return None
+        stem, ext = os.path.splitext(name)
+        n = entry.max_suffix.get((stem, ext), 0) + 1
+        while f"{stem}-{n}{ext}" in entry.entries:
+            n += 1
+        return folder / f"{stem}-{n}{ext}"
+
+    def add(self, path: Path, st: Optional[os.stat_result] = None):
+        """登记新放置的文件"""
+        self._folder(path.parent).add(path.name, st or path.stat())
+
+    def reserve(self, path: Path, rec: PhotoRecord):
+        """预留尚未写入的目标：之后的冲突判断视其内容与 rec 的源文件相同"""
+        self._folder(path.parent).add(path.name, rec)
+
+    def discard(self, path: Path):
+        """登记文件已被移走 / 删除"""
+        entry = self._folders.get(path.parent)
+        if entry is not None:
+            entry.entries.pop(path.name, None)
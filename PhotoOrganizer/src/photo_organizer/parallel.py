@@ -0,0 +1,57 @@
+# parallel.py
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, List, Optional, Sequence
+
+
+def _run_chunk(fn: Callable, chunk: Sequence) -> list:
+    """子进程中执行：对一块输入逐个调用 fn"""
+    return [fn(item) for item in chunk]
+
+
+def default_chunksize(n_items: int, workers: int) -> int:
+    """每个 worker 约分到 4 块：既摊薄进程间通信开销，又保证负载均衡"""
+    return max(1, min(256, n_items // (workers * 4) or 1))
+
+
+def run_chunked(fn: Callable, items: Sequence, workers: int = 1, chunksize: Optional[int] = None,
+                on_progress: Optional[Callable[[int], None]] = None) -> List:
+    """
+    把 items 分块提交到 ProcessPoolExecutor 并行计算 fn(item)。
+    - 结果严格按输入顺序返回，与各块完成顺序无关（保证运行结果可复现）；
+    - 同时在途的块数有上限，避免一次性把全部任务塞进队列；
+    - on_progress(done) 在每块完成后以“已完成条数”回调（在主进程中调用）；
+    - workers <= 1 时直接在当前进程串行执行。
+    fn 必须是模块级函数（可被 pickle），异常应在 fn 内部自行处理。
+    """
+    n = len(items)
+    if workers <= 1 or n <= 1:
+        results = []
+        for i, item in enumerate(items, 1):
+            results.append(fn(item))
+            if on_progress:
+                on_progress(i)
+        return results
+
+    chunksize = chunksize or default_chunksize(n, workers)
+    chunks = [(start, items[start:start + chunksize]) for start in range(0, n, chunksize)]
+    results: List = [None] * n
+    done = 0
+    max_inflight = workers * 2
+
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        pending = {}
+        next_chunk = 0
+        while next_chunk < len(chunks) or pending:
+            while next_chunk < len(chunks) and len(pending) < max_inflight:
+                start, chunk = chunks[next_chunk]
+                pending[ex.submit(_run_chunk, fn, chunk)] = start
+                next_chunk += 1
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                start = pending.pop(fut)
+                chunk_results = fut.result()
+                results[start:start + len(chunk_results)] = chunk_results
+                done += len(chunk_results)
+                if on_progress:
+                    on_progress(done)
+    return results
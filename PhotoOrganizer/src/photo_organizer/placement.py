@@ -0,0 +1,194 @@
+# placement.py
+import errno
+import os
+import shutil
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+PLACEMENT_MODES = ("copy", "hardlink", "reflink", "move")
+DEFAULT_MODE = "copy"
+
+# 放置时先写到 <目标>.part 再原子 rename：最终文件名下的文件总是完整的
+PART_SUFFIX = ".part"
+
+# linux/fs.h: FICLONE = _IOW(0x94, 9, int)，让目标文件与源文件共享数据块（btrfs / XFS / bcachefs 等）
+_FICLONE = 0x40049409
+
+# 这些错误表示“此文件系统 / 此组合不支持该方式”，应退回到下一种方式，而不是报错
+_UNSUPPORTED = {errno.EXDEV, errno.EPERM, errno.EMLINK, errno.EINVAL, errno.ENOTTY,
+                errno.ENOSYS, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF}
+
+
+def _clone(src_fd: int, dst_fd: int) -> bool:
+    """FICLONE 整文件克隆；不支持时返回 False"""
+    if fcntl is None:
+        return False
+    try:
+        fcntl.ioctl(dst_fd, _FICLONE, src_fd)
+        return True
+    except OSError as e:
+        if e.errno in _UNSUPPORTED:
+            return False
+        raise
+
+
+def _short_copy(copied: int, size: int) -> OSError:
+    return OSError(errno.EIO, f"short copy: {copied} of {size} bytes (source truncated or changed during copy?)")
+
+
+def _copy_range(src_fd: int, dst_fd: int, size: int) -> bool:
+    """
+    copy_file_range 内核态拷贝（支持时可由文件系统共享数据块或做服务端拷贝）。
+    第一次调用即不支持时返回 False；已拷贝部分数据后出错，或不足 size 字节就读到文件尾
+    （源文件在复制中被截断 / 改写）时直接抛出，不把残缺的目标当作成功。
+    """
+    if not hasattr(os, "copy_file_range"):
+        return False
+    copied = 0
+    while copied < size:
+        try:
+            n = os.copy_file_range(src_fd, dst_fd, size - copied)
+        except OSError as e:
+            if copied == 0 and e.errno in _UNSUPPORTED:
+                return False
+            raise
+        if n == 0:
+            raise _short_copy(copied, size)
+        copied += n
+    return True
+
+
+def _sendfile(src_fd: int, dst_fd: int, size: int) -> bool:
+    """sendfile 内核态拷贝（Linux 2.6.33 起目标可为普通文件）；语义同 _copy_range"""
+    if not hasattr(os, "sendfile"):
+        return False
+    copied = 0
+    while copied < size:
+        try:
+            n = os.sendfile(dst_fd, src_fd, copied, min(size - copied, 1 << 30))
+        except OSError as e:
+            if copied == 0 and e.errno in _UNSUPPORTED:
+                return False
+            raise
+        if n == 0:
+            raise _short_copy(copied, size)
+        copied += n
+    return True
+
+
+def _kernel_copy(fsrc, fdst) -> str:
+    """copy_file_range → sendfile → 用户态 1 MiB 分块复制，依次退回；返回实际使用的方式"""
+    sfd, dfd = fsrc.fileno(), fdst.fileno()
+    size = os.fstat(sfd).st_size
+    if _copy_range(sfd, dfd, size):
+        return "copy_file_range"
+    if _sendfile(sfd, dfd, size):
+        return "sendfile"
+    shutil.copyfileobj(fsrc, fdst, 1 << 20)
+    if fdst.tell() < size:
+        raise _short_copy(fdst.tell(), size)
+    return "copy"
+
+
+def copy_file(src: Path, dst: Path) -> str:
+    """
+    复制文件，数据在内核中搬运、不经过用户态缓冲（见 _kernel_copy）；拷贝期间释放 GIL，可多线程并发。
+    与 copy2 一样用 copystat 保留时间戳、权限与扩展属性。返回实际使用的方式。
+    """
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        method = _kernel_copy(fsrc, fdst)
+    shutil.copystat(src, dst)
+    return method
+
+
+def reflink_file(src: Path, dst: Path) -> str:
+    """
+    写时复制地放置文件：FICLONE → copy_file_range → sendfile → 普通复制，依次退回。
+    与 copy2 一样保留时间戳与权限。返回实际使用的方式。
+    """
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        method = "reflink" if _clone(fsrc.fileno(), fdst.fileno()) else _kernel_copy(fsrc, fdst)
+    shutil.copystat(src, dst)
+    return method
+
+
+def hardlink_file(src: Path, dst: Path) -> str:
+    """硬链接到目标（零拷贝、零额外空间）；跨文件系统或不支持时退回复制"""
+    try:
+        os.link(src, dst)
+        return "hardlink"
+    except OSError as e:
+        if e.errno not in _UNSUPPORTED:
+            raise
+    return copy_file(src, dst)
+
+
+def move_file(src: Path, dst: Path) -> str:
+    """
+    同文件系统内 rename（本身即原子）；跨文件系统时复制到 .part，核对后 rename 到位，最后才删除源文件。
+    核对：.part 与源文件大小相同，且源文件在复制期间大小 / mtime 未变；不符时删掉 .part、保留源文件并报错
+    （移动是唯一无法从源文件重来的模式）。
+    """
+    try:
+        os.rename(src, dst)
+        return "move"
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    part = part_path(dst)
+    try:
+        before = os.stat(src)
+        copy_file(src, part)
+        after, copied = os.stat(src), os.stat(part)
+        if (before.st_size, before.st_mtime_ns) != (after.st_size, after.st_mtime_ns) \
+                or copied.st_size != after.st_size:
+            raise OSError(errno.EIO, f"copy of {src} does not match the source "
+                                     f"({copied.st_size} of {after.st_size} bytes); source kept")
+        os.replace(part, dst)
+    except BaseException:
+        if os.path.lexists(part):
+            os.unlink(part)
+        raise
+    os.unlink(src)
+    return "copy+unlink"
+
+
+def part_path(dst: Path) -> Path:
+    """dst 对应的临时文件路径"""
+    return dst.with_name(dst.name + PART_SUFFIX)
+
+
+def place_file(src: Path, dst: Path, mode: str = DEFAULT_MODE) -> str:
+    """
+    按 mode 把 src 放到 dst（dst 由调用方保证尚不存在），返回实际使用的方式：
+    - copy:     内核态复制并保留元数据（默认，结果与 shutil.copy2 相同，见 copy_file）；
+    - hardlink: 硬链接，不支持时退回复制；
+    - reflink:  写时复制克隆，不支持时退回 copy_file_range / 复制；
+    - move:     移动源文件。
+    除 move 外都先放到 dst.part 再原子 rename，中途崩溃只会留下 .part，不会留下半个文件。
+    """
+    if mode == "move":
+        return move_file(src, dst)
+    if mode == "copy":
+        fn = copy_file
+    elif mode == "hardlink":
+        fn = hardlink_file
+    elif mode == "reflink":
+        fn = reflink_file
+    else:
+        raise ValueError(f"unknown placement mode: {mode!r} (expected one of {PLACEMENT_MODES})")
+    part = part_path(dst)
+    if os.path.lexists(part):
+        os.unlink(part)  # 上次中断留下的残片
+    try:
+        method = fn(src, part)
+        os.replace(part, dst)
+    except BaseException:
+        if os.path.lexists(part):
+            os.unlink(part)
+        raise
+    return method
@@ -0,0 +1,241 @@
+# plan.py
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Optional
+import json
+import os
+
+from photo_organizer.cache import DigestCache, origin_key
+from photo_organizer.events import emit
+from photo_organizer.groups import GroupStore
+from photo_organizer.copy_engine import CopyEngine, DEFAULT_COPY_THREADS
+from photo_organizer.journal import Journal, JOURNAL_FILENAME
+from photo_organizer.placement import place_file
+from photo_organizer.stats import PhaseStats, ZERO_COPY_METHODS
+
+PLAN_VERSION = 1
+
+# 放置种类：主图进输出目录 / 精确重复 / 视觉重复（后两者进 duplicates）
+PLAN_KINDS = ("out", "dup", "visual")
+_LABELS = {"out": "OK", "dup": "DUPLICATE", "visual": "VISUAL DUPLICATE"}
+
+
+class PlanOp:
+    """一次放置：把源文件 src 放到 dst。fingerprint 为规划时源文件的 (size, mtime_ns, inode)"""
+
+    __slots__ = ("kind", "src", "dst", "fingerprint", "digest")
+
+    def __init__(self, kind: str, src: Path, dst: Path, fingerprint: tuple, digest: Optional[str] = None):
+        self.kind = kind
+        self.src = src
+        self.dst = dst
+        self.fingerprint = tuple(fingerprint)
+        self.digest = digest
+
+    def to_dict(self) -> dict:
+        return {"kind": self.kind, "src": str(self.src), "dst": str(self.dst),
+                "fingerprint": list(self.fingerprint), "digest": self.digest}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "PlanOp":
+        return cls(d["kind"], Path(d["src"]), Path(d["dst"]), d["fingerprint"], d.get("digest"))
+
+    def __repr__(self):
+        return f"PlanOp({self.kind}, {self.src.name!r} → {str(self.dst)!r})"
+
+
+class OrganizePlan:
+    """
+    一次整理的全部决策，本身不含任何文件系统副作用，可保存为 JSON（--dry-run）后再执行（--apply-plan）：
+    - header: 运行参数（输入 / 输出 / duplicates 目录、放置方式、摘要算法等）；
+    - mkdirs: 执行前需要创建的目录；
+    - ops: 放置操作（目标路径已解决好同名冲突）；
+    - review_groups: 供 GUI 回顾的重复分组（GroupStore），路径为执行后的最终位置；
+    - stats: 扫描总数、幂等跳过数，以及断点续跑时直接沿用的放置数（按种类）。
+    """
+
+    def __init__(self, header: dict, mkdirs: Optional[List[Path]] = None, ops: Optional[List[PlanOp]] = None,
+                 review_groups: Optional[GroupStore] = None, stats: Optional[dict] = None):
+        self.header = header
+        self.mkdirs = mkdirs or []
+        self.ops = ops or []
+        self.review_groups = review_groups if review_groups is not None else GroupStore()
+        self.stats = stats or {"total": 0, "skipped_same": 0, "resumed": {}}
+
+    @property
+    def output_dir(self) -> Path:
+        return Path(self.header["output"])
+
+    @property
+    def duplicate_dir(self) -> Path:
+        return Path(self.header["duplicates"])
+
+    @property
+    def mode(self) -> str:
+        return self.header["mode"]
+
+    def ordered_ops(self) -> List[PlanOp]:
+        """
+        按源文件位置排序：同一源目录的文件相邻、目录内按 inode 升序
+        （多数文件系统上接近数据在磁盘上的顺序，机械盘 / NAS 上读取更顺序）
+        """
+        return sorted(self.ops, key=lambda op: (str(op.src.parent), op.fingerprint[2]))
+
+    def counts(self) -> Counter:
+        return Counter(op.kind for op in self.ops)
+
+    def describe(self):
+        """--dry-run：打印将要执行的操作"""
+        for op in self.ops:
+            emit("info", f"[PLAN] {op.kind:<6} {op.src} → {op.dst}")
+        counts = self.counts()
+        emit("info", f"[PLAN] {len(self.ops)} placements (mode={self.mode}: "
+                     + ", ".join(f"{kind}={counts[kind]}" for kind in PLAN_KINDS)
+                     + f"), {len(self.mkdirs)} directories to create, "
+                     f"{self.stats['skipped_same']} already organized")
+
+    # ---------- 序列化 ----------
+
+    def to_dict(self) -> dict:
+        return {
+            "version": PLAN_VERSION,
+            "header": self.header,
+            "mkdirs": [str(p) for p in self.mkdirs],
+            "ops": [op.to_dict() for op in self.ops],
+            "review_groups": self.review_groups.to_list(),
+            "stats": self.stats,
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "OrganizePlan":
+        if d.get("version") != PLAN_VERSION:
+            raise ValueError(f"unsupported plan version: {d.get('version')!r} (expected {PLAN_VERSION})")
+        return cls(d["header"], [Path(p) for p in d["mkdirs"]], [PlanOp.from_dict(op) for op in d["ops"]],
+                   GroupStore.from_list(d["review_groups"]), d["stats"])
+
+    def save(self, path: Path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=1)
+
+    @classmethod
+    def load(cls, path: Path) -> "OrganizePlan":
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def apply_plan(plan: OrganizePlan, cache: Optional[DigestCache] = None, verify: bool = True,
+               on_progress: Optional[Callable[[int, int], None]] = None,
+               stats: Optional[PhaseStats] = None, copy_threads: int = DEFAULT_COPY_THREADS) -> Counter:
+    """
+    执行计划，返回各种类实际完成的放置数：
+    1. 一次性创建全部目标目录；
+    2. 放置按源文件位置排序（见 OrganizePlan.ordered_ops），由 CopyEngine 以 copy_threads 个线程并发执行；
+    3. 每个放置先写预写日志（见 journal.py），完成后在缓存中记下目标的摘要与来源，下次幂等判断无需再读取。
+    日志、缓存与事件都在调用线程中按完成顺序处理。
+    verify=True（执行从文件读入的计划）时，跳过源文件在规划后有变化、或目标已被占用的操作。
+    传入 stats 时记下完成的放置数与读写字节数（硬链接 / reflink / 同盘移动不计）。
+    """
+    output_dir, duplicate_dir, mode = plan.output_dir, plan.duplicate_dir, plan.mode
+    for folder in plan.mkdirs:
+        folder.mkdir(parents=True, exist_ok=True)
+
+    applied = Counter()
+    placed = Counter()  # 实际使用的放置方式（hardlink / reflink 不支持时会退回复制）
+    ops = plan.ordered_ops()
+    n_done = 0
+
+    def progress():
+        nonlocal n_done
+        n_done += 1
+        if on_progress:
+            on_progress(n_done, len(ops))
+
+    def jobs():
+        """按顺序校验并写入日志计划行，再交给复制引擎（在调用线程中惰性执行）"""
+        for op in ops:
+            try:
+                if verify:
+                    st = op.src.stat()
+                    if (st.st_size, st.st_mtime_ns, st.st_ino) != op.fingerprint:
+                        emit("warn", f"[WARN] Source changed since planning, skipped: {op.src}")
+                        progress()
+                        continue
+                    if os.path.lexists(op.dst):
+                        emit("warn", f"[WARN] Target already exists, skipped: {op.dst}")
+                        progress()
+                        continue
+                origin = origin_key(op.src, op.fingerprint)
+                jid = journal.plan("place", rec=str(op.src), dst=str(op.dst), how=mode,
+                                   digest=op.digest, origin=origin)
+            except Exception as e:
+                emit("error", f"[ERROR] Failed to place {op.src.name}: {e}")
+                progress()
+                continue
+            yield op.src, op.dst, (op, jid, origin)
+
+    journal = Journal(output_dir / JOURNAL_FILENAME)
+    journal.open(started=datetime.now().isoformat(timespec="seconds"), input=plan.header["input"],
+                 mode=mode, hash=plan.header["hash"], visual_distance=plan.header["visual_distance"])
+
+    try:
+        for (op, jid, origin), method, err in CopyEngine(copy_threads, mode, place_file).run(jobs()):
+            try:
+                if err is not None:
+                    raise err
+                placed[method] += 1
+                st = op.dst.stat()
+                if stats is not None:
+                    stats.files += 1
+                    if method not in ZERO_COPY_METHODS:
+                        stats.bytes_read += st.st_size
+                        stats.bytes_written += st.st_size
+                journal.done(jid, fingerprint=[st.st_size, st.st_mtime_ns, st.st_ino])
+                if cache is not None:
+                    cache.put(op.dst, st, digest=op.digest, origin=origin)
+                applied[op.kind] += 1
+                base = output_dir if op.kind == "out" else duplicate_dir
+                emit("placed" if op.kind == "out" else "duplicate",
+                     f"[{_LABELS[op.kind]}] {op.src.name} → {op.dst.relative_to(base)}", op.src, op.dst)
+            except Exception as e:
+                emit("error", f"[ERROR] Failed to place {op.src.name}: {e}")
+            finally:
+                progress()
+    except BaseException:
+        # 中途中断（异常或 Ctrl-C）：先 fsync 并关闭日志再抛出，保留给 --resume
+        journal.close(completed=False)
+        raise
+
+    # 正常结束：日志不再需要
+    journal.close()
+    if placed:
+        emit("info", f"[INFO] Placement mode={mode}: "
+                     + ", ".join(f"{method}={n}" for method, n in sorted(placed.items())))
+    return applied
+
+
+def summary_counts(plan: OrganizePlan, applied: Counter) -> dict:
+    """汇总计数：本次完成的放置 + 断点续跑沿用的放置"""
+    done = Counter(plan.stats.get("resumed", {})) + applied
+    return {
+        "total": plan.stats["total"],
+        "kept_md5": done["out"],
+        "dupe_md5": done["dup"],
+        "dupe_visual": done["visual"],
+        "skipped_same": plan.stats["skipped_same"],
+    }
+
+
+def print_summary(plan: OrganizePlan, applied: Counter, cache_hits: int = 0):
+    counts = summary_counts(plan, applied)
+    emit(
+        "summary",
+        "[SUMMARY] "
+        f"total={counts['total']}, "
+        f"kept_md5={counts['kept_md5']}, "
+        f"dupe_md5={counts['dupe_md5']}, "
+        f"dupe_visual={counts['dupe_visual']}, "
+        f"skipped_same={counts['skipped_same']}, "
+        f"cache_hits={cache_hits}, "
+        f"output_dir={plan.output_dir}, duplicates_dir={plan.duplicate_dir}"
+    )
@@ -0,0 +1,166 @@
+# planning.py
+# 单机整理（organizer）与分片整理（shard）共用的规划构件：
+# 各阶段的任务函数、累计进度折算、主图命名与最终落点决策（decide_plan）。
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List
+
+from photo_organizer.digest import DigestBackend
+from photo_organizer.events import emit, ProgressThrottle
+from photo_organizer.groups import GroupStore
+from photo_organizer.output_index import OutputIndex
+from photo_organizer.plan import OrganizePlan, PlanOp
+from photo_organizer.record import PhotoRecord
+from photo_organizer.renamer import build_new_filename
+from photo_organizer.stats import RunStats
+
+
+# ---------- 各阶段的任务（可在子进程中执行） ----------
+
+def guarded(fn, arg):
+    """在（子进程中）执行 fn(arg)，把异常转成 (None, 错误信息)，避免一个坏文件拖垮整块任务"""
+    try:
+        return fn(arg), None
+    except Exception as e:
+        return None, str(e)
+
+
+def date_task(rec: PhotoRecord):
+    return rec.load_date()
+
+
+def edge_task(backend: DigestBackend, rec: PhotoRecord):
+    return backend.edge_digest(rec.path)
+
+
+def digest_task(backend: DigestBackend, rec: PhotoRecord):
+    return backend.file_digest(rec.path)
+
+
+# ---------- 累计百分比进度条配置 ----------
+# 规划（meta → phash → visual）不写任何文件，最后的 copy 阶段统一执行
+WEIGHTS = {"meta": 0.15, "edge": 0.05, "md5": 0.20, "phash": 0.10, "visual": 0.10, "copy": 0.40}
+ORDER = ["meta", "edge", "md5", "phash", "visual", "copy"]
+
+
+def make_reporter(progress_callback):
+    """把各阶段进度折算到 0..100 的累计百分比；百分比不变时不回调、不发事件（见 events.ProgressThrottle）"""
+    prefix = {}
+    acc = 0.0
+    for ph in ORDER:
+        prefix[ph] = acc
+        acc += WEIGHTS[ph]
+
+    progress = ProgressThrottle(progress_callback)
+
+    def report(phase: str, done: int, total: int):
+        if total <= 0:
+            return
+        frac = min(max(done / total, 0.0), 1.0)  # 0..1
+        progress(round((prefix[phase] + WEIGHTS[phase] * frac) * 100))
+
+    report.progress = progress
+
+    return report
+
+
+# ---------- 落点决策 ----------
+
+def name_keepers(groups):
+    """为每组的主图生成新文件名；返回 (可命名的组, 主图 → 新文件名)，无法命名的组直接跳过"""
+    dedup_groups = []
+    names: Dict[PhotoRecord, str] = {}
+    for keep, dupes in groups:
+        try:
+            names[keep] = build_new_filename(keep.date, keep.path.name, keep.path.suffix.lower())
+            dedup_groups.append((keep, dupes))
+        except Exception as e:
+            emit("error", f"[ERROR] Failed to process main photo {keep.path.name}: {e}")
+    return dedup_groups, names
+
+
+def decide_plan(header: dict, records: List[PhotoRecord], dedup_groups, names: Dict[PhotoRecord, str],
+                 visual_dupe_map, outputs: OutputIndex, resumed: Dict[str, Path], report,
+                 stats: RunStats) -> OrganizePlan:
+    """
+    Phase 4: 为每个文件决定最终位置：主图 → 输出目录，精确 / 视觉重复 → duplicates/，
+    同名冲突通过 OutputIndex 解决，尚未写入的目标先预留。
+    dedup_groups 为精确去重的 (主图, [重复]) 列表，visual_dupe_map 为 {最早者: [视觉重复]}；
+    单机整理（organizer._build_plan）与合并索引分片（shard.merge_shards）共用。
+    """
+    output_dir, duplicate_dir = Path(header["output"]), Path(header["duplicates"])
+
+    def out_folder(rec: PhotoRecord) -> Path:
+        return output_dir / f"{rec.date.year:04d}" / f"{rec.date.month:02d}"
+
+    visual_dupes = {rec for dupes in visual_dupe_map.values() for rec in dupes}
+
+    # -----------------------------
+    # Phase 4: 决定每个文件的落点
+    # -----------------------------
+    with stats.phase("decide") as ph:
+        ops: List[PlanOp] = []
+        where: Dict[PhotoRecord, Path] = {}  # 记录 → 执行后所在位置（供回顾）
+        resumed_counts = Counter()
+        stat_skip_same = 0  # 幂等跳过次数（同名同内容）
+
+        def decide(rec: PhotoRecord, kind: str, folder: Path, name: str) -> Path:
+            """幂等：断点续跑已放好的直接沿用；已有同名同内容 → 跳过；否则按需生成唯一文件名并记下放置"""
+            nonlocal stat_skip_same
+            prior = resumed.get(str(rec.path))
+            if prior is not None and prior.parent == folder:
+                resumed_counts[kind] += 1
+                emit("resume", f"[RESUME] already placed: {rec.name} → {prior}", rec.path, prior)
+                return prior
+            target = outputs.resolve(rec, folder, name)
+            if target is None:
+                stat_skip_same += 1
+                if kind == "out":
+                    emit("skipped", f"[SKIP] already organized: {rec.name} → {folder.relative_to(output_dir)}/{name}",
+                         rec.path, folder / name)
+                elif kind == "dup":
+                    emit("skipped", f"[SKIP] duplicate already saved: {rec.name}", rec.path, folder / name)
+                else:
+                    emit("skipped", f"[SKIP] Visual duplicate already saved: {rec.name}", rec.path, folder / name)
+                return folder / name
+            outputs.reserve(target, rec)
+            ops.append(PlanOp(kind, rec.path, target, rec.fingerprint, rec.digest))
+            return target
+
+        # 4a. 主图进输出目录（视觉重复除外），精确重复进 duplicates
+        n_visual_total = len(dedup_groups) + len(visual_dupes)
+        n_visual_done = 0
+        md5_groups = []
+        for keep, dupes in dedup_groups:
+            if keep not in visual_dupes:
+                where[keep] = decide(keep, "out", out_folder(keep), names[keep])
+            dup_targets = [str(decide(dup, "dup", duplicate_dir, dup.path.name)) for dup in dupes]
+            if dupes:
+                md5_groups.append((keep, dup_targets))
+            n_visual_done += 1
+            report("visual", n_visual_done, n_visual_total)
+
+        # 4b. 视觉重复直接从源文件进 duplicates
+        visual_groups = []
+        for keep, dupes in visual_dupe_map.items():
+            # 组内已按拍摄时间排序，keep 即最早者
+            dup_targets = []
+            for rec in dupes:
+                where[rec] = decide(rec, "visual", duplicate_dir, rec.path.name)
+                dup_targets.append(str(where[rec]))
+                n_visual_done += 1
+                report("visual", n_visual_done, n_visual_total)
+            emit("info", f"[VISUAL KEEP] {keep.name}")
+            visual_groups.append((keep, dup_targets))
+
+        # 为 GUI 回顾收集分组：先 MD5 分组，后视觉分组；keep 为执行后的实际位置
+        review_groups = GroupStore()
+        for kind, groups in (("md5", md5_groups), ("visual", visual_groups)):
+            for keep, dup_targets in groups:
+                review_groups.add(kind, where.get(keep, out_folder(keep) / names[keep]), keep.path, dup_targets)
+        ph.files = len(records)
+
+    stats.collision_hashes = outputs.n_hashed
+    emit("info", f"[INFO] Output collision checks hashed {outputs.n_hashed} files")
+    plan_stats = {"total": len(records), "skipped_same": stat_skip_same, "resumed": dict(resumed_counts)}
+    return OrganizePlan(header, sorted(outputs.missing), ops, review_groups, plan_stats)
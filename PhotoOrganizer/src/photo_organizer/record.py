@@ -0,0 +1,60 @@
+# record.py
+from pathlib import Path
+from datetime import datetime
+from typing import Optional
+import os
+
+from photo_organizer.metadata import get_photo_datetime
+
+
+class PhotoRecord:
+    """
+    单张图片在一次运行中的全部信息：
+    - stat 快照（size / mtime_ns / inode / ctime），扫描时只 stat 一次；
+    - EXIF 拍摄时间、首尾块哈希、内容摘要、感知哈希，各自至多计算一次
+      （首尾块哈希与摘要只在分级去重确有需要时才计算，否则保持 None）。
+    使用 __slots__ 保持对象紧凑（大图库下会有几十万个实例）。
+    """
+
+    __slots__ = ("path", "size", "mtime_ns", "ino", "ctime", "date", "edge", "digest", "phash")
+
+    def __init__(self, path: Path, st: Optional[os.stat_result] = None):
+        if st is None:
+            st = path.stat()
+        self.path = path
+        self.size = st.st_size
+        self.mtime_ns = st.st_mtime_ns
+        self.ino = st.st_ino
+        self.ctime = st.st_ctime
+        self.date: Optional[datetime] = None
+        self.edge: Optional[str] = None
+        self.digest: Optional[str] = None
+        self.phash: Optional[str] = None
+
+    @classmethod
+    def from_fingerprint(cls, path: Path, fingerprint: tuple, ctime: float = 0.0) -> "PhotoRecord":
+        """由已知的指纹 (size, mtime_ns, inode) 重建记录，不访问文件（如读入其他机器写出的索引分片）"""
+        rec = cls.__new__(cls)
+        rec.path = path
+        rec.size, rec.mtime_ns, rec.ino = fingerprint
+        rec.ctime = ctime
+        rec.date = rec.edge = rec.digest = rec.phash = None
+        return rec
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+    @property
+    def fingerprint(self) -> tuple:
+        """与 DigestCache 一致的文件指纹：(size, mtime_ns, inode)"""
+        return (self.size, self.mtime_ns, self.ino)
+
+    def load_date(self) -> datetime:
+        """解析拍摄时间（只解析一次，fallback 使用扫描时的 ctime，不再额外 stat）"""
+        if self.date is None:
+            self.date = get_photo_datetime(self.path, ctime=self.ctime)
+        return self.date
+
+    def __repr__(self):
+        return f"PhotoRecord({self.path.name!r}, size={self.size}, date={self.date})"
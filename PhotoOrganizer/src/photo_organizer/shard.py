@@ -0,0 +1,275 @@
+# shard.py
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import json
+import os
+import socket
+
+import numpy as np
+
+from photo_organizer.cache import DigestCache, CACHE_FILENAME
+from photo_organizer.compact_index import CompactDigestIndex
+from photo_organizer.digest import DigestBackend, DEFAULT_ALGO, perceptual_hash
+from photo_organizer.events import emit
+from photo_organizer.output_index import OutputIndex
+from photo_organizer.parallel import run_chunked
+from photo_organizer.placement import DEFAULT_MODE, PLACEMENT_MODES
+from photo_organizer.plan import OrganizePlan
+from photo_organizer.planning import (decide_plan, digest_task, date_task, edge_task, guarded, make_reporter,
+                                      name_keepers)
+from photo_organizer.record import PhotoRecord
+from photo_organizer.stats import RunStats
+from photo_organizer.walker import walk_images, IMAGE_EXTS
+
+SHARD_VERSION = 2
+SHARD_CACHE_SUFFIX = ".cache.sqlite3"
+
+
+def default_shard_cache(shard_path: Path) -> Path:
+    """分片默认使用自己的摘要缓存（同一目录下并发写出的多个分片互不争用同一个 SQLite 文件）"""
+    return shard_path.with_suffix(SHARD_CACHE_SUFFIX)
+
+
+# ---------- 分片：在数据所在处扫描与哈希 ----------
+
+def build_shard(input_dir: Path, shard_path: Path, exclude: Iterable[Path] = (), cache_path: Optional[Path] = None,
+                use_cache: bool = True, workers: int = 1, hash_algo: str = DEFAULT_ALGO, scan_threads: int = 1,
+                stats: Optional[RunStats] = None) -> int:
+    """
+    扫描并哈希 input_dir 子树，把结果写成一个索引分片（CompactDigestIndex 各列 + 源文件指纹，npz 格式），
+    返回分片中的图片数。稍后由 merge_shards 与其他分片合并、跨分片去重并生成整体计划。
+
+    分片内照常走尺寸漏斗：只有分片内尺寸冲突者才读首尾块，首尾块仍冲突才读完整摘要；
+    分片里的状态位记下每个文件已有哪些哈希，merge_shards 合并后只为跨分片新出现的冲突补算（见该函数）。
+    感知哈希只为分片内精确去重后的主图计算——跨分片的主图必然也是其所在分片的主图。
+    读取失败的文件不写入分片。摘要 / 拍摄时间 / pHash 照常进入摘要缓存
+    （默认为分片旁的 <分片名>.cache.sqlite3），重建分片时未变化的文件不再读取。
+    分片先写到临时文件再原子替换，中断时不会留下半个分片。
+    """
+    input_dir, shard_path = input_dir.resolve(), Path(shard_path).resolve()
+    exclude = [Path(p).resolve() for p in exclude]
+    cache = DigestCache(cache_path or default_shard_cache(shard_path), algo=hash_algo) if use_cache else None
+    stats = stats if stats is not None else RunStats()
+    backend = DigestBackend(hash_algo)
+    try:
+        with stats.phase("scan") as ph:
+            records = [PhotoRecord(path, st)
+                       for path, st in walk_images(input_dir, IMAGE_EXTS, exclude, scan_threads)]
+            ph.files = len(records)
+        emit("info", f"[INFO] Found {len(records)} images in {input_dir}")
+
+        failed = set()
+
+        def run_stage(phase: str, fn, todo: List[PhotoRecord]):
+            results = run_chunked(partial(guarded, fn), todo, workers)
+            for rec, (value, err) in zip(todo, results):
+                if err is not None:
+                    emit("error", f"[ERROR] Failed to process {phase} for {rec.path}: {err}")
+                    failed.add(rec)
+                    continue
+                yield rec, value
+
+        with stats.phase("meta") as ph:
+            todo = [rec for rec in records if not cache.load_record(rec) or rec.date is None] \
+                if cache is not None else records
+            for rec, date in run_stage("meta", date_task, todo):
+                rec.date = date
+            ph.files = len(todo)
+
+        records = [rec for rec in records if rec not in failed]
+        index = CompactDigestIndex.from_records(records, hash_algo)
+
+        # 分片内的分级漏斗：尺寸冲突 → 首尾块，首尾块冲突 → 完整摘要；读取失败者移出索引
+        def funnel(phase: str, fn, ids: List[int], store):
+            for rec, value in run_stage(phase, fn, [records[i] for i in ids]):
+                setattr(rec, store, value)
+            for i in ids:
+                value = getattr(records[i], store)
+                if value is None:
+                    index.discard(i)
+                else:
+                    getattr(index, f"set_{store}")(i, value)
+
+        with stats.phase("edge") as ph:
+            ids = index.needs_edge_hash()
+            funnel("edge", partial(edge_task, backend), ids, "edge")
+            ph.files = len(ids)
+            ph.bytes_read = sum(min(records[i].size, 2 << 16) for i in ids)
+        with stats.phase("digest") as ph:
+            ids = index.needs_full_hash()
+            funnel("md5", partial(digest_task, backend), ids, "digest")
+            ph.files = len(ids)
+            ph.bytes_read = sum(records[i].size for i in ids)
+
+        if failed:
+            records = [rec for rec in records if rec not in failed]
+            index = CompactDigestIndex.from_records(records, hash_algo)
+
+        with stats.phase("phash") as ph:
+            keepers = [k for k, _ in index.iter_deduplicated()]
+            todo = [k for k in keepers if records[k].phash is None]
+            for k, phash in zip(todo, run_chunked(perceptual_hash, [records[k].path for k in todo], workers)):
+                records[k].phash = phash
+            for k in keepers:
+                index.add_phash(k, records[k].phash)
+            ph.files = len(todo)
+            ph.bytes_read = sum(records[k].size for k in todo)
+
+        if cache is not None:
+            for rec in records:
+                cache.store_record(rec)
+            cache.flush()
+
+        meta = {
+            "version": SHARD_VERSION,
+            "root": str(input_dir),
+            "host": socket.gethostname(),
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "hash": hash_algo,
+            "files": len(records),
+        }
+        save_shard(shard_path, index, [rec.fingerprint for rec in records], meta)
+        emit("info", f"[SHARD] {len(records)} images from {input_dir} → {shard_path} "
+                     f"({shard_path.stat().st_size} bytes)")
+        return len(records)
+    finally:
+        if cache is not None:
+            stats.cache_hits, stats.cache_misses = cache.hits, cache.misses
+            cache.close()
+        stats.finish()
+
+
+def save_shard(path: Path, index: CompactDigestIndex, fingerprints: Sequence[tuple], meta: dict):
+    """写出分片：索引各列（见 CompactDigestIndex.to_arrays）+ 每个文件的 mtime_ns / inode + JSON 元信息"""
+    fp = np.array(fingerprints, dtype=np.int64).reshape(-1, 3)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.savez(f, mtime_ns=fp[:, 1], ino=fp[:, 2],
+                 meta=np.frombuffer(json.dumps(meta, ensure_ascii=False).encode("utf-8"), dtype=np.uint8),
+                 **index.to_arrays())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load_shard(path: Path) -> Tuple[Dict[str, np.ndarray], dict]:
+    """读入分片，返回 (各列数组, 元信息)"""
+    with np.load(path) as data:
+        arrays = {key: data[key] for key in data.files}
+    meta = json.loads(arrays.pop("meta").tobytes().decode("utf-8"))
+    if meta.get("version") != SHARD_VERSION:
+        raise ValueError(f"{path}: unsupported shard version {meta.get('version')!r} (expected {SHARD_VERSION})")
+    return arrays, meta
+
+
+# ---------- 合并：跨分片去重，生成整体计划 ----------
+
+def _check_roots(metas: List[dict], paths: Sequence[Path]):
+    """同一子树被两个分片重复扫描时，其中的文件会互为“重复”并被放置两次，直接拒绝"""
+    roots = [Path(meta["root"]) for meta in metas]
+    for i, a in enumerate(roots):
+        for j, b in enumerate(roots):
+            if i != j and a.is_relative_to(b):
+                raise ValueError(f"shards overlap: {paths[i]} ({a}) lies inside {paths[j]} ({b})")
+
+
+def merge_shards(shard_paths: Sequence[Path], output_dir: Path, duplicate_dir: Path,
+                 cache_path: Optional[Path] = None, use_cache: bool = True, visual_distance: int = 0,
+                 mode: str = DEFAULT_MODE, stats: Optional[RunStats] = None, workers: int = 1) -> OrganizePlan:
+    """
+    合并若干索引分片，跨全部分片做精确去重与视觉去重，返回整体的放置计划（可保存后用 apply_plan 执行）。
+    分组在合并后的 CompactDigestIndex 上完成，结果与把所有文件放在一次整理中相同
+    （分片按给出的顺序接续，相当于依次扫描各子树）；之后的落点决策与 organize_photos 共用（见 planning.decide_plan）。
+    分片只在各自内部走尺寸漏斗，合并后尺寸（及首尾块）才跨分片冲突的文件缺少所需的哈希：
+    合并时只为这些文件读取源文件补算首尾块 / 完整摘要（workers 个进程），其余文件只读分片。
+    计划中的源路径为各工作进程扫描时的绝对路径，合并与执行计划的机器须能以相同路径访问它们
+    （本机多盘，或把其他机器的目录挂载到相同位置）；补算时读不到的文件不进入计划。
+    """
+    if mode not in PLACEMENT_MODES:
+        raise ValueError(f"unknown placement mode: {mode!r} (expected one of {PLACEMENT_MODES})")
+    if not shard_paths:
+        raise ValueError("no shards to merge")
+    output_dir, duplicate_dir = output_dir.resolve(), duplicate_dir.resolve()
+    stats = stats if stats is not None else RunStats()
+    report = make_reporter(None)
+
+    with stats.phase("merge") as ph:
+        parts, metas = zip(*(load_shard(Path(p)) for p in shard_paths))
+        algos = {meta["hash"] for meta in metas}
+        if len(algos) > 1:
+            raise ValueError(f"shards were hashed with different algorithms: {sorted(algos)}")
+        _check_roots(list(metas), shard_paths)
+        hash_algo = algos.pop()
+        index = CompactDigestIndex.from_arrays(parts, hash_algo)
+        mtime_ns = np.concatenate([part["mtime_ns"] for part in parts]).tolist()
+        ino = np.concatenate([part["ino"] for part in parts]).tolist()
+        del parts
+
+        # 落点决策仍以 PhotoRecord 为单位（指纹随计划保存，执行时校验源文件未变）
+        records = []
+        for i in range(len(index)):
+            rec = PhotoRecord.from_fingerprint(index.path(i), (index.size(i), mtime_ns[i], ino[i]))
+            rec.date, rec.edge, rec.digest, rec.phash = index.date(i), index.edge(i), index.digest(i), index.phash(i)
+            records.append(rec)
+        ph.files = len(records)
+        emit("info", f"[INFO] Merged {len(shard_paths)} shards: {len(records)} images from "
+                     + ", ".join(f"{meta['host']}:{meta['root']}" for meta in metas))
+
+    # 跨分片的分级漏斗：只有合并后才冲突的文件缺少所需的哈希，读取源文件补算；读不到的移出索引
+    backend = DigestBackend(hash_algo)
+    failed = set()
+    for phase, label, field, task in (("edge", "edge", "edge", edge_task), ("digest", "md5", "digest", digest_task)):
+        with stats.phase(phase) as ph:
+            ids = index.needs_edge_hash() if field == "edge" else index.needs_full_hash()
+            results = run_chunked(partial(guarded, partial(task, backend)), [records[i] for i in ids], workers)
+            for i, (value, err) in zip(ids, results):
+                if err is not None:
+                    emit("error", f"[ERROR] Failed to process {label} for {records[i].path}: {err}")
+                    index.discard(i)
+                    failed.add(i)
+                    continue
+                setattr(records[i], field, value)
+                getattr(index, f"set_{field}")(i, value)
+                ph.bytes_read += min(records[i].size, 2 << 16) if field == "edge" else records[i].size
+            ph.files = len(ids)
+
+    with stats.phase("group") as ph:
+        dedup_groups, names = name_keepers(
+            (records[k], [records[d] for d in dupes]) for k, dupes in index.iter_deduplicated())
+        ph.files = len(records) - len(failed)
+
+    with stats.phase("visual") as ph:
+        ids = {rec: i for i, rec in enumerate(records)}
+        for keep, _ in dedup_groups:
+            k = ids[keep]
+            if keep.phash is None:
+                emit("warn", f"[WARN] Shard has no perceptual hash for {keep.path}; skipped for visual dedup")
+                continue
+            index.add_phash(k, keep.phash)
+        visual_dupe_map = {records[k]: [records[d] for d in dupes]
+                           for k, dupes in index.get_visual_duplicates_map(visual_distance).items()}
+        ph.files = len(dedup_groups)
+
+    cache = DigestCache(cache_path or output_dir / CACHE_FILENAME, algo=hash_algo) if use_cache else None
+    try:
+        outputs = OutputIndex(cache, DigestBackend(hash_algo), create_dirs=False)
+        header = {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "input": os.pathsep.join(meta["root"] for meta in metas),
+            "shards": [str(Path(p).resolve()) for p in shard_paths],
+            "output": str(output_dir),
+            "duplicates": str(duplicate_dir),
+            "mode": mode,
+            "hash": hash_algo,
+            "visual_distance": visual_distance,
+            "visual_confirm": None,
+        }
+        live = [rec for i, rec in enumerate(records) if i not in failed] if failed else records
+        return decide_plan(header, live, dedup_groups, names, visual_dupe_map, outputs, {}, report, stats)
+    finally:
+        if cache is not None:
+            stats.cache_hits, stats.cache_misses = cache.hits, cache.misses
+            cache.close()
+        stats.finish()
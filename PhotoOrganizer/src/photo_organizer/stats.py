@@ -0,0 +1,144 @@
+# stats.py
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+import cProfile
+import json
+import os
+import time
+
+from photo_organizer.events import emit
+from photo_organizer.groups import GroupStore
+
+# 不写入数据的放置方式（其余方式按源文件大小计入写入字节数）
+ZERO_COPY_METHODS = {"hardlink", "reflink", "move"}
+
+
+def _cpu_seconds() -> float:
+    """本进程 + 已结束子进程（run_chunked 的进程池在每级计算结束时回收）的 CPU 时间"""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+class PhaseStats:
+    """一个阶段的计量：墙钟时间、CPU 时间、处理的文件数与读写字节数"""
+
+    __slots__ = ("name", "wall", "cpu", "files", "bytes_read", "bytes_written")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.files = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    @property
+    def files_per_s(self) -> float:
+        return self.files / self.wall if self.wall > 0 else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "wall_s": round(self.wall, 6),
+            "cpu_s": round(self.cpu, 6),
+            "files": self.files,
+            "files_per_s": round(self.files_per_s, 1),
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+        }
+
+    def __repr__(self):
+        return f"PhaseStats({self.name}, wall={self.wall:.3f}s, cpu={self.cpu:.3f}s, files={self.files})"
+
+
+class RunStats:
+    """
+    一次整理的计量结果（organize_photos 的返回值）：
+    - phases: 按执行顺序的各阶段 PhaseStats（scan / meta / edge / digest / phash / visual / decide / apply）；
+    - counts: 与 [SUMMARY] 相同的放置统计；
+    - cache_hits / cache_misses: 摘要缓存命中情况；collision_hashes: 同名冲突判断中实际读取的文件数；
+    - review_groups: 供 GUI 回顾的重复分组（见 groups.GroupStore）。
+    读取字节数按文件大小估算（首尾块哈希按实际读取的两块计），感知哈希的降分辨率解码按整个文件计。
+    profile_dir 不为空时，每个阶段在 cProfile 下运行，结果写入 profile_dir/<阶段>.pstats
+    （同名阶段多次进入时累加到同一份；只包含主进程，workers > 1 时子进程中的计算不在其中）。
+    """
+
+    def __init__(self, profile_dir: Optional[Path] = None):
+        self.phases: Dict[str, PhaseStats] = {}
+        self.counts: Dict[str, int] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.collision_hashes = 0
+        self.review_groups = GroupStore()
+        self.profile_dir = Path(profile_dir) if profile_dir else None
+        self._profilers: Dict[str, cProfile.Profile] = {}
+        self.wall = 0.0
+        self._t0 = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str):
+        """计量一个阶段；同名阶段多次进入时累加"""
+        ph = self.phases.get(name)
+        if ph is None:
+            ph = self.phases[name] = PhaseStats(name)
+        profiler = None
+        if self.profile_dir is not None:
+            profiler = self._profilers.get(name)
+            if profiler is None:
+                profiler = self._profilers[name] = cProfile.Profile()
+        t0, c0 = time.perf_counter(), _cpu_seconds()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield ph
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            ph.wall += time.perf_counter() - t0
+            ph.cpu += _cpu_seconds() - c0
+            if profiler is not None:
+                self.profile_dir.mkdir(parents=True, exist_ok=True)
+                profiler.dump_stats(str(self.profile_dir / f"{name}.pstats"))
+
+    def finish(self):
+        """记下整次运行的墙钟时间"""
+        self.wall = time.perf_counter() - self._t0
+
+    @property
+    def files(self) -> int:
+        scan = self.phases.get("scan")
+        return scan.files if scan is not None else 0
+
+    @property
+    def bytes_read(self) -> int:
+        return sum(ph.bytes_read for ph in self.phases.values())
+
+    @property
+    def bytes_written(self) -> int:
+        return sum(ph.bytes_written for ph in self.phases.values())
+
+    def to_dict(self) -> dict:
+        return {
+            "wall_s": round(self.wall, 6),
+            "cpu_s": round(sum(ph.cpu for ph in self.phases.values()), 6),
+            "files": self.files,
+            "files_per_s": round(self.files / self.wall, 1) if self.wall > 0 else 0.0,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "cache": {"hits": self.cache_hits, "misses": self.cache_misses},
+            "collision_hashes": self.collision_hashes,
+            "counts": self.counts,
+            "phases": {name: ph.to_dict() for name, ph in self.phases.items()},
+        }
+
+    def save(self, path: Path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    def describe(self):
+        """每个阶段打印一行计量"""
+        for ph in self.phases.values():
+            emit("info", f"[STATS] {ph.name:<7} wall={ph.wall:.3f}s cpu={ph.cpu:.3f}s files={ph.files} "
+                         f"({ph.files_per_s:.0f}/s) read={ph.bytes_read / 1e6:.1f}MB written={ph.bytes_written / 1e6:.1f}MB")
+        emit("info", f"[STATS] total   wall={self.wall:.3f}s files={self.files} "
+                     f"cache_hits={self.cache_hits} cache_misses={self.cache_misses}")
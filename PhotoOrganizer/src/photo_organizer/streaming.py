@@ -0,0 +1,471 @@
+# streaming.py
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+import queue
+import threading
+
+from photo_organizer.cache import DigestCache, CACHE_FILENAME, origin_key
+from photo_organizer.digest import DigestBackend, DEFAULT_ALGO, perceptual_hash
+from photo_organizer.events import emit, ProgressThrottle
+from photo_organizer.groups import GroupStore
+from photo_organizer.neardup import MultiIndexHash, hash_to_int
+from photo_organizer.output_index import OutputIndex
+from photo_organizer.placement import place_file, DEFAULT_MODE, PLACEMENT_MODES
+from photo_organizer.record import PhotoRecord
+from photo_organizer.renamer import build_new_filename
+from photo_organizer.walker import walk_images, IMAGE_EXTS
+
+_DONE = object()  # 队列结束标记
+
+
+def bounded_map(fn, items: Iterable, pool: ThreadPoolExecutor, depth: int) -> Iterator:
+    """按输入顺序产出 fn(item)；在途任务不超过 depth 个，上游因此自然受到背压"""
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= depth:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class _Group:
+    """
+    一组内容完全相同的文件：keep 为其中拍摄时间最早者。
+    精确重复放置完成后不再参与任何比较，dupes 只保存它们的最终路径（见 StreamingOrganizer._retire）。
+    """
+
+    __slots__ = ("keep", "dupes", "cluster")
+
+    def __init__(self, keep: PhotoRecord):
+        self.keep = keep
+        self.dupes: List[str] = []
+        self.cluster: Optional["_Cluster"] = None
+
+
+class _Cluster:
+    """一组视觉重复的精确分组：leader 的 keep 放入输出目录，其余分组的 keep 放入 duplicates"""
+
+    __slots__ = ("groups", "leader")
+
+    def __init__(self, leader: _Group):
+        self.groups = [leader]
+        self.leader = leader
+        leader.cluster = self
+
+
+class StreamingOrganizer:
+    """
+    流式整理：扫描、哈希与放置三段同时进行，由有界队列相连。
+
+        扫描线程 ──queue──▶ 预处理线程池（缓存 / 拍摄时间 / pHash）──▶ 决策（调用线程）──queue──▶ 放置线程
+
+    决策是增量的：每来一个文件就立即决定它是“主图”还是重复，并发出放置动作；
+    之后若出现拍摄时间更早的精确 / 视觉重复，就把原主图降级（挪到 duplicates），
+    新来者取而代之。因此第一批文件几秒内就会出现在输出目录里，
+    而最终的分组与分阶段的 organize_photos 相同（同日期时先扫描到者优先）。
+
+    精确去重沿用分级漏斗：尺寸唯一的文件不读内容，尺寸冲突才算首尾块哈希，再冲突才算完整摘要。
+    视觉去重：visual_distance=0 时按 pHash 相等归组；>0 时以每组第一个 pHash 为锚点，
+    用 MultiIndexHash 增量查询近邻（贪心结果与整批聚类可能略有差异）。
+
+    队列与在途任务都有上限，待处理文件不会堆积；但去重必须记住见过的一切，内存随已处理的文件数线性增长，
+    并非常量：每个不同内容保留一个 PhotoRecord（主图，含其位置与视觉索引条目），
+    每个精确重复在放置后只留下一条最终路径字符串（供回顾分组），记录本身随即释放。
+    """
+
+    def __init__(self, output_dir: Path, duplicate_dir: Path, cache: Optional[DigestCache] = None,
+                 backend: Optional[DigestBackend] = None, mode: str = DEFAULT_MODE,
+                 visual_distance: int = 0, queue_size: int = 256):
+        if mode not in PLACEMENT_MODES:
+            raise ValueError(f"unknown placement mode: {mode!r} (expected one of {PLACEMENT_MODES})")
+        self.output_dir = output_dir
+        self.duplicate_dir = duplicate_dir
+        self.cache = cache
+        self.backend = backend or DigestBackend(cache.algo if cache is not None else DEFAULT_ALGO)
+        self.mode = mode
+        self.visual_distance = visual_distance
+        self.queue_size = queue_size
+
+        # 精确去重：size → 该尺寸下的各内容分组
+        self.sizes: Dict[int, List[_Group]] = {}
+        self.groups: List[_Group] = []
+
+        # 视觉去重：pHash → 簇（distance=0），或 锚点 id → 簇（distance>0）
+        self.clusters_by_hash: Dict[str, _Cluster] = {}
+        self.mih = MultiIndexHash(visual_distance) if visual_distance > 0 else None
+        self.anchors: List[_Cluster] = []
+
+        # 放置线程维护的状态：主图记录 → (当前路径, "out" / "dup", 是否本次放置)
+        # move 模式下文件会被挪走，决策线程读取内容时须持锁并按当前路径读取；精确重复放置后即移出
+        self.location: Dict[PhotoRecord, tuple] = {}
+        self.outputs = OutputIndex(cache, self.backend)
+        self._lock = threading.Lock()
+        self.n_skip_same = 0
+        self.n_placed = 0
+        self.n_errors = 0
+        self._actions: Optional[queue.Queue] = None
+        self._placer: Optional[threading.Thread] = None
+        self._replaying = False
+
+    # ---------- 放置线程 ----------
+
+    def start(self):
+        """启动放置线程（feed 之前调用；可多次 feed，最后调用 finish）"""
+        self._actions = queue.Queue(self.queue_size)
+        self._placer = threading.Thread(target=self._place_loop, name="placement", daemon=True)
+        self._placer.start()
+
+    def drain(self):
+        """等待目前已发出的放置动作全部完成（放置线程继续运行，可接着 feed）"""
+        self._actions.join()
+
+    def finish(self):
+        """等待所有放置动作完成"""
+        self._actions.put(_DONE)
+        self._placer.join()
+
+    def _place_loop(self):
+        while True:
+            action = self._actions.get()
+            if action is _DONE:
+                return
+            kind, rec, group = action
+            try:
+                with self._lock:
+                    getattr(self, f"_do_{kind}")(rec)
+            except Exception as e:
+                self.n_errors += 1
+                emit("error", f"[ERROR] Failed to place {rec.path.name}: {e}")
+            finally:
+                if group is not None:
+                    self._retire(rec, group)
+                self._actions.task_done()
+
+    def _retire(self, rec: PhotoRecord, group: _Group):
+        """rec 已作为 group 的精确重复放置完毕：只留下最终路径，写入摘要缓存后不再持有记录"""
+        with self._lock:
+            group.dupes.append(self._where(rec))
+            self.location.pop(rec, None)
+            if self.cache is not None:
+                self.cache.store_record(rec)
+
+    def _put(self, rec: PhotoRecord, src: Path, target: Path, mode: str):
+        place_file(src, target, mode)
+        st = target.stat()
+        self.outputs.add(target, st)
+        if src != rec.path:
+            self.outputs.discard(src)
+        if self.cache is not None:
+            self.cache.put(target, st, digest=rec.digest, origin=origin_key(rec.path, rec.fingerprint))
+        self.n_placed += 1
+
+    def _out_target(self, rec: PhotoRecord):
+        date = rec.date
+        folder = self.output_dir / f"{date.year:04d}" / f"{date.month:02d}"
+        return folder, build_new_filename(date, rec.name, rec.path.suffix.lower())
+
+    def _do_out(self, rec: PhotoRecord):
+        date = rec.date
+        folder, name = self._out_target(rec)
+        target = self.outputs.resolve(rec, folder, name)
+        if target is None:
+            self.n_skip_same += 1
+            emit("skipped", f"[SKIP] already organized: {rec.name} → {date.year:04d}/{date.month:02d}/{name}",
+                 rec.path, folder / name)
+            self.location[rec] = (folder / name, "out", False)
+            return
+        self._put(rec, rec.path, target, self.mode)
+        self.location[rec] = (target, "out", True)
+        emit("placed", f"[OK] {rec.name} → {target.relative_to(self.output_dir)}", rec.path, target)
+
+    def _do_dup(self, rec: PhotoRecord, src: Optional[Path] = None, mode: Optional[str] = None):
+        target = self.outputs.resolve(rec, self.duplicate_dir, rec.name, src)
+        if target is None:
+            self.n_skip_same += 1
+            emit("skipped", f"[SKIP] duplicate already saved: {rec.name}", rec.path, self.duplicate_dir / rec.name)
+            self.location[rec] = (self.duplicate_dir / rec.name, "dup", False)
+            return False
+        self._put(rec, src or rec.path, target, mode or self.mode)
+        self.location[rec] = (target, "dup", True)
+        emit("duplicate", f"[DUPLICATE] {rec.name} → {target.relative_to(self.duplicate_dir)}", rec.path, target)
+        return True
+
+    def _do_demote(self, rec: PhotoRecord):
+        """原主图被更早的重复取代：本次放进输出目录的文件直接挪到 duplicates"""
+        path, where, owned = self.location.get(rec, (None, "dup", False))
+        if where == "dup":
+            return
+        if owned:
+            if not self._do_dup(rec, src=path, mode="move"):
+                path.unlink(missing_ok=True)
+                self.outputs.discard(path)
+        else:
+            # 上次运行留下的输出文件不动，与分阶段流程一致
+            self._do_dup(rec)
+
+    # ---------- 预处理（线程池中执行） ----------
+
+    def _prepare(self, rec: PhotoRecord):
+        try:
+            if self.cache is not None:
+                self.cache.load_record(rec)
+            rec.load_date()
+            if rec.phash is None:
+                rec.phash = perceptual_hash(rec.path)
+            return rec, None
+        except Exception as e:
+            return rec, str(e)
+
+    # ---------- 决策（调用线程） ----------
+
+    def _emit(self, kind: str, rec: PhotoRecord, group: Optional[_Group] = None):
+        """发出放置动作；给出 group 时 rec 是该组的精确重复，放置后即被释放"""
+        if self._replaying:
+            self._note(kind, rec)
+            if group is not None:
+                self._retire(rec, group)
+            return
+        self._actions.put((kind, rec, group))
+
+    def _note(self, kind: str, rec: PhotoRecord):
+        """重放时不放置，只登记上次运行留下的名义位置（视为非本次放置：降级时原文件不动）"""
+        if kind == "out":
+            folder, name = self._out_target(rec)
+            self.location[rec] = (folder / name, "out", False)
+        else:
+            self.location[rec] = (self.duplicate_dir / rec.name, "dup", False)
+
+    def _same_content(self, a: PhotoRecord, b: PhotoRecord) -> bool:
+        """尺寸已相同：先比首尾块哈希，再比完整摘要（都按需计算、只算一次）"""
+        with self._lock:
+            for rec in (a, b):
+                if rec.edge is None:
+                    rec.edge = self.backend.edge_digest(self._current(rec))
+            if a.edge != b.edge:
+                return False
+            for rec in (a, b):
+                if rec.digest is None:
+                    rec.digest = self.backend.file_digest(self._current(rec))
+        return a.digest == b.digest
+
+    def _current(self, rec: PhotoRecord) -> Path:
+        """文件当前所在位置（move 模式下可能已被放置线程挪走）"""
+        loc = self.location.get(rec)
+        return loc[0] if loc is not None and loc[2] else rec.path
+
+    def _find_group(self, rec: PhotoRecord) -> Optional[_Group]:
+        bucket = self.sizes.setdefault(rec.size, [])
+        for group in bucket:
+            if self._same_content(rec, group.keep):
+                return group
+        return None
+
+    def _find_cluster(self, rec: PhotoRecord) -> Optional[_Cluster]:
+        if not rec.phash:
+            return None
+        if self.mih is None:
+            return self.clusters_by_hash.get(rec.phash)
+        matches = [self.anchors[i] for i in self.mih.query(hash_to_int(rec.phash))]
+        return min(matches, key=lambda c: c.leader.keep.date) if matches else None
+
+    def _new_cluster(self, group: _Group):
+        cluster = _Cluster(group)
+        if group.keep.phash:
+            if self.mih is None:
+                self.clusters_by_hash[group.keep.phash] = cluster
+            else:
+                self.mih.add(hash_to_int(group.keep.phash))
+                self.anchors.append(cluster)
+
+    def _promote(self, group: _Group):
+        """group 成为所在簇的 leader：原 leader 的主图先降级，腾出输出位置"""
+        cluster = group.cluster
+        old = cluster.leader
+        cluster.leader = group
+        if old is not group:
+            self._emit("demote", old.keep)
+        self._emit("out", group.keep)
+
+    def decide(self, rec: PhotoRecord):
+        """处理一个已预处理的记录，发出相应的放置动作"""
+        group = self._find_group(rec)
+
+        if group is None:
+            group = _Group(rec)
+            self.groups.append(group)
+            self.sizes[rec.size].append(group)
+            cluster = self._find_cluster(rec)
+            if cluster is None:
+                self._new_cluster(group)
+                self._emit("out", rec)
+            else:
+                cluster.groups.append(group)
+                group.cluster = cluster
+                if rec.date < cluster.leader.keep.date:
+                    self._promote(group)
+                else:
+                    self._emit("dup", rec)
+            return
+
+        if not rec.date < group.keep.date:
+            self._emit("dup", rec, group)
+            return
+
+        # 更早的精确重复：取代原主图。先降级原主图（已在 duplicates 中时不动）：
+        # 新主图内容相同，否则会被当作“已整理”跳过
+        old = group.keep
+        group.keep = rec
+        self._emit("demote", old, group)
+        cluster = group.cluster
+        if cluster.leader is group:
+            self._emit("out", rec)
+        elif rec.date < cluster.leader.keep.date:
+            self._promote(group)
+        else:
+            self._emit("dup", rec)
+
+    def feed(self, records: Iterable[PhotoRecord], workers: int = 1, on_record=None) -> int:
+        """预处理并逐个决策；返回处理的记录数。on_record(rec) 在每个记录决策后回调"""
+        n = 0
+        threads = max(1, workers)
+        with ThreadPoolExecutor(threads, thread_name_prefix="prepare") as pool:
+            for rec, err in bounded_map(self._prepare, records, pool, threads * 4):
+                if err is not None:
+                    emit("error", f"[ERROR] Failed to process {rec.path}: {err}")
+                    continue
+                try:
+                    self.decide(rec)
+                except Exception as e:
+                    emit("error", f"[ERROR] Failed to process {rec.path}: {e}")
+                    continue
+                n += 1
+                if on_record:
+                    on_record(rec)
+        return n
+
+    def replay(self, records: Iterable[PhotoRecord], workers: int = 1) -> int:
+        """
+        重建去重状态：让此前运行已处理过的记录经过同样的预处理与决策，但不放置任何文件
+        （拍摄时间 / pHash / 摘要通常都来自缓存，不读内容）。之后 feed 的新文件即可与它们去重。
+        须在 start() 之前调用；返回重放的记录数。
+        """
+        self._replaying = True
+        try:
+            return self.feed(records, workers)
+        finally:
+            self._replaying = False
+
+    # ---------- 结果 ----------
+
+    def _where(self, rec: PhotoRecord) -> str:
+        return str(self.location.get(rec, (rec.path,))[0])
+
+    def review_groups(self) -> GroupStore:
+        """回顾分组 GroupStore（与 organize_photos 返回的 RunStats.review_groups 格式相同，路径为文件的最终位置）"""
+        result = GroupStore()
+        for group in self.groups:
+            if group.dupes:
+                result.add("md5", self._where(group.keep), group.keep.path, group.dupes)
+        seen = set()
+        for group in self.groups:
+            cluster = group.cluster
+            if len(cluster.groups) < 2 or id(cluster) in seen:
+                continue
+            seen.add(id(cluster))
+            leader = cluster.leader
+            result.add("visual", self._where(leader.keep), leader.keep.path,
+                       [self._where(g.keep) for g in cluster.groups if g is not leader])
+        return result
+
+    def counts(self) -> dict:
+        n_visual = sum(1 for g in self.groups if g.cluster.leader is not g)
+        return {
+            "kept": len(self.groups) - n_visual,
+            "dupe_md5": sum(len(g.dupes) for g in self.groups),
+            "dupe_visual": n_visual,
+        }
+
+
+def organize_streaming(input_dir: Path, output_dir: Path, duplicate_dir: Path, progress_callback=None,
+                       cache_path: Optional[Path] = None, use_cache: bool = True, workers: int = 1,
+                       hash_algo: str = DEFAULT_ALGO, visual_distance: int = 0,
+                       mode: str = DEFAULT_MODE, scan_threads: int = 1, queue_size: int = 256) -> GroupStore:
+    """
+    organize_photos 的流式版本（参数相同）：扫描到第一张图片即开始放置，
+    不等全部哈希完成。workers 为预处理线程数（读取 EXIF / 计算 pHash），scan_threads 为扫描线程数。
+    总数在扫描结束前未知，progress_callback 以“已决策 / 已发现”的文件数估算进度（扫描结束后即为准确值）。
+    返回值与 organize_photos 不同：不是 RunStats，而是回顾分组 GroupStore（相当于 RunStats.review_groups）。
+    """
+    input_dir = input_dir.resolve()
+    output_dir = output_dir.resolve()
+    duplicate_dir = duplicate_dir.resolve()
+    cache = DigestCache(cache_path or output_dir / CACHE_FILENAME, algo=hash_algo) if use_cache else None
+
+    organizer = StreamingOrganizer(output_dir, duplicate_dir, cache, DigestBackend(hash_algo), mode,
+                                   visual_distance, queue_size)
+
+    # 扫描线程：生成器产出的记录经有界队列交给预处理
+    scanned = queue.Queue(queue_size)
+    n_found = [0]
+    n_done = [0]
+
+    def scan():
+        try:
+            for path, st in walk_images(input_dir, IMAGE_EXTS, [output_dir, duplicate_dir], scan_threads):
+                n_found[0] += 1
+                scanned.put(PhotoRecord(path, st))
+        except Exception as e:
+            emit("error", f"[ERROR] Scan failed: {e}")
+        finally:
+            scanned.put(_DONE)
+
+    def drain():
+        while True:
+            rec = scanned.get()
+            if rec is _DONE:
+                return
+            yield rec
+
+    progress = ProgressThrottle(progress_callback)
+
+    def on_record(rec):
+        # 不用 n_placed：降级会重复计数，已整理而跳过的文件又不计
+        n_done[0] += 1
+        p = min(99, int(100 * n_done[0] / max(n_found[0], 1)))
+        if p > progress.last:
+            progress(p)
+
+    scanner = threading.Thread(target=scan, name="scan", daemon=True)
+    organizer.start()
+    scanner.start()
+    n = organizer.feed(drain(), workers, on_record)
+    scanner.join()
+    organizer.finish()
+    emit("info", f"[INFO] Streamed {n_found[0]} images from {input_dir}")
+
+    progress(100)
+
+    cache_hits = 0
+    if cache is not None:
+        # 精确重复在放置后已写入缓存，这里只剩各组主图
+        for group in organizer.groups:
+            cache.store_record(group.keep)
+        cache_hits = cache.hits
+        cache.close()
+
+    counts = organizer.counts()
+    emit(
+        "summary",
+        "[SUMMARY] "
+        f"total={n_found[0]}, "
+        f"kept_md5={counts['kept']}, "
+        f"dupe_md5={counts['dupe_md5']}, "
+        f"dupe_visual={counts['dupe_visual']}, "
+        f"skipped_same={organizer.n_skip_same}, "
+        f"cache_hits={cache_hits}, "
+        f"output_dir={output_dir}, duplicates_dir={duplicate_dir}"
+    )
+    return organizer.review_groups()
@@ -0,0 +1,207 @@
+# thumbnails.py
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+import hashlib
+import io
+import os
+import threading
+
+import piexif
+from PIL import Image, ImageOps
+
+THUMB_SIZE = 480            # 缩略图最长边
+THUMB_QUALITY = 85
+THUMB_VERSION = 1           # 生成方式变化时递增，旧的磁盘缓存自然失效
+
+
+def default_cache_dir() -> Path:
+    """磁盘缓存默认位置：$XDG_CACHE_HOME/photo_organizer/thumbnails（按路径 + mtime 区分，可跨图库共用）"""
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "photo_organizer" / "thumbnails"
+
+
+# EXIF Orientation → 需要的变换（与 ImageOps.exif_transpose 相同）
+_ORIENTATION = {
+    2: (Image.Transpose.FLIP_LEFT_RIGHT,),
+    3: (Image.Transpose.ROTATE_180,),
+    4: (Image.Transpose.FLIP_TOP_BOTTOM,),
+    5: (Image.Transpose.TRANSPOSE,),
+    6: (Image.Transpose.ROTATE_270,),
+    7: (Image.Transpose.TRANSVERSE,),
+    8: (Image.Transpose.ROTATE_90,),
+}
+
+
+def _exif_thumbnail(img: Image.Image, size: int) -> Optional[Image.Image]:
+    """
+    EXIF 内嵌缩略图：不解码原图。只在足够大（最长边不小于 size 的一半）
+    且宽高比与原图一致（部分相机内嵌的是加黑边的 4:3 缩略图）时使用。
+    """
+    raw = img.info.get("exif")
+    if not raw:
+        return None
+    try:
+        exif = piexif.load(raw)
+    except Exception:
+        return None
+    data = exif.get("thumbnail")
+    if not data:
+        return None
+    try:
+        thumb = Image.open(io.BytesIO(data))
+        thumb.load()
+    except Exception:
+        return None
+    if max(thumb.size) < size // 2:
+        return None
+    if abs(thumb.width / thumb.height - img.width / img.height) > 0.02:
+        return None
+    for op in _ORIENTATION.get(exif.get("0th", {}).get(piexif.ImageIFD.Orientation), ()):
+        thumb = thumb.transpose(op)
+    return thumb
+
+
+def _reduced_decode(img: Image.Image, size: int) -> Image.Image:
+    """降分辨率解码（JPEG 直接按 1/2 ~ 1/8 解码，见 digest.load_reduced_gray），再按 EXIF 方向摆正"""
+    img.draft("RGB", (size, size))
+    img = ImageOps.exif_transpose(img)
+    img.thumbnail((size, size), Image.BILINEAR, reducing_gap=2.0)
+    return img
+
+
+def make_thumbnail(path: Path, size: int = THUMB_SIZE) -> bytes:
+    """生成缩略图（JPEG 字节）：优先使用 EXIF 内嵌缩略图，否则降分辨率解码"""
+    with Image.open(path) as img:
+        thumb = _exif_thumbnail(img, size)
+        if thumb is None:
+            thumb = _reduced_decode(img, size)
+        elif max(thumb.size) > size:
+            thumb.thumbnail((size, size), Image.BILINEAR)
+        if thumb.mode != "RGB":
+            thumb = thumb.convert("RGB")
+        out = io.BytesIO()
+        thumb.save(out, "JPEG", quality=THUMB_QUALITY)
+        return out.getvalue()
+
+
+class ThumbnailCache:
+    """
+    缩略图缓存，两级：
+    - 内存：最近使用的 memory_items 张（LRU，存 JPEG 字节，线程安全）；
+    - 磁盘：cache_dir/<key[:2]>/<key>.jpg，key 由 路径 + mtime_ns + 大小 + 缩略图尺寸 决定，文件改动后自然失效。
+    get() 在调用线程中同步取得；prefetch() 交给后台线程池预先生成，同一文件不会重复生成。
+    cache_dir=None 时只用内存缓存。
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None, size: int = THUMB_SIZE, memory_items: int = 256,
+                 workers: int = 2):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.size = size
+        self.memory_items = memory_items
+        self.workers = workers
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.generated = 0
+
+    def _key(self, path: Path) -> str:
+        st = os.stat(path)
+        raw = f"{THUMB_VERSION}|{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}|{self.size}"
+        return hashlib.sha1(raw.encode("utf-8", "surrogateescape")).hexdigest()
+
+    def _disk_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.jpg"
+
+    def _remember(self, key: str, data: bytes):
+        with self._lock:
+            self._memory[key] = data
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def _load(self, path: Path, key: str) -> bytes:
+        """磁盘缓存 → 生成（并写回磁盘缓存）"""
+        if self.cache_dir is not None:
+            disk = self._disk_path(key)
+            try:
+                data = disk.read_bytes()
+                self.disk_hits += 1
+                self._remember(key, data)
+                return data
+            except FileNotFoundError:
+                pass
+        data = make_thumbnail(path, self.size)
+        self.generated += 1
+        if self.cache_dir is not None:
+            disk.parent.mkdir(parents=True, exist_ok=True)
+            tmp = disk.with_name(f"{disk.name}.{threading.get_ident()}.part")
+            tmp.write_bytes(data)
+            os.replace(tmp, disk)  # 并发生成同一张时后写者覆盖，内容相同
+        self._remember(key, data)
+        return data
+
+    def get(self, path: Path) -> bytes:
+        """取得缩略图（JPEG 字节）；正在后台生成时等待其完成"""
+        key = self._key(path)
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return data
+            fut = self._pending.get(key)
+        if fut is not None:
+            return fut.result()
+        return self._load(path, key)
+
+    def cached(self, path: Path) -> bool:
+        """是否已在内存中（无需任何 I/O 即可显示）"""
+        try:
+            key = self._key(path)
+        except OSError:
+            return False
+        with self._lock:
+            return key in self._memory
+
+    def prefetch(self, paths: Iterable[Path]):
+        """后台预先生成；已在内存或已在生成中的跳过，缺失的文件忽略"""
+        for path in paths:
+            try:
+                key = self._key(path)
+            except OSError:
+                continue
+            with self._lock:
+                if key in self._memory or key in self._pending:
+                    continue
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="thumb")
+                fut = self._pool.submit(self._load, Path(path), key)
+                self._pending[key] = fut
+            fut.add_done_callback(lambda f, key=key: self._done(key))
+
+    def _done(self, key: str):
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def wait(self):
+        """等待所有预取完成（测试 / 关闭前使用）"""
+        while True:
+            with self._lock:
+                pending = list(self._pending.values())
+            if not pending:
+                return
+            for fut in pending:
+                try:
+                    fut.result()
+                except Exception:
+                    pass
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,67 @@
+# walker.py
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator, List, Tuple
+import os
+
+from photo_organizer.events import emit
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+
+
+def _scan_dir(path: str, exts: frozenset, exclude: frozenset) -> Tuple[List[Tuple[str, os.stat_result]], List[str]]:
+    """
+    扫描单个目录：返回 (匹配的文件及其 stat, 需要继续进入的子目录)。
+    - 文件类型取自 DirEntry（Linux 上来自 d_type，不需要额外系统调用），先按扩展名过滤再 stat；
+    - 被排除的子目录直接剪掉，不会进入；目录符号链接不跟随（避免环）。
+    """
+    files, subdirs = [], []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if os.path.normcase(entry.path) not in exclude:
+                            subdirs.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in exts and entry.is_file():
+                        files.append((entry.path, entry.stat()))
+                except OSError as e:
+                    emit("error", f"[ERROR] Cannot stat {entry.path}: {e}")
+    except OSError as e:
+        emit("warn", f"[WARN] Cannot read directory {path}: {e}")
+    files.sort()
+    subdirs.sort()
+    return files, subdirs
+
+
+def walk_images(root: Path, exts: Iterable[str] = IMAGE_EXTS, exclude: Iterable[Path] = (),
+                threads: int = 1) -> Iterator[Tuple[Path, os.stat_result]]:
+    """
+    基于 os.scandir 的图片遍历，产出 (路径, stat)；stat 可直接交给 PhotoRecord，之后不再重复 stat。
+    - 扩展名大小写不敏感；exclude 中的目录（如 output / duplicates）在进入前即被剪掉；
+    - 按层遍历，同一层的兄弟目录可用 threads 个线程并行扫描（适合 NAS / 网络盘这类高延迟存储）；
+    - 每个目录内按名称排序、按层输出，结果顺序与线程数无关，保证运行结果可复现。
+    """
+    exts = frozenset(e.lower() for e in exts)
+    exclude = frozenset(os.path.normcase(str(Path(p).resolve())) for p in exclude)
+    root = str(Path(root).resolve())
+    if os.path.normcase(root) in exclude:
+        return
+
+    def scan(path: str):
+        return _scan_dir(path, exts, exclude)
+
+    level = [root]
+    pool = ThreadPoolExecutor(threads, thread_name_prefix="walk") if threads > 1 else None
+    try:
+        while level:
+            results = pool.map(scan, level) if pool is not None else map(scan, level)
+            next_level = []
+            for files, subdirs in results:
+                for path, st in files:
+                    yield Path(path), st
+                next_level.extend(subdirs)
+            level = next_level
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
@@ -0,0 +1,216 @@
+# watch.py
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import json
+import os
+import threading
+import time
+
+from photo_organizer.cache import DigestCache, CACHE_FILENAME
+from photo_organizer.digest import DigestBackend, DEFAULT_ALGO
+from photo_organizer.events import emit
+from photo_organizer.groups import GroupStore
+from photo_organizer.placement import DEFAULT_MODE
+from photo_organizer.record import PhotoRecord
+from photo_organizer.streaming import StreamingOrganizer
+from photo_organizer.walker import walk_images, IMAGE_EXTS
+
+WATCH_STATE_FILENAME = ".photo_organizer_watch.json"
+WATCH_STATE_VERSION = 1
+
+
+class InboxWatcher:
+    """
+    轮询式的收件目录监视：每次 poll() 用 walk_images（scandir + DirEntry.stat）取一份 路径 → (大小, mtime_ns) 快照，
+    与上一份比较得出新增 / 改动的文件。
+    - 防抖：文件签名需连续 settle 秒不变才算写完（手机备份、网络拷贝会边写边出现在目录里）；
+    - 已交出过且签名未变的文件不再交出；消失的文件直接忘掉（move 模式下被挪走的源文件即如此）。
+    每次轮询只做目录列举，不读文件内容；交出的记录带着本次快照的 stat，之后不再重复 stat。
+
+    给出 state_path 时，已交出的集合在 save_state() 时写入该文件（JSON，相对 input_dir 的路径 → 签名），
+    下次启动时读回：重启后只交出新的或改动过的文件，而不是把整个收件目录再处理一遍。
+    文件只在集合有变化时重写（先写临时文件再原子替换）；消失的文件在下一次轮询时一并从中删去。
+    """
+
+    def __init__(self, input_dir: Path, exclude: Iterable[Path] = (), settle: float = 2.0,
+                 exts: Iterable[str] = IMAGE_EXTS, scan_threads: int = 1, state_path: Optional[Path] = None):
+        self.input_dir = Path(input_dir)
+        self.exclude = list(exclude)
+        self.settle = settle
+        self.exts = tuple(exts)
+        self.scan_threads = scan_threads
+        self.state_path = Path(state_path) if state_path is not None else None
+        self._seen: Dict[Path, Tuple[int, int]] = {}                     # 已交出：路径 → 签名
+        self._pending: Dict[Path, Tuple[Tuple[int, int], float]] = {}    # 等待稳定：路径 → (签名, 首次见到该签名的时间)
+        self._dirty = False
+        if self.state_path is not None:
+            self._load_state()
+
+    @property
+    def n_pending(self) -> int:
+        return len(self._pending)
+
+    # ---------- 已交出集合的持久化 ----------
+
+    def _load_state(self):
+        """读回上次保存的集合；文件缺失、损坏或属于另一个收件目录时从空集合开始"""
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            emit("warn", f"[WARN] Ignoring unreadable watch state {self.state_path}: {e}")
+            return
+        if state.get("version") != WATCH_STATE_VERSION or state.get("input") != str(self.input_dir):
+            return
+        self._seen = {self.input_dir / rel: (size, mtime_ns) for rel, size, mtime_ns in state["seen"]}
+
+    def save_state(self):
+        """把已交出的集合写入 state_path（没有变化时不写）；应在交出的文件处理完之后调用"""
+        if self.state_path is None or not self._dirty:
+            return
+        state = {
+            "version": WATCH_STATE_VERSION,
+            "input": str(self.input_dir),
+            "seen": [[str(path.relative_to(self.input_dir)), *sig] for path, sig in self._seen.items()],
+        }
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_name(self.state_path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp, self.state_path)
+        self._dirty = False
+
+    def seen_records(self) -> List[PhotoRecord]:
+        """
+        读回的集合中仍在、且签名未变的文件记录（供重启时重放以重建去重状态）；
+        已消失或已改动的文件从集合中删去，改动过的文件将在下一次轮询时重新交出。
+        """
+        records = []
+        for path, sig in list(self._seen.items()):
+            try:
+                st = path.stat()
+            except OSError:
+                st = None
+            if st is None or (st.st_size, st.st_mtime_ns) != sig:
+                del self._seen[path]
+                self._dirty = True
+                continue
+            records.append(PhotoRecord(path, st))
+        return records
+
+    # ---------- 轮询 ----------
+
+    def poll(self, now: Optional[float] = None) -> List[PhotoRecord]:
+        """扫描一次，返回已稳定、尚未处理（或处理后又被改动）的文件记录，按扫描顺序"""
+        now = time.monotonic() if now is None else now
+        ready: List[PhotoRecord] = []
+        present = set()
+        for path, st in walk_images(self.input_dir, self.exts, self.exclude, self.scan_threads):
+            present.add(path)
+            sig = (st.st_size, st.st_mtime_ns)
+            if self._seen.get(path) == sig:
+                continue
+            waiting = self._pending.get(path)
+            if waiting is None or waiting[0] != sig:
+                waiting = self._pending[path] = (sig, now)
+            if now - waiting[1] < self.settle:
+                continue
+            del self._pending[path]
+            self._seen[path] = sig
+            self._dirty = True
+            ready.append(PhotoRecord(path, st))
+        for path in [p for p in self._seen if p not in present]:
+            del self._seen[path]
+            self._dirty = True
+        for path in [p for p in self._pending if p not in present]:
+            del self._pending[path]
+        return ready
+
+
+def watch_photos(input_dir: Path, output_dir: Path, duplicate_dir: Path, interval: float = 2.0,
+                 settle: float = 2.0, cache_path: Optional[Path] = None, use_cache: bool = True,
+                 workers: int = 1, hash_algo: str = DEFAULT_ALGO, visual_distance: int = 0,
+                 mode: str = DEFAULT_MODE, scan_threads: int = 1, stop: Optional[threading.Event] = None,
+                 on_batch: Optional[Callable[[List[PhotoRecord]], None]] = None) -> GroupStore:
+    """
+    持续整理：每 interval 秒轮询一次 input_dir，把已写完的新文件交给一个常驻的 StreamingOrganizer。
+    组织器在整个监视期间只建一次，精确去重的尺寸 / 内容索引、视觉去重索引与输出目录索引都留在内存里，
+    因此每批新文件只需处理这批文件本身（读缓存 / 拍摄时间 / pHash，尺寸冲突时才读内容），
+    与图库大小无关；每批结束后把这批的记录写入摘要缓存并提交，中途退出也不丢已算好的结果。
+    已处理过的文件记在 <output>/.photo_organizer_watch.json（见 InboxWatcher.save_state），每批结束后更新：
+    重启时先把其中仍在的文件经 StreamingOrganizer.replay 重放一遍（不放置，只重建去重状态），
+    之后只处理新来或改动过的文件，它们照样与此前整理过的文件去重；
+    首次启动时已在 input_dir 中的文件作为第一批处理（已整理过的按缓存与输出索引直接跳过）。
+    move 模式下源文件已被挪出收件目录，不在集合中，重启后新文件只按输出目录中同名同内容的文件跳过。
+    stop 被置位或收到 KeyboardInterrupt 时结束，返回回顾分组 GroupStore（相当于 organize_photos 所返回 RunStats 的 review_groups）。
+    on_batch(records) 在每批放置完成后回调（测试用）。
+    """
+    input_dir = input_dir.resolve()
+    output_dir = output_dir.resolve()
+    duplicate_dir = duplicate_dir.resolve()
+    stop = stop or threading.Event()
+    cache = DigestCache(cache_path or output_dir / CACHE_FILENAME, algo=hash_algo) if use_cache else None
+
+    organizer = StreamingOrganizer(output_dir, duplicate_dir, cache, DigestBackend(hash_algo), mode,
+                                   visual_distance)
+    watcher = InboxWatcher(input_dir, [output_dir, duplicate_dir], settle, scan_threads=scan_threads,
+                           state_path=output_dir / WATCH_STATE_FILENAME)
+    emit("info", f"[WATCH] watching {input_dir} every {interval:g}s (settle {settle:g}s); press Ctrl+C to stop")
+
+    seen = watcher.seen_records()
+    if seen:
+        t0 = time.perf_counter()
+        organizer.replay(seen, workers)
+        emit("info", f"[WATCH] restored dedup state from {len(seen)} previously processed files "
+                     f"in {time.perf_counter() - t0:.2f}s")
+
+    n_total = 0
+    organizer.start()
+    try:
+        while not stop.is_set():
+            batch = watcher.poll()
+            if batch:
+                t0 = time.perf_counter()
+                before = (organizer.n_placed, organizer.n_skip_same, organizer.n_errors)
+                n = organizer.feed(batch, workers)
+                organizer.drain()
+                if cache is not None:
+                    for rec in batch:
+                        cache.store_record(rec)
+                    cache.flush()
+                # 这批已放置并写入缓存后才记为已处理；中途退出时这批在下次启动时重做
+                watcher.save_state()
+                n_total += n
+                placed, skipped, errors = (now - old for now, old in zip(
+                    (organizer.n_placed, organizer.n_skip_same, organizer.n_errors), before))
+                emit("info", f"[WATCH] batch: {len(batch)} new, placed={placed}, skipped_same={skipped}, "
+                             f"errors={errors}, {time.perf_counter() - t0:.2f}s")
+                if on_batch:
+                    on_batch(batch)
+            else:
+                watcher.save_state()  # 只可能有消失文件的删减
+            stop.wait(interval)
+    except KeyboardInterrupt:
+        emit("info", "[WATCH] interrupted, finishing pending placements")
+    finally:
+        organizer.finish()
+        cache_hits = 0
+        if cache is not None:
+            cache_hits = cache.hits
+            cache.close()
+
+    counts = organizer.counts()
+    emit(
+        "summary",
+        "[SUMMARY] "
+        f"total={n_total}, "
+        f"kept_md5={counts['kept']}, "
+        f"dupe_md5={counts['dupe_md5']}, "
+        f"dupe_visual={counts['dupe_visual']}, "
+        f"skipped_same={organizer.n_skip_same}, "
+        f"cache_hits={cache_hits}, "
+        f"output_dir={output_dir}, duplicates_dir={duplicate_dir}"
+    )
+    return organizer.review_groups()
@@ -0,0 +1,52 @@
+from pathlib import Path
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from photo_organizer.cache import DigestCache
+from photo_organizer.digest import md5sum, DigestIndex
+from photo_organizer.record import PhotoRecord
+
+input_dir = Path("sample_data/input")
+tmp = Path(tempfile.mkdtemp())
+db = tmp / "cache.sqlite3"
+
+# 写入缓存
+paths = sorted(input_dir.glob("*.*"))
+with DigestCache(db) as cache:
+    for p in paths:
+        cache.put(p, p.stat(), digest=md5sum(p), date=datetime(2025, 9, 28))
+
+# 重新打开：未变化的文件应全部命中
+with DigestCache(db) as cache:
+    index = DigestIndex()
+    missing = index.fill_from_cache(cache, [PhotoRecord(p) for p in paths])
+    print(f"cached={len(cache)}, missing={len(missing)}, hits={cache.hits}")
+    assert not missing
+
+# 换用其他摘要算法：旧摘要不可复用，但拍摄时间仍然命中
+with DigestCache(db, algo="blake2b") as cache:
+    rec = PhotoRecord(paths[0])
+    assert cache.load_record(rec) and rec.digest is None and rec.date is not None
+
+# 修改 mtime 后该文件应失效
+changed = tmp / paths[0].name
+shutil.copy2(paths[0], changed)
+with DigestCache(db) as cache:
+    cache.put(changed, changed.stat(), digest=md5sum(changed))
+    st = changed.stat()
+    os.utime(changed, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert cache.get(changed, changed.stat()) is None
+
+# 文件删除后 compact() 应清理记录
+changed.unlink()
+with DigestCache(db) as cache:
+    removed = cache.compact()
+    print(f"compact removed={removed}, kept={len(cache)}")
+    assert removed == 1 and len(cache) == len(paths)
+    assert cache.invalidate() == len(paths)
+
+shutil.rmtree(tmp)
+print("缓存测试通过")
@@ -0,0 +1,105 @@
+from pathlib import Path
+from datetime import datetime, timedelta
+import random
+import sys
+import time
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+import numpy as np
+from photo_organizer.cluster import UnionFind, cluster_pairs
+from photo_organizer.compact_index import CompactDigestIndex
+from photo_organizer.digest import DigestIndex
+from photo_organizer.record import PhotoRecord
+
+
+def components(n, pairs):
+    """参照实现：邻接表 + 深度优先求连通分量，各分量内升序、按最小元素排序"""
+    adj = [[] for _ in range(n)]
+    for a, b in pairs:
+        adj[a].append(b)
+        adj[b].append(a)
+    seen, result = [False] * n, []
+    for s in range(n):
+        if seen[s]:
+            continue
+        seen[s], stack, comp = True, [s], []
+        while stack:
+            x = stack.pop()
+            comp.append(x)
+            for y in adj[x]:
+                if not seen[y]:
+                    seen[y] = True
+                    stack.append(y)
+        result.append(sorted(comp))
+    return result
+
+
+class FakeStat:
+    def __init__(self, size):
+        self.st_size, self.st_mtime_ns, self.st_ino, self.st_ctime = size, 0, 0, 0.0
+
+
+rng = random.Random(11)
+
+# 1. 逐个 find / union：根总是集合内最小者
+uf = UnionFind(6)
+uf.union(4, 5)
+uf.union(5, 2)
+assert uf.find(4) == 2 and uf.find(5) == 2 and uf.find(0) == 0
+uf.union(0, 4)
+assert {uf.find(x) for x in (0, 2, 4, 5)} == {0}
+assert uf.groups() == [[0, 2, 4, 5]]
+assert uf.groups(min_size=1) == [[0, 2, 4, 5], [1], [3]]
+
+# 2. 批量合并与参照实现一致（含长链：A~B、B~C … 必须传递地并成一组）
+for n, m in ((50, 30), (2000, 1500), (2000, 3000)):
+    pairs = [(rng.randrange(n), rng.randrange(n)) for _ in range(m)]
+    pairs += [(k, k + 1) for k in range(n // 2, min(n - 1, n // 2 + 40))]
+    uf = UnionFind(n)
+    uf.union_pairs([a for a, _ in pairs], [b for _, b in pairs])
+    assert uf.groups(min_size=1) == components(n, pairs)
+
+# 3. 组 id 稳定：候选对的顺序、方向不影响结果；代表为排序最靠前（最早拍摄）者
+n = 500
+dates = [rng.randrange(100) for _ in range(n)]
+order = sorted(range(n), key=lambda k: (dates[k], k))
+pairs = [(rng.randrange(n), rng.randrange(n)) for _ in range(300)]
+ref = cluster_pairs(order, [a for a, _ in pairs], [b for _, b in pairs])
+for _ in range(3):
+    rng.shuffle(pairs)
+    flipped = [(b, a) if rng.random() < 0.5 else (a, b) for a, b in pairs]
+    assert cluster_pairs(order, [a for a, _ in flipped], [b for _, b in flipped]) == ref
+for group in ref:
+    assert [(dates[k], k) for k in group] == sorted((dates[k], k) for k in group)
+firsts = [(dates[g[0]], g[0]) for g in ref]
+assert firsts == sorted(firsts)
+assert cluster_pairs(order, [], []) == []
+
+# 4. 视觉去重的传递性：A、B 相距 3 位，B、C 相距 3 位，A、C 相距 6 位；阈值 3 时三张图同组，最早者保留
+base = datetime(2024, 5, 1)
+a, b, c = 0x0F0F_0000_0000_0000, 0x0F0F_0000_0000_0007, 0x0F0F_0000_0000_01FF ^ 0x1C0
+assert bin(a ^ b).count("1") == 3 and bin(b ^ c).count("1") == 3 and bin(a ^ c).count("1") == 6
+index, compact = DigestIndex(), CompactDigestIndex()
+recs = []
+for k, (name, h, day) in enumerate((("b", b, 1), ("c", c, 3), ("a", a, 2), ("far", ~a & (2 ** 64 - 1), 0))):
+    rec = PhotoRecord(Path(f"/p/{name}.jpg"), FakeStat(1000 + k))
+    rec.date, rec.phash = base + timedelta(days=day), f"{h:016x}"
+    index.add_phash(rec)
+    compact.add_phash(compact.add(rec.path, rec.size, rec.date), rec.phash)
+    recs.append(rec)
+assert index.get_visual_duplicates_map(3) == {recs[0]: [recs[2], recs[1]]}
+assert compact.get_visual_duplicates_map(3) == {0: [2, 1]}
+
+# 5. 速度：100 万张图、20 万个候选对，远低于一秒
+n, m = 1_000_000, 200_000
+np_rng = np.random.default_rng(3)
+i = np_rng.integers(0, n, m)
+j = np.where(np_rng.random(m) < 0.5, np_rng.integers(0, n, m), (i + 1) % n)  # 一半随机，一半相邻成链
+order = np_rng.permutation(n)
+t0 = time.perf_counter()
+groups = cluster_pairs(order, i, j)
+elapsed = time.perf_counter() - t0
+print(f"cluster: {n} images, {m} pairs -> {len(groups)} groups in {elapsed:.3f}s")
+assert sum(len(g) for g in groups) <= 2 * m and len(groups) > 1000
+assert elapsed < 1.0, elapsed
+
+print("并查集聚类测试通过")
@@ -0,0 +1,114 @@
+from pathlib import Path
+from datetime import datetime, timedelta
+import hashlib
+import random
+import sys
+import time
+import tracemalloc
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from photo_organizer.compact_index import CompactDigestIndex
+from photo_organizer.digest import DigestIndex
+from photo_organizer.record import PhotoRecord
+
+
+class FakeStat:
+    def __init__(self, size):
+        self.st_size, self.st_mtime_ns, self.st_ino, self.st_ctime = size, 0, 0, 0.0
+
+
+def md5(s: str) -> str:
+    return hashlib.md5(s.encode()).hexdigest()
+
+
+# 合成记录：尺寸取值范围小（大量尺寸冲突）、内容取值范围更小（精确重复），
+# 首尾块只由内容的一部分决定（首尾相同但内容不同），拍摄时间有并列，pHash 有完全相同与近邻
+rng = random.Random(7)
+base = datetime(2020, 1, 1)
+phash_pool = [rng.getrandbits(64) for _ in range(600)]
+records = []
+for i in range(4000):
+    content = rng.randrange(2500)
+    size = 1000 + content % 1800 if content < 2000 else 50_000 + i
+    rec = PhotoRecord(Path(f"/lib/{rng.choice(['a', 'b', '相册'])}/{i % 37}/IMG_{i:05d}.jpg"), FakeStat(size))
+    rec.date = base + timedelta(seconds=rng.randrange(3000), microseconds=rng.choice([0, 0, 250_000]))
+    rec.edge = None
+    records.append((rec, content))
+
+ref = DigestIndex()
+compact = CompactDigestIndex()
+for rec, _ in records:
+    ref.add(rec)
+    compact.add_record(rec)
+ids = {id(rec): i for i, (rec, _) in enumerate(records)}
+by_id = [rec for rec, _ in records]
+
+
+def as_recs(pairs):
+    return [(by_id[k], [by_id[d] for d in dupes]) for k, dupes in pairs]
+
+
+# 1. 分级漏斗：每一级的候选与 DigestIndex 相同
+assert sorted(ids[id(r)] for r in ref.needs_edge_hash()) == compact.needs_edge_hash()
+for i in compact.needs_edge_hash():
+    rec, content = records[i]
+    rec.edge = md5(f"edge{content % 1500}")
+    compact.set_edge(i, rec.edge)
+assert sorted(ids[id(r)] for r in ref.needs_full_hash()) == compact.needs_full_hash()
+for i in compact.needs_full_hash():
+    rec, content = records[i]
+    rec.digest = md5(f"content{content}")
+    compact.set_digest(i, rec.digest)
+assert compact.edge(0) == records[0][0].edge and compact.digest(0) == records[0][0].digest
+assert compact.date(5) == records[5][0].date and compact.path(5) == records[5][0].path
+
+# 2. 精确去重：分组、组顺序、保留者完全相同
+expected = ref.get_deduplicated()
+got = as_recs(compact.get_deduplicated())
+assert got == expected
+assert sum(1 for _, d in expected if d) > 100
+assert [sorted(ids[id(r)] for r in g) for g in ref.groups()] == list(compact.groups())
+
+# 移出的条目不参与分组
+ref.discard(by_id[3])
+compact.discard(3)
+assert as_recs(compact.get_deduplicated()) == ref.get_deduplicated()
+
+# 3. 视觉去重：完全相同 / 汉明近邻 / 复核细分，与 DigestIndex 相同
+keepers = [keep for keep, _ in ref.get_deduplicated()]
+for rec in keepers:
+    h = rng.choice(phash_pool) ^ (1 << rng.randrange(64) if rng.random() < 0.3 else 0)
+    rec.phash = f"{h:016x}" if rng.random() > 0.01 else ""
+    ref.add_phash(rec)
+    compact.add_phash(ids[id(rec)], rec.phash)
+for distance in (0, 3):
+    exp = ref.get_visual_duplicates_map(distance)
+    res = compact.get_visual_duplicates_map(distance)
+    assert [(k, v) for k, v in exp.items()] == [(by_id[k], [by_id[d] for d in v]) for k, v in res.items()], distance
+    assert len(exp) > 20
+confirm = {rec: f"4x3:{rec.phash[::-1]}" for rec in keepers if rec.phash}
+exp = ref.get_visual_duplicates_map(3, confirm, 10)
+res = compact.get_visual_duplicates_map(3, {ids[id(r)]: v for r, v in confirm.items()}, 10)
+assert list(exp.items()) == [(by_id[k], [by_id[d] for d in v]) for k, v in res.items()]
+
+# 4. 百万级的内存：每个文件（含路径、完整摘要、pHash）的列数据加上分组时的临时数组，峰值低于 150 字节
+N = 300_000
+big = CompactDigestIndex()
+for i in range(N):
+    big.add(f"/Volumes/Photos/Library/{2000 + i % 25}/{i % 12 + 1:02d}/IMG_{i:07d}.JPG", 1_000_000 + i % (N - 500),
+            base + timedelta(seconds=i), digest=md5(str(i % (N - 500))), phash=f"{i * 2654435761 % (1 << 64):016x}")
+resident = big.nbytes()
+tracemalloc.start()
+t0 = time.perf_counter()
+n_groups = n_dupes = 0
+for keep, dupes in big.iter_deduplicated():
+    n_groups += 1
+    n_dupes += len(dupes)
+elapsed = time.perf_counter() - t0
+peak = resident + tracemalloc.get_traced_memory()[1]
+tracemalloc.stop()
+print(f"compact index: {resident / N:.0f} B/file resident, {peak / N:.0f} B/file peak, "
+      f"grouping {N} files in {elapsed:.2f}s")
+assert n_groups + n_dupes == N and n_dupes == 500
+assert peak / N < 150, peak / N
+
+print("紧凑去重索引测试通过")
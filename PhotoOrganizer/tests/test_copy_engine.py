@@ -0,0 +1,174 @@
+from pathlib import Path
+from contextlib import redirect_stdout
+import errno
+import io
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import threading
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from PIL import Image
+import photo_organizer.plan as plan
+from photo_organizer.copy_engine import CopyEngine
+from photo_organizer.events import subscribe
+from photo_organizer.journal import JOURNAL_FILENAME
+from photo_organizer.organizer import organize_photos
+from photo_organizer.placement import copy_file, place_file, PART_SUFFIX
+
+tmp = Path(tempfile.mkdtemp())
+
+# 1. copy_file：内核态复制，内容、mtime、权限与 copy2 相同
+payload = os.urandom(3_000_000)
+src = tmp / "src.bin"
+src.write_bytes(payload)
+os.chmod(src, 0o640)
+os.utime(src, ns=(1_600_000_000_000_000_000, 1_600_000_000_123_456_789))
+method = copy_file(src, tmp / "dst.bin")
+shutil.copy2(src, tmp / "ref.bin")
+print("copy_file ->", method)
+assert method in ("copy_file_range", "sendfile", "copy")
+assert (tmp / "dst.bin").read_bytes() == payload
+for attr in ("st_mtime_ns", "st_mode"):
+    assert getattr((tmp / "dst.bin").stat(), attr) == getattr((tmp / "ref.bin").stat(), attr), attr
+assert stat.S_IMODE((tmp / "dst.bin").stat().st_mode) == 0o640
+
+# 源文件在复制中被截断：不足原大小就读到文件尾时报错，不留下残缺的目标
+def truncate_after_first_call(real, count_arg, victim):
+    calls = []
+
+    def fn(*args):
+        args = list(args)
+        args[count_arg] = min(args[count_arg], 1 << 20)
+        n = real(*args)
+        if not calls:
+            os.truncate(victim, 1 << 20)
+        calls.append(n)
+        return n
+    return fn
+
+
+def unsupported(*args):
+    raise OSError(errno.ENOSYS, "not supported")
+
+
+real_copy_range, real_sendfile = getattr(os, "copy_file_range", None), getattr(os, "sendfile", None)
+for name in ("copy_file_range", "sendfile"):
+    if getattr(os, name, None) is None:
+        continue
+    victim = tmp / f"victim_{name}.bin"
+    victim.write_bytes(payload)
+    if name == "sendfile" and real_copy_range is not None:
+        os.copy_file_range = unsupported
+    setattr(os, name, truncate_after_first_call(getattr(os, name), 2 if name == "copy_file_range" else 3, victim))
+    try:
+        place_file(victim, tmp / f"short_{name}.bin", "copy")
+    except OSError as e:
+        assert e.errno == errno.EIO and "short copy" in str(e), e
+    else:
+        raise AssertionError(f"{name}: truncated source was copied as if complete")
+    finally:
+        if real_copy_range is not None:
+            os.copy_file_range = real_copy_range
+        if real_sendfile is not None:
+            os.sendfile = real_sendfile
+    assert not (tmp / f"short_{name}.bin").exists()
+    assert not (tmp / f"short_{name}.bin{PART_SUFFIX}").exists()
+
+# 2. 多线程：全部完成、结果按完成顺序带 tag 回到调用线程；在途不超过 threads；单个失败不影响其他
+srcs = tmp / "many"
+srcs.mkdir()
+for i in range(40):
+    (srcs / f"{i:02d}.bin").write_bytes(os.urandom(50_000 + i))
+dst = tmp / "many_out"
+dst.mkdir()
+
+in_flight, peak = [0], [0]
+lock = threading.Lock()
+real_place = CopyEngine._place
+
+
+def tracking_place(self, s, d):
+    with lock:
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+    try:
+        return real_place(self, s, d)
+    finally:
+        with lock:
+            in_flight[0] -= 1
+
+
+CopyEngine._place = tracking_place
+jobs = [(p, dst / p.name, p.name) for p in sorted(srcs.iterdir())]
+jobs.append((srcs / "missing.bin", dst / "missing.bin", "missing.bin"))
+caller = threading.current_thread()
+seen = []
+for tag, method, err in CopyEngine(threads=4).run(iter(jobs)):
+    assert threading.current_thread() is caller
+    seen.append(tag)
+    if tag == "missing.bin":
+        assert isinstance(err, FileNotFoundError) and method is None
+    else:
+        assert err is None and method is not None, err
+CopyEngine._place = real_place
+assert sorted(seen) == sorted(j[2] for j in jobs)
+assert 1 <= peak[0] <= 4, peak
+for p in srcs.iterdir():
+    assert (dst / p.name).read_bytes() == p.read_bytes()
+assert not list(dst.glob("*.part"))
+
+# 3. organize_photos：copy_threads 只影响并发，不影响结果；每个放置都有完成事件
+inp = tmp / "input"
+inp.mkdir()
+for i in range(60):
+    Image.frombytes("RGB", (16, 16), os.urandom(16 * 16 * 3)).save(inp / f"img_{i:02d}.png")
+shutil.copy2(inp / "img_00.png", inp / "img_00_copy.png")
+
+
+def tree(root: Path):
+    return {str(p.relative_to(root)): p.read_bytes() for p in root.rglob("*.png")}
+
+
+results = {}
+for threads in (1, 4):
+    events = []
+    with redirect_stdout(io.StringIO()), subscribe(events.append):
+        stats = organize_photos(inp, tmp / f"out{threads}", tmp / f"dup{threads}", copy_threads=threads)
+    results[threads] = (tree(tmp / f"out{threads}"), tree(tmp / f"dup{threads}"))
+    assert sum(1 for e in events if e.kind in ("placed", "duplicate")) == 61
+    assert stats.counts["kept_md5"] == 60 and stats.counts["dupe_md5"] == 1
+    assert not (tmp / f"out{threads}" / JOURNAL_FILENAME).exists()
+assert results[1] == results[4]
+
+# 4. 多线程放置中途中断：已完成的放置都记入日志，--resume 后结果与串行运行相同
+real_place_file = plan.place_file
+calls = []
+
+
+def crashing_place(s, d, mode):
+    calls.append(d)
+    if len(calls) == 20:
+        raise KeyboardInterrupt
+    return real_place_file(s, d, mode)
+
+
+plan.place_file = crashing_place
+try:
+    with redirect_stdout(io.StringIO()):
+        organize_photos(inp, tmp / "crash_out", tmp / "crash_dup", copy_threads=4)
+except KeyboardInterrupt:
+    pass
+finally:
+    plan.place_file = real_place_file
+assert (tmp / "crash_out" / JOURNAL_FILENAME).exists()
+log = io.StringIO()
+with redirect_stdout(log):
+    organize_photos(inp, tmp / "crash_out", tmp / "crash_dup", resume=True, copy_threads=4)
+assert "skipped_same=0" in log.getvalue(), log.getvalue()
+assert (tree(tmp / "crash_out"), tree(tmp / "crash_dup")) == results[1]
+assert not (tmp / "crash_out" / JOURNAL_FILENAME).exists()
+
+shutil.rmtree(tmp)
+print("并发复制引擎测试通过")
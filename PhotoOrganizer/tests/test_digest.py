@@ -1,20 +1,26 @@
 from pathlib import Path
 import sys
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
-from photo_organizer.metadata import get_photo_datetime
-from photo_organizer.digest import md5sum, DigestIndex
+from photo_organizer.record import PhotoRecord
+from photo_organizer.digest import md5sum, edge_hash, DigestIndex
 
 input_dir = Path("sample_data/input")
 index = DigestIndex()
 
 for path in input_dir.glob("*.*"):
-    dt = get_photo_datetime(path)
-    digest = md5sum(path)
-    index.add_md5(path, digest, dt)
-    index.add_phash(path)
+    rec = PhotoRecord(path)
+    rec.load_date()
+    index.add(rec)
+
+# 分级去重：只有尺寸冲突者才读首尾块，首尾块仍冲突者才算完整 MD5
+for rec in index.needs_edge_hash():
+    rec.edge = edge_hash(rec.path)
+for rec in index.needs_full_hash():
+    rec.digest = md5sum(rec.path)
 
 print("去重判断（保留 + 重复）")
 for keep, dupes in index.get_deduplicated():
+    index.add_phash(keep)
     print(f"KEEP: {keep.name}")
     for d in dupes:
-        print(f"----REPEAT: {d.name}")
\ No newline at end of file
+        print(f"----REPEAT: {d.name}")
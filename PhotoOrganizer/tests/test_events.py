@@ -0,0 +1,78 @@
+from pathlib import Path
+from collections import Counter
+from contextlib import redirect_stdout
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from PIL import Image
+from photo_organizer.events import emit, subscribe, ProgressThrottle
+from photo_organizer.organizer import organize_photos
+from photo_organizer.streaming import organize_streaming
+
+tmp = Path(tempfile.mkdtemp())
+
+# 1. 没有订阅者：退回 print，progress 不输出
+log = io.StringIO()
+with redirect_stdout(log):
+    emit("info", "[INFO] hello")
+    emit("progress", "50%", value=50)
+assert log.getvalue() == "[INFO] hello\n"
+
+# 2. 进度节流：逐文件调用，只有百分比变化时才回调
+calls = []
+throttle = ProgressThrottle(calls.append)
+for i in range(100001):
+    throttle(i * 100 // 100000)
+assert calls == list(range(101))
+
+# 3. 订阅一次完整运行：不打印，事件种类 / 路径齐全，进度事件单调且不超过 101 个
+inp = tmp / "input"
+inp.mkdir()
+for i in range(300):
+    Image.frombytes("RGB", (16, 16), os.urandom(16 * 16 * 3)).save(inp / f"img_{i:03d}.png")
+shutil.copy2(inp / "img_000.png", inp / "img_000_copy.png")
+
+events = []
+log = io.StringIO()
+with redirect_stdout(log), subscribe(events.append):
+    organize_photos(inp, tmp / "out", tmp / "dup")
+assert log.getvalue() == "", log.getvalue()[:200]
+kinds = Counter(e.kind for e in events)
+assert kinds["placed"] == 300 and kinds["duplicate"] == 1 and kinds["summary"] == 1, kinds
+placed = [e for e in events if e.kind == "placed"]
+assert all(e.src.parent == inp and e.dst.exists() for e in placed)
+progress = [e.value for e in events if e.kind == "progress"]
+assert progress == sorted(set(progress)) and progress[-1] == 100 and len(progress) <= 101, progress
+
+# 重复运行：幂等跳过同样有事件
+events.clear()
+with subscribe(events.append):
+    organize_photos(inp, tmp / "out", tmp / "dup")
+assert Counter(e.kind for e in events)["skipped"] == 301
+
+# 流式模式发出同样的事件
+events.clear()
+with redirect_stdout(io.StringIO()), subscribe(events.append):
+    organize_streaming(inp, tmp / "s_out", tmp / "s_dup", workers=2)
+kinds = Counter(e.kind for e in events)
+assert kinds["placed"] == 300 and kinds["duplicate"] == 1, kinds
+progress = [e.value for e in events if e.kind == "progress"]
+assert progress == sorted(set(progress)) and progress[-1] == 100
+
+# 4. 命令行 --log-format json：每行一个事件
+script = Path(__file__).parent.parent / "script" / "run_organize.py"
+res = subprocess.run([sys.executable, str(script), "--input", str(inp), "--output", str(tmp / "cli_out"),
+                      "--duplicates", str(tmp / "cli_dup"), "--log-format", "json"],
+                     capture_output=True, text=True, check=True)
+lines = [json.loads(line) for line in res.stdout.splitlines()]
+kinds = Counter(e["kind"] for e in lines)
+assert kinds["placed"] == 300 and kinds["summary"] == 1, kinds
+assert all("src" in e and "dst" in e for e in lines if e["kind"] == "placed")
+
+shutil.rmtree(tmp)
+print("结构化事件测试通过")
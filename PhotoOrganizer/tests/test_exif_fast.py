@@ -0,0 +1,52 @@
+from pathlib import Path
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+import piexif
+from PIL import Image
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from photo_organizer.metadata import get_photo_datetime, read_exif_datetime_fast, UNDECIDED
+
+tmp = Path(tempfile.mkdtemp())
+shot = datetime(2024, 5, 17, 8, 30, 12)
+exif_bytes = piexif.dump({
+    "0th": {piexif.ImageIFD.Make: b"TestCam"},
+    "Exif": {piexif.ExifIFD.DateTimeOriginal: shot.strftime("%Y:%m:%d %H:%M:%S").encode()},
+})
+no_date_exif = piexif.dump({"0th": {piexif.ImageIFD.Make: b"TestCam"}, "Exif": {}})
+
+img = Image.new("RGB", (640, 480), (120, 80, 40))
+cases = {
+    "exif.jpg": lambda p: img.save(p, exif=exif_bytes),
+    "exif_no_date.jpg": lambda p: img.save(p, exif=no_date_exif),
+    "plain.jpg": lambda p: img.save(p),
+    "exif.png": lambda p: img.save(p, exif=exif_bytes),
+    "plain.png": lambda p: img.save(p),
+}
+# 同时覆盖示例数据
+paths = sorted(Path("sample_data/input").glob("*.*"))
+for name, make in cases.items():
+    make(tmp / name)
+    paths.append(tmp / name)
+
+# 快速读取器（只读文件头）与 Pillow + piexif 路径的结果必须一致
+for path in paths:
+    fast = read_exif_datetime_fast(path)
+    slow = get_photo_datetime(path, fast=False)
+    print(f"{path.name}: fast={'UNDECIDED' if fast is UNDECIDED else fast} → {get_photo_datetime(path)}")
+    assert fast is not UNDECIDED
+    assert get_photo_datetime(path) == slow
+assert read_exif_datetime_fast(tmp / "exif.jpg") == shot
+assert read_exif_datetime_fast(tmp / "exif.png") == shot
+
+# 耗时对比（仅供参考）
+for label, fast in (("pillow+piexif", False), ("header-only", True)):
+    t0 = time.perf_counter()
+    for _ in range(200):
+        get_photo_datetime(tmp / "exif.jpg", fast=fast)
+    print(f"{label}: {(time.perf_counter() - t0) / 200 * 1e6:.0f} µs/file")
+
+shutil.rmtree(tmp)
+print("EXIF 快速读取测试通过")
@@ -0,0 +1,54 @@
+from pathlib import Path
+import sys
+import time
+import tracemalloc
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from photo_organizer.groups import GroupStore
+
+# 1. 与 list[dict] 等价：下标 / 迭代 / 比较 / 序列化往返
+groups = [
+    {"kind": "md5", "keep": "/out/2024/01/a.jpg", "keep_src": "/in/a.jpg", "dupes": ["/dup/a_copy.jpg"]},
+    {"kind": "visual", "keep": "/out/2024/02/照片.jpg", "keep_src": "/in/照片.jpg",
+     "dupes": ["/dup/b.jpg", "/dup/c.jpg"]},
+    {"kind": "md5", "keep": "/out/2024/03/d.jpg", "keep_src": "/in/d.jpg", "dupes": []},
+]
+store = GroupStore(groups)
+assert len(store) == 3 and store == groups and list(store) == groups
+assert store[1] == groups[1] and store[-1] == groups[-1]
+assert [g["kind"] for g in store] == ["md5", "visual", "md5"]
+assert GroupStore.from_list(store.to_list()) == store
+assert store.keep(1) == "/out/2024/02/照片.jpg" and store.dupes(1) == ["/dup/b.jpg", "/dup/c.jpg"]
+assert store.n_dupes(2) == 0 and store.dupes(2) == []
+assert not GroupStore() and GroupStore() == []
+
+# 2. 按种类过滤
+assert store.indices() == range(3)
+assert list(store.indices("md5")) == [0, 2] and list(store.indices("visual")) == [1]
+assert store.counts() == {"md5": 2, "visual": 1}
+
+# 3. 10 万组：内存远小于 list[dict]，逐组访问不需要整体展开
+N = 100_000
+tracemalloc.start()
+as_dicts = [{"kind": "md5" if i % 3 else "visual", "keep": f"/library/output/2024/{i % 12 + 1:02d}/IMG_{i:06d}.jpg",
+             "keep_src": f"/inbox/DCIM/IMG_{i:06d}.jpg", "dupes": [f"/library/duplicates/IMG_{i:06d}_copy.jpg"]}
+            for i in range(N)]
+dict_bytes = tracemalloc.get_traced_memory()[0]
+tracemalloc.stop()
+
+tracemalloc.start()
+big = GroupStore()
+for g in as_dicts:
+    big.add(g["kind"], g["keep"], g["keep_src"], g["dupes"])
+store_bytes = tracemalloc.get_traced_memory()[0]
+tracemalloc.stop()
+print(f"list[dict]: {dict_bytes / N:.0f} B/group, GroupStore: {store_bytes / N:.0f} B/group")
+assert store_bytes * 3 < dict_bytes
+assert big[N - 1] == as_dicts[N - 1]
+assert len(big.indices("visual")) == N // 3 + 1
+
+t0 = time.perf_counter()
+for i in range(0, N, 97):
+    big.kind(i), big.keep(i)
+assert time.perf_counter() - t0 < 0.5
+
+print("回顾分组存储测试通过")
@@ -0,0 +1,121 @@
+from pathlib import Path
+from contextlib import redirect_stdout
+import io
+import os
+import shutil
+import sys
+import tempfile
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from PIL import Image
+import photo_organizer.plan as plan
+from photo_organizer.organizer import organize_photos
+from photo_organizer.journal import Journal, JOURNAL_FILENAME
+from photo_organizer.placement import PART_SUFFIX
+
+tmp = Path(tempfile.mkdtemp())
+
+
+def layout(root: Path):
+    """目录中的图片文件（不含缓存 / 日志等隐藏文件）"""
+    return sorted(str(p.relative_to(root)) for p in root.rglob("*") if p.is_file() and not p.name.startswith("."))
+
+
+# 1. 日志格式：未完成的操作没有 result，写了一半的最后一行被忽略
+j = Journal(tmp / "j.jsonl", fsync_every=2)
+j.open(started="t0")
+a = j.plan("place", rec="a", dst="b", how="copy")
+j.done(a, fingerprint=[1, 2, 3])
+j.plan("unlink", path="c")
+j.close(completed=False)
+with open(tmp / "j.jsonl", "a", encoding="utf-8") as f:
+    f.write('{"op": "done", "id"')
+header, ops = Journal.load(tmp / "j.jsonl")
+assert header["started"] == "t0"
+assert ops[0]["result"]["fingerprint"] == [1, 2, 3] and "result" not in ops[1]
+
+# 2. 构造输入：随机内容图片 + 一组精确重复
+inp = tmp / "input"
+inp.mkdir()
+for i in range(30):
+    Image.frombytes("RGB", (32, 32), os.urandom(32 * 32 * 3)).save(inp / f"img_{i:02d}.png")
+shutil.copy2(inp / "img_00.png", inp / "img_00_copy.png")
+
+# 参照：一次完整运行的结果
+with redirect_stdout(io.StringIO()):
+    organize_photos(inp, tmp / "ref_out", tmp / "ref_dup")
+expected = (layout(tmp / "ref_out"), layout(tmp / "ref_dup"))
+
+# 3. 模拟在第 12 次放置中途崩溃：目标 .part 只写了一半
+real_place = plan.place_file
+calls = []
+
+
+def crashing_place(src, dst, mode):
+    calls.append(dst)
+    if len(calls) == 12:
+        Path(str(dst) + PART_SUFFIX).write_bytes(Path(src).read_bytes()[:100])
+        raise KeyboardInterrupt
+    return real_place(src, dst, mode)
+
+
+journals = []
+
+
+class TrackedJournal(Journal):
+    def open(self, **header):
+        journals.append(self)
+        super().open(**header)
+
+
+out, dup = tmp / "out", tmp / "dup"
+plan.place_file = crashing_place
+plan.Journal = TrackedJournal
+try:
+    with redirect_stdout(io.StringIO()):
+        organize_photos(inp, out, dup)
+except KeyboardInterrupt:
+    pass
+finally:
+    plan.place_file = real_place
+    plan.Journal = Journal
+assert (out / JOURNAL_FILENAME).exists()
+assert list(out.rglob("*" + PART_SUFFIX))
+# 中断时日志句柄已关闭，已完成的放置都已落盘
+assert len(journals) == 1 and journals[0]._f is None
+_, ops = Journal.load(out / JOURNAL_FILENAME)
+assert sum("result" in entry for entry in ops.values()) == 11
+
+# 4. --resume：确认已完成的 11 个放置，清理残片，其余照常完成，且不读取任何已放置文件
+log = io.StringIO()
+with redirect_stdout(log):
+    organize_photos(inp, out, dup, resume=True)
+log = log.getvalue()
+print([line for line in log.splitlines() if line.startswith("[RESUME] journal")][0])
+assert "11 placements confirmed" in log and "1 to redo" in log
+assert "[INFO] Output collision checks hashed 0 files" in log
+assert "skipped_same=0" in log
+assert not (out / JOURNAL_FILENAME).exists()
+assert not list(out.rglob("*" + PART_SUFFIX))
+assert (layout(out), layout(dup)) == expected
+
+# 5. 不带 --resume：仅提示，之后按幂等判断正常完成
+plan.place_file = crashing_place
+calls.clear()
+shutil.rmtree(out)
+shutil.rmtree(dup)
+try:
+    with redirect_stdout(io.StringIO()):
+        organize_photos(inp, out, dup)
+except KeyboardInterrupt:
+    pass
+finally:
+    plan.place_file = real_place
+log = io.StringIO()
+with redirect_stdout(log):
+    organize_photos(inp, out, dup)
+assert "pass --resume" in log.getvalue()
+assert not (out / JOURNAL_FILENAME).exists()
+assert (layout(out), layout(dup)) == expected
+
+shutil.rmtree(tmp)
+print("操作日志与断点续跑测试通过")
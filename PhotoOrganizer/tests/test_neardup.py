@@ -0,0 +1,31 @@
+from pathlib import Path
+import random
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from photo_organizer.neardup import MultiIndexHash, hamming
+
+# 与暴力 O(n²) 比对：多索引哈希找到的近邻对应完全一致
+rng = random.Random(42)
+hashes = [rng.getrandbits(64) for _ in range(400)]
+for i in range(200):
+    # 制造近重复：随机翻转 0..12 位
+    h = hashes[i]
+    for b in rng.sample(range(64), rng.randint(0, 12)):
+        h ^= 1 << b
+    hashes.append(h)
+
+for max_distance in (0, 3, 6, 10):
+    mih = MultiIndexHash(max_distance)
+    for h in hashes:
+        mih.add(h)
+    got = set(mih.pairs())
+    expected = {(i, j) for i in range(len(hashes)) for j in range(i + 1, len(hashes))
+                if hamming(hashes[i], hashes[j]) <= max_distance}
+    print(f"max_distance={max_distance}: {len(got)} pairs")
+    assert got == expected
+    # 增量查询与批量枚举结果一致
+    for i in range(0, len(hashes), 37):
+        assert mih.query(hashes[i]) == sorted(j for j in range(len(hashes))
+                                              if hamming(hashes[i], hashes[j]) <= max_distance)
+
+print("近邻索引测试通过")
@@ -0,0 +1,58 @@
+from pathlib import Path
+from contextlib import redirect_stdout
+import io
+import os
+import shutil
+import sys
+import tempfile
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from PIL import Image
+from photo_organizer.cache import DigestCache, origin_key
+from photo_organizer.organizer import organize_photos
+from photo_organizer.output_index import OutputIndex
+from photo_organizer.record import PhotoRecord
+
+tmp = Path(tempfile.mkdtemp())
+
+# 1. 同名不同内容：直接取已用最大后缀 + 1；同名同内容：跳过
+folder = tmp / "out"
+folder.mkdir()
+for name, data in [("a.jpg", b"old"), ("a-1.jpg", b"one"), ("a-7.jpg", b"seven")]:
+    (folder / name).write_bytes(data)
+(tmp / "new.jpg").write_bytes(b"new")
+(tmp / "same.jpg").write_bytes(b"old")
+index = OutputIndex()
+assert index.resolve(PhotoRecord(tmp / "new.jpg"), folder, "a.jpg") == folder / "a-8.jpg"
+assert index.resolve(PhotoRecord(tmp / "same.jpg"), folder, "a.jpg") is None
+assert index.resolve(PhotoRecord(tmp / "new.jpg"), folder, "b.jpg") == folder / "b.jpg"
+assert index.resolve(PhotoRecord(tmp / "new.jpg"), tmp / "created" / "sub", "x.jpg") == tmp / "created" / "sub" / "x.jpg"
+assert (tmp / "created" / "sub").is_dir()
+
+# 2. 硬链接 / 缓存中的放置来源：不读取任何内容即可判定相同
+os.link(tmp / "new.jpg", folder / "linked.jpg")
+shutil.copy2(tmp / "new.jpg", folder / "copied.jpg")
+with DigestCache(tmp / "cache.sqlite3") as cache:
+    rec = PhotoRecord(tmp / "new.jpg")
+    cache.put(folder / "copied.jpg", (folder / "copied.jpg").stat(), origin=origin_key(rec.path, rec.fingerprint))
+    index = OutputIndex(cache)
+    assert index.resolve(rec, folder, "linked.jpg") is None
+    assert index.resolve(rec, folder, "copied.jpg") is None
+    assert index.n_hashed == 0 and rec.digest is None
+
+# 3. 已整理好的图库重复运行：零额外哈希
+inp = tmp / "input"
+inp.mkdir()
+for i in range(40):
+    Image.frombytes("RGB", (32, 32), os.urandom(32 * 32 * 3)).save(inp / f"img_{i:02d}.png")
+shutil.copy2(inp / "img_00.png", inp / "img_00_copy.png")
+organize_photos(inp, tmp / "organized", tmp / "dupes")
+log = io.StringIO()
+with redirect_stdout(log):
+    organize_photos(inp, tmp / "organized", tmp / "dupes")
+log = log.getvalue()
+print(log.splitlines()[-1])
+assert "[INFO] Output collision checks hashed 0 files" in log
+assert "skipped_same=41" in log
+
+shutil.rmtree(tmp)
+print("输出目录索引测试通过")
@@ -0,0 +1,37 @@
+from pathlib import Path
+import random
+import shutil
+import sys
+import tempfile
+from PIL import Image, ImageDraw, ImageFilter
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from photo_organizer.digest import perceptual_hash
+
+# 1. 示例数据：降分辨率解码与原实现（全尺寸 RGB 解码）的 dHash 必须完全一致
+input_dir = Path("sample_data/input")
+for path in sorted(input_dir.glob("*.*")):
+    fast, full = perceptual_hash(path), perceptual_hash(path, fast=False)
+    print(f"{path.name}: fast={fast} full={full}")
+    assert fast == full
+
+# 2. 合成的大图（JPEG 走 draft，PNG 走 reduce）：允许个别位因重采样差异翻转
+tmp = Path(tempfile.mkdtemp())
+rng = random.Random(7)
+max_bits = 0
+for i, (size, ext) in enumerate([((6000, 4000), ".jpg"), ((4000, 6000), ".jpg"), ((3000, 2000), ".png")] * 2):
+    img = Image.new("RGB", size, tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(30):
+        x0, y0 = rng.randrange(size[0]), rng.randrange(size[1])
+        x1, y1 = x0 + rng.randrange(size[0] // 2), y0 + rng.randrange(size[1] // 2)
+        draw.ellipse([x0, y0, x1, y1], fill=tuple(rng.randrange(256) for _ in range(3)))
+    path = tmp / f"synthetic_{i}{ext}"
+    img.filter(ImageFilter.GaussianBlur(8)).save(path)
+    fast, full = perceptual_hash(path), perceptual_hash(path, fast=False)
+    bits = (int(fast, 16) ^ int(full, 16)).bit_count()
+    max_bits = max(max_bits, bits)
+    print(f"{path.name} {size}: fast={fast} full={full} diff={bits} bit(s)")
+shutil.rmtree(tmp)
+assert max_bits <= 2
+
+print("降分辨率感知哈希测试通过")
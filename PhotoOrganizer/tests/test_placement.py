@@ -0,0 +1,119 @@
+from pathlib import Path
+import errno
+import os
+import shutil
+import sys
+import tempfile
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+import piexif
+from PIL import Image, ImageDraw
+from photo_organizer.organizer import organize_photos
+import photo_organizer.placement as placement
+from photo_organizer.placement import PLACEMENT_MODES, PART_SUFFIX, place_file
+
+# 构造输入：精确重复（a / a_copy）、视觉重复（a 的低质量重存 b，拍摄时间更晚）、独立图片 c
+src_dir = Path(tempfile.mkdtemp())
+img = Image.new("RGB", (256, 192))
+draw = ImageDraw.Draw(img)
+for x in range(0, 256, 16):
+    draw.rectangle([x, 0, x + 8, 192], fill=(x, 255 - x, 128))
+exif_a = piexif.dump({"Exif": {piexif.ExifIFD.DateTimeOriginal: b"2023:04:01 10:00:00"}})
+exif_b = piexif.dump({"Exif": {piexif.ExifIFD.DateTimeOriginal: b"2023:04:02 10:00:00"}})
+img.save(src_dir / "a.jpg", quality=95, exif=exif_a)
+shutil.copy2(src_dir / "a.jpg", src_dir / "a_copy.jpg")
+img.save(src_dir / "b.jpg", quality=70, exif=exif_b)
+Image.linear_gradient("L").rotate(90).convert("RGB").save(src_dir / "c.png")
+
+
+def tree(root: Path) -> dict:
+    return {str(p.relative_to(root)): p.read_bytes() for p in sorted(root.rglob("*"))
+            if p.is_file() and not p.name.startswith(".photo_organizer_cache")}
+
+
+def relative_groups(groups, root: Path) -> list:
+    rel = lambda s: str(Path(s).relative_to(root))
+    return sorted((g["kind"], rel(g["keep"]), tuple(map(rel, g["dupes"]))) for g in groups)
+
+
+results = {}
+for mode in PLACEMENT_MODES:
+    root = Path(tempfile.mkdtemp())
+    inp = root / "input"
+    shutil.copytree(src_dir, inp)
+    out, dup = root / "out", root / "dup"
+    groups = organize_photos(inp, out, dup, mode=mode).review_groups
+    results[mode] = (tree(out), tree(dup), relative_groups(groups, root))
+    print(mode, sorted(results[mode][0]), sorted(results[mode][1]))
+
+    if mode == "hardlink":
+        kept = next(out.rglob("*.png"))
+        assert kept.stat().st_ino == (inp / "c.png").stat().st_ino
+    if mode == "move":
+        # 放置过的源文件都已被移走
+        assert not any(inp.iterdir()), list(inp.iterdir())
+    else:
+        assert len(list(inp.iterdir())) == 4
+
+    # 幂等：再次运行不产生新文件，分组不变
+    again = organize_photos(inp, out, dup, mode=mode).review_groups
+    assert (tree(out), tree(dup)) == results[mode][:2]
+    if mode != "move":
+        assert relative_groups(again, root) == results[mode][2]
+    shutil.rmtree(root)
+
+baseline = results["copy"]
+assert len(baseline[0]) == 2 and len(baseline[1]) == 2, baseline[:2]
+assert [g[0] for g in baseline[2]] == ["md5", "visual"]
+for mode in PLACEMENT_MODES:
+    assert results[mode] == baseline, mode
+
+# place_file 的各模式：内容一致、保留 mtime
+payload = os.urandom(300_000)
+tmp = Path(tempfile.mkdtemp())
+for mode in PLACEMENT_MODES:
+    src = tmp / f"src_{mode}.bin"
+    src.write_bytes(payload)
+    os.utime(src, ns=(1_600_000_000_000_000_000, 1_600_000_000_000_000_000))
+    dst = tmp / f"dst_{mode}.bin"
+    method = place_file(src, dst, mode)
+    print(mode, "->", method)
+    assert dst.read_bytes() == payload
+    assert dst.stat().st_mtime_ns == 1_600_000_000_000_000_000
+    assert src.exists() == (mode != "move")
+
+# 跨文件系统移动：复制结果与源文件不符时保留源文件、不留下目标与 .part
+real_rename, real_copy_file = os.rename, placement.copy_file
+
+
+def cross_device(a, b):
+    raise OSError(errno.EXDEV, "cross-device link")
+
+
+def short_copy(a, b):
+    real_copy_file(a, b)
+    os.truncate(b, 1000)
+    return "copy"
+
+
+src = tmp / "cross.bin"
+src.write_bytes(payload)
+os.rename, placement.copy_file = cross_device, short_copy
+try:
+    place_file(src, tmp / "cross_dst.bin", "move")
+except OSError as e:
+    assert e.errno == errno.EIO, e
+else:
+    raise AssertionError("a short cross-device copy must not delete the source")
+finally:
+    placement.copy_file = real_copy_file
+assert src.read_bytes() == payload
+assert not (tmp / "cross_dst.bin").exists() and not (tmp / f"cross_dst.bin{PART_SUFFIX}").exists()
+try:
+    assert place_file(src, tmp / "cross_dst.bin", "move") == "copy+unlink"
+finally:
+    os.rename = real_rename
+assert (tmp / "cross_dst.bin").read_bytes() == payload and not src.exists()
+
+shutil.rmtree(tmp)
+shutil.rmtree(src_dir)
+print("放置模式测试通过")
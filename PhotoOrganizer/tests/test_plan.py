@@ -0,0 +1,92 @@
+from pathlib import Path
+from contextlib import redirect_stdout
+import io
+import os
+import shutil
+import sys
+import tempfile
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from PIL import Image, ImageDraw
+import photo_organizer.plan as plan_mod
+from photo_organizer.organizer import organize_photos, plan_photos
+from photo_organizer.plan import OrganizePlan, apply_plan
+
+tmp = Path(tempfile.mkdtemp())
+
+
+def layout(root: Path):
+    """目录中的图片文件（不含缓存 / 日志等隐藏文件）"""
+    return sorted(str(p.relative_to(root)) for p in root.rglob("*") if p.is_file() and not p.name.startswith("."))
+
+
+# 输入：a / a_copy 完全相同，b 是 a 的低质量重存（视觉重复），另有若干独立图片分在两个子目录
+inp = tmp / "input"
+(inp / "x").mkdir(parents=True)
+(inp / "y").mkdir()
+img = Image.new("RGB", (256, 192))
+draw = ImageDraw.Draw(img)
+for x in range(0, 256, 16):
+    draw.rectangle([x, 0, x + 8, 192], fill=(x, 255 - x, 128))
+img.save(inp / "x" / "a.jpg", quality=95)
+shutil.copy2(inp / "x" / "a.jpg", inp / "y" / "a_copy.jpg")
+img.save(inp / "y" / "b.jpg", quality=70)
+for i in range(6):
+    Image.frombytes("RGB", (32, 32), os.urandom(32 * 32 * 3)).save(inp / "xy"[i % 2] / f"n_{i}.png")
+
+# 1. 规划不写任何文件（关闭缓存时输出目录都不会被创建）
+with redirect_stdout(io.StringIO()):
+    plan = plan_photos(inp, tmp / "out", tmp / "dup", use_cache=False)
+assert not (tmp / "out").exists() and not (tmp / "dup").exists()
+kinds = sorted(op.kind for op in plan.ops)
+assert kinds == ["dup", "out", "out", "out", "out", "out", "out", "out", "visual"], kinds
+assert set(plan.mkdirs) == {op.dst.parent for op in plan.ops}
+assert [g["kind"] for g in plan.review_groups] == ["md5", "visual"]
+
+# 2. 执行顺序按源文件位置：同一源目录相邻、目录内 inode 升序
+ordered = plan.ordered_ops()
+keys = [(str(op.src.parent), op.fingerprint[2]) for op in ordered]
+assert keys == sorted(keys)
+
+# 3. 保存 → 读取 → 执行，结果与一次完整运行相同；每个文件只放置一次，没有写了又删的文件
+plan.save(tmp / "plan.json")
+loaded = OrganizePlan.load(tmp / "plan.json")
+assert [op.to_dict() for op in loaded.ops] == [op.to_dict() for op in plan.ops]
+
+real_place = plan_mod.place_file
+written = []
+
+
+def recording_place(src, dst, mode):
+    written.append(Path(dst))
+    return real_place(src, dst, mode)
+
+
+plan_mod.place_file = recording_place
+try:
+    with redirect_stdout(io.StringIO()):
+        applied = apply_plan(loaded)
+        groups = organize_photos(inp, tmp / "ref_out", tmp / "ref_dup").review_groups
+finally:
+    plan_mod.place_file = real_place
+assert sum(applied.values()) == len(plan.ops) == 9
+assert all(p.exists() for p in written), "a placed file was removed again"
+assert len(written) == 18
+assert (layout(tmp / "out"), layout(tmp / "dup")) == (layout(tmp / "ref_out"), layout(tmp / "ref_dup"))
+assert [g["kind"] for g in groups] == [g["kind"] for g in plan.review_groups]
+for g in plan.review_groups:
+    assert Path(g["keep"]).exists() and all(Path(d).exists() for d in g["dupes"]), g
+
+# 4. 再次执行同一份计划：目标均已存在，全部跳过，不覆盖
+log = io.StringIO()
+with redirect_stdout(log):
+    applied = apply_plan(loaded)
+assert sum(applied.values()) == 0
+assert log.getvalue().count("[WARN] Target already exists") == 9
+
+# 5. 已整理好的图库上再规划：没有任何操作
+with redirect_stdout(io.StringIO()):
+    again = plan_photos(inp, tmp / "ref_out", tmp / "ref_dup")
+assert again.ops == [] and again.mkdirs == [] and again.stats["skipped_same"] == 9
+
+shutil.rmtree(tmp)
+print("规划 / 执行分离测试通过")
@@ -0,0 +1,121 @@
+from pathlib import Path
+from contextlib import redirect_stdout
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+import numpy as np
+from PIL import Image
+from photo_organizer.organizer import organize_photos
+from photo_organizer.compact_index import _HAS_DIGEST
+from photo_organizer.plan import OrganizePlan
+from photo_organizer.shard import build_shard, load_shard, merge_shards
+from photo_organizer.stats import RunStats
+
+CLI = Path(__file__).parent.parent / "script" / "run_organize.py"
+
+tmp = Path(tempfile.mkdtemp())
+root = tmp / "input"
+disks = [root / name for name in ("disk_a", "disk_b", "disk_c")]
+for disk in disks:
+    (disk / "sub").mkdir(parents=True)
+
+
+def noise(path: Path, size=(24, 18)):
+    Image.frombytes("RGB", size, os.urandom(size[0] * size[1] * 3)).resize((240, 180)).save(path)
+
+
+for k, disk in enumerate(disks):
+    for i in range(8):
+        noise(disk / ("sub" if i % 2 else ".") / f"img_{k}_{i}.png")
+# 分片内的精确重复；跨分片的精确重复（同名与不同名各一）；跨分片的视觉重复（重存的 JPEG）
+shutil.copy2(disks[0] / "img_0_0.png", disks[0] / "sub" / "img_0_0_copy.png")
+shutil.copy2(disks[0] / "img_0_2.png", disks[1] / "img_0_2.png")
+shutil.copy2(disks[2] / "img_2_4.png", disks[1] / "sub" / "other_name.png")
+ramp = np.tile(np.linspace(20, 160, 400), (300, 1)).astype("uint8")
+Image.fromarray(ramp).convert("RGB").save(disks[0] / "ramp.jpg", quality=95)
+Image.open(disks[0] / "ramp.jpg").save(disks[2] / "ramp_resave.jpg", quality=60)
+
+
+def tree(top: Path):
+    return {str(p.relative_to(top)): p.read_bytes() for p in top.rglob("*") if p.suffix in (".png", ".jpg")}
+
+
+# 1. 每块“盘”由一个独立进程写出分片（并发运行）
+shards = [tmp / "shards" / f"{disk.name}.npz" for disk in disks]
+procs = [subprocess.Popen([sys.executable, str(CLI), "--input", str(disk), "--shard", str(shard)],
+                          stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+         for disk, shard in zip(disks, shards)]
+for proc in procs:
+    out, _ = proc.communicate(timeout=300)
+    assert proc.returncode == 0, out
+    assert "[SHARD]" in out, out
+for shard, n in zip(shards, (10, 10, 9)):
+    arrays, meta = load_shard(shard)
+    assert meta["files"] == n and len(arrays["size"]) == n, (shard, meta)
+    assert shard.with_suffix(".cache.sqlite3").exists()
+assert not list((tmp / "shards").glob("*.tmp"))
+
+# 分片内照常走尺寸漏斗：只有分片内尺寸冲突者（disk_a 里的精确重复）才有完整摘要
+arrays, _ = load_shard(shards[0])
+has_digest = (arrays["flags"] & _HAS_DIGEST) != 0
+assert 2 <= has_digest.sum() < len(has_digest), has_digest
+
+# 重建分片：未变化的文件全部来自缓存，不再计算摘要 / pHash
+stats = RunStats()
+with redirect_stdout(io.StringIO()):
+    build_shard(disks[0], shards[0], stats=stats)
+assert stats.phases["digest"].files == 0 and stats.phases["phash"].files == 0
+assert stats.cache_hits == 10
+
+# 2. 合并：跨分片的精确 / 视觉重复都被识别，结果与一次整理全部输入完全相同
+with redirect_stdout(io.StringIO()):
+    ref_stats = organize_photos(root, tmp / "ref_out", tmp / "ref_dup", use_cache=False)
+log = subprocess.run([sys.executable, str(CLI), "--merge", *map(str, shards), "--output", str(tmp / "out"),
+                      "--duplicates", str(tmp / "dup"), "--dry-run", str(tmp / "plan.json")],
+                     capture_output=True, text=True, timeout=300)
+assert log.returncode == 0, log.stdout + log.stderr
+assert "Merged 3 shards: 29 images" in log.stdout, log.stdout
+assert not (tmp / "out").exists() or not tree(tmp / "out")  # --dry-run 只生成计划
+plan = OrganizePlan.load(tmp / "plan.json")
+assert plan.counts() == {"out": 25, "dup": 3, "visual": 1}, plan.counts()
+assert len(plan.header["shards"]) == 3
+
+log = subprocess.run([sys.executable, str(CLI), "--apply-plan", str(tmp / "plan.json")],
+                     capture_output=True, text=True, timeout=300)
+assert log.returncode == 0, log.stdout + log.stderr
+assert tree(tmp / "out") == tree(tmp / "ref_out")
+assert tree(tmp / "dup") == tree(tmp / "ref_dup")
+assert sorted(g["kind"] for g in plan.review_groups) == sorted(g["kind"] for g in ref_stats.review_groups)
+
+# 合并时只为跨分片才冲突的文件补算摘要（两对跨分片的精确重复），不是每个文件都读
+merge_stats = RunStats()
+with redirect_stdout(io.StringIO()):
+    merge_shards(shards, tmp / "m_out", tmp / "m_dup", use_cache=False, stats=merge_stats)
+assert 4 <= merge_stats.phases["digest"].files < 10, merge_stats.phases["digest"]
+
+# 3. 直接 --merge（不带 --dry-run）规划并执行，再次合并时一切都已就位
+for _ in range(2):
+    log = subprocess.run([sys.executable, str(CLI), "--merge", *map(str, shards), "--output", str(tmp / "out2"),
+                          "--duplicates", str(tmp / "dup2")], capture_output=True, text=True, timeout=300)
+    assert log.returncode == 0, log.stdout + log.stderr
+assert "skipped_same=29" in log.stdout, log.stdout
+assert tree(tmp / "out2") == tree(tmp / "ref_out")
+
+# 4. 重叠的分片（同一子树扫描两次）与摘要算法不一致的分片被拒绝
+with redirect_stdout(io.StringIO()):
+    build_shard(disks[1] / "sub", tmp / "shards" / "nested.npz")
+    build_shard(disks[2], tmp / "shards" / "sha1.npz", hash_algo="sha1")
+for bad in ([shards[1], tmp / "shards" / "nested.npz"], [shards[0], tmp / "shards" / "sha1.npz"]):
+    try:
+        merge_shards(bad, tmp / "bad_out", tmp / "bad_dup")
+    except ValueError as e:
+        print("rejected:", e)
+    else:
+        raise AssertionError(f"merge of {bad} should fail")
+
+shutil.rmtree(tmp)
+print("分片整理测试通过")
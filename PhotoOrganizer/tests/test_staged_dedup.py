@@ -0,0 +1,46 @@
+from pathlib import Path
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from photo_organizer.record import PhotoRecord
+from photo_organizer.digest import md5sum, edge_hash, DigestIndex
+
+# 构造测试文件：尺寸唯一 / 同尺寸仅中间不同 / 同尺寸首尾不同 / 完全重复
+tmp = Path(tempfile.mkdtemp())
+block = 1 << 16
+base = os.urandom(block * 4)
+files = {
+    "unique.bin": os.urandom(1234),
+    "a.bin": base,
+    "a_copy.bin": base,
+    "mid_diff.bin": base[:block * 2] + b"x" + base[block * 2 + 1:],
+    "tail_diff.bin": base[:-1] + b"x",
+}
+index = DigestIndex()
+for i, (name, data) in enumerate(files.items()):
+    (tmp / name).write_bytes(data)
+    rec = PhotoRecord(tmp / name)
+    rec.date = datetime(2025, 1, 1 + i)
+    index.add(rec)
+
+edge_todo = index.needs_edge_hash()
+for rec in edge_todo:
+    rec.edge = edge_hash(rec.path)
+full_todo = index.needs_full_hash()
+for rec in full_todo:
+    rec.digest = md5sum(rec.path)
+
+print("edge-hashed:", sorted(r.name for r in edge_todo))
+print("fully hashed:", sorted(r.name for r in full_todo))
+assert "unique.bin" not in {r.name for r in edge_todo}
+assert sorted(r.name for r in full_todo) == ["a.bin", "a_copy.bin", "mid_diff.bin"]
+
+groups = {keep.name: sorted(d.name for d in dupes) for keep, dupes in index.get_deduplicated()}
+print(groups)
+assert groups == {"unique.bin": [], "a.bin": ["a_copy.bin"], "mid_diff.bin": [], "tail_diff.bin": []}
+
+shutil.rmtree(tmp)
+print("分级去重测试通过")
@@ -0,0 +1,113 @@
+from pathlib import Path
+from contextlib import redirect_stdout
+import io
+import json
+import os
+import pstats
+import shutil
+import subprocess
+import sys
+import tempfile
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from PIL import Image
+import photo_organizer.organizer as organizer
+from photo_organizer.organizer import organize_photos
+from photo_organizer.stats import RunStats
+
+tmp = Path(tempfile.mkdtemp())
+PHASES = ["scan", "meta", "edge", "digest", "phash", "visual", "decide", "apply"]
+
+# 输入：20 张独立图片 + 2 个精确重复
+inp = tmp / "input"
+inp.mkdir()
+for i in range(20):
+    Image.frombytes("RGB", (32, 32), os.urandom(32 * 32 * 3)).save(inp / f"img_{i:02d}.png")
+shutil.copy2(inp / "img_00.png", inp / "img_00_copy.png")
+shutil.copy2(inp / "img_01.png", inp / "img_01_copy.png")
+total_bytes = sum(p.stat().st_size for p in inp.iterdir())
+
+# 1. 首次运行：各阶段都有计量，放置的字节数与输出一致，每个阶段一份可读取的 pstats
+out, dup, prof = tmp / "out", tmp / "dup", tmp / "prof"
+with redirect_stdout(io.StringIO()):
+    stats = organize_photos(inp, out, dup, profile_dir=prof)
+assert isinstance(stats, RunStats)
+assert list(stats.phases) == PHASES, list(stats.phases)
+assert stats.files == 22
+assert stats.counts == {"total": 22, "kept_md5": 20, "dupe_md5": 2, "dupe_visual": 0, "skipped_same": 0}
+assert [g["kind"] for g in stats.review_groups] == ["md5", "md5"]
+assert stats.phases["apply"].files == 22
+assert stats.phases["apply"].bytes_written == total_bytes
+assert stats.phases["digest"].bytes_read > 0  # 两组重复都要完整读取
+assert stats.cache_hits == 0
+assert all(ph.wall >= 0 and ph.cpu >= 0 for ph in stats.phases.values())
+assert stats.wall >= sum(ph.wall for ph in stats.phases.values())
+for name in PHASES:
+    pstats.Stats(str(prof / f"{name}.pstats"))
+
+# 同名阶段多次进入：profile 累加到同一份 pstats，而不是被后一次覆盖
+def first_pass():
+    return sum(range(1000))
+
+
+def second_pass():
+    return sum(range(1000))
+
+
+multi = RunStats(tmp / "prof_multi")
+with multi.phase("digest"):
+    first_pass()
+with multi.phase("digest"):
+    second_pass()
+profiled = {func for _, _, func in pstats.Stats(str(tmp / "prof_multi" / "digest.pstats")).stats}
+assert {"first_pass", "second_pass"} <= profiled, profiled
+
+# 2. 重复运行：全部命中缓存，不再读取或写入
+with redirect_stdout(io.StringIO()):
+    again = organize_photos(inp, out, dup)
+assert again.cache_hits >= 22 and again.counts["skipped_same"] == 22
+assert again.bytes_written == 0 and again.phases["phash"].files == 0
+assert not any(p.suffix == ".pstats" for p in out.rglob("*"))
+
+# 3. 命令行 --stats-json：与返回值同样的结构
+stats_json = tmp / "stats.json"
+script = Path(__file__).parent.parent / "script" / "run_organize.py"
+res = subprocess.run([sys.executable, str(script), "--input", str(inp), "--output", str(tmp / "cli_out"),
+                      "--duplicates", str(tmp / "cli_dup"), "--stats-json", str(stats_json)],
+                     capture_output=True, text=True, check=True)
+assert "[STATS] apply" in res.stdout
+data = json.loads(stats_json.read_text())
+assert list(data["phases"]) == PHASES
+assert data["files"] == 22 and data["bytes_written"] == total_bytes
+assert data["counts"]["kept_md5"] == 20 and data["cache"]["hits"] == 0
+
+# 4. 执行中出错：缓存照样提交并关闭，计量记下结束时间
+closed = []
+
+
+class TrackedCache(organizer.DigestCache):
+    def close(self):
+        super().close()
+        closed.append(self)
+
+
+def failing_apply(*args, **kwargs):
+    raise RuntimeError("disk full")
+
+
+real_cache, real_apply = organizer.DigestCache, organizer.apply_plan
+organizer.DigestCache, organizer.apply_plan = TrackedCache, failing_apply
+try:
+    with redirect_stdout(io.StringIO()):
+        organize_photos(inp, tmp / "fail_out", tmp / "fail_dup")
+except RuntimeError:
+    pass
+else:
+    raise AssertionError("apply_plan error should propagate")
+finally:
+    organizer.DigestCache, organizer.apply_plan = real_cache, real_apply
+assert len(closed) == 1
+with real_cache(tmp / "fail_out" / organizer.CACHE_FILENAME) as cache:
+    assert len(cache) == 22
+
+shutil.rmtree(tmp)
+print("分阶段计量与性能剖析测试通过")
@@ -0,0 +1,92 @@
+from pathlib import Path
+from datetime import datetime
+from itertools import permutations
+import shutil
+import sys
+import tempfile
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from PIL import Image, ImageDraw
+from photo_organizer.digest import DigestIndex, edge_hash, md5sum
+from photo_organizer.organizer import organize_photos
+from photo_organizer.record import PhotoRecord
+from photo_organizer.streaming import StreamingOrganizer, organize_streaming
+
+# 构造输入：a / a_copy 完全相同，b 是 a 的低质量重存（视觉重复），c 独立
+src_dir = Path(tempfile.mkdtemp())
+img = Image.new("RGB", (256, 192))
+draw = ImageDraw.Draw(img)
+for x in range(0, 256, 16):
+    draw.rectangle([x, 0, x + 8, 192], fill=(x, 255 - x, 128))
+img.save(src_dir / "a.jpg", quality=95)
+shutil.copy2(src_dir / "a.jpg", src_dir / "a_copy.jpg")
+img.save(src_dir / "b.jpg", quality=70)
+Image.linear_gradient("L").rotate(90).convert("RGB").save(src_dir / "c.png")
+dates = {"a.jpg": datetime(2023, 4, 3), "a_copy.jpg": datetime(2023, 4, 1),
+         "b.jpg": datetime(2023, 4, 2), "c.png": datetime(2023, 5, 1)}
+
+
+def make_records(names):
+    recs = []
+    for name in names:
+        rec = PhotoRecord(src_dir / name)
+        rec.date = dates[name]
+        recs.append(rec)
+    return recs
+
+
+# 期望结果：分阶段索引给出的最终主图
+index = DigestIndex()
+for rec in make_records(sorted(dates)):
+    index.add(rec)
+for rec in index.needs_edge_hash():
+    rec.edge = edge_hash(rec.path)
+for rec in index.needs_full_hash():
+    rec.digest = md5sum(rec.path)
+keeps = [keep for keep, _ in index.get_deduplicated()]
+for keep in keeps:
+    index.add_phash(keep)
+visual_dupes = {r.name for dupes in index.get_visual_duplicates_map().values() for r in dupes}
+expected_out = {k.name for k in keeps} - visual_dupes
+print("expected output:", sorted(expected_out))
+assert expected_out == {"a_copy.jpg", "c.png"}
+
+# 任意到达顺序下，流式决策（含主图替换 / 降级）都得到同样的结果
+for order in permutations(sorted(dates)):
+    root = Path(tempfile.mkdtemp())
+    streamer = StreamingOrganizer(root / "out", root / "dup")
+    streamer.start()
+    streamer.feed(make_records(order))
+    streamer.finish()
+    out_files = sorted(p for p in (root / "out").rglob("*") if p.is_file())
+    dup_files = sorted(p for p in (root / "dup").rglob("*") if p.is_file())
+    final_out = {rec.name for rec, (_, where, _) in streamer.location.items() if where == "out"}
+    assert final_out == expected_out, (order, final_out)
+    # 精确重复放置后即被释放：只剩 3 个主图的记录，组里留下的是最终路径
+    assert len(streamer.location) == 3, (order, streamer.location)
+    dupes = [d for g in streamer.groups for d in g.dupes]
+    assert dupes == [str(root / "dup" / "a.jpg")], (order, dupes)
+    assert len(out_files) == 2 and len(dup_files) == 2, (order, out_files, dup_files)
+    kinds = sorted(g["kind"] for g in streamer.review_groups())
+    assert kinds == ["md5", "visual"], (order, kinds)
+    for g in streamer.review_groups():
+        assert Path(g["keep"]).exists() and all(Path(d).exists() for d in g["dupes"]), g
+    shutil.rmtree(root)
+print("all 24 arrival orders agree")
+
+# 端到端：与 organize_photos 的输出完全一致，且可重复运行（幂等）
+def tree(root: Path) -> dict:
+    return {str(p.relative_to(root)): p.read_bytes() for p in root.rglob("*")
+            if p.is_file() and not p.name.startswith(".photo_organizer_cache")}
+
+
+batch_root, stream_root = Path(tempfile.mkdtemp()), Path(tempfile.mkdtemp())
+organize_photos(src_dir, batch_root / "out", batch_root / "dup")
+for _ in range(2):
+    groups = organize_streaming(src_dir, stream_root / "out", stream_root / "dup", workers=3)
+    assert tree(stream_root) == tree(batch_root)
+assert [g["kind"] for g in groups] == ["md5", "visual"]
+
+shutil.rmtree(batch_root)
+shutil.rmtree(stream_root)
+shutil.rmtree(src_dir)
+print("流式整理测试通过")
@@ -0,0 +1,81 @@
+from pathlib import Path
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+import piexif
+from PIL import Image
+import photo_organizer.thumbnails as thumbnails
+from photo_organizer.thumbnails import ThumbnailCache, make_thumbnail
+
+tmp = Path(tempfile.mkdtemp())
+
+
+def decode(data: bytes) -> Image.Image:
+    img = Image.open(io.BytesIO(data))
+    img.load()
+    return img
+
+
+# 1. 带 EXIF 内嵌缩略图的 JPEG：直接使用内嵌图（内嵌图为纯红、原图为纯蓝，可区分），并按 Orientation 摆正
+thumb_buf = io.BytesIO()
+Image.new("RGB", (320, 240), (255, 0, 0)).save(thumb_buf, "JPEG")
+exif = piexif.dump({"0th": {piexif.ImageIFD.Orientation: 6}, "Exif": {}, "GPS": {},
+                    "1st": {piexif.ImageIFD.JPEGInterchangeFormat: 0, piexif.ImageIFD.JPEGInterchangeFormatLength: 0},
+                    "thumbnail": thumb_buf.getvalue()})
+Image.new("RGB", (4000, 3000), (0, 0, 255)).save(tmp / "with_thumb.jpg", quality=90, exif=exif)
+t = decode(make_thumbnail(tmp / "with_thumb.jpg"))
+assert t.size == (240, 320), t.size  # 旋转 90°
+r, g, b = t.getpixel((120, 160))
+assert r > 200 and b < 60, (r, g, b)
+
+# 2. 无内嵌缩略图：降分辨率解码，最长边为 THUMB_SIZE，宽高比不变；PNG 同样可用
+Image.new("RGB", (6000, 4000), (0, 200, 0)).save(tmp / "plain.jpg", quality=90)
+Image.new("RGB", (900, 300), (10, 20, 30)).save(tmp / "plain.png")
+t = decode(make_thumbnail(tmp / "plain.jpg"))
+assert t.size == (thumbnails.THUMB_SIZE, thumbnails.THUMB_SIZE * 2 // 3), t.size
+t = decode(make_thumbnail(tmp / "plain.png"))
+assert t.size == (thumbnails.THUMB_SIZE, thumbnails.THUMB_SIZE // 3), t.size
+
+# 3. 内存 LRU + 磁盘缓存：新实例从磁盘读取，不再生成；文件修改后重新生成
+cache_dir = tmp / "cache"
+cache = ThumbnailCache(cache_dir, memory_items=2)
+first = cache.get(tmp / "plain.jpg")
+assert cache.get(tmp / "plain.jpg") == first
+assert (cache.generated, cache.memory_hits) == (1, 1)
+cache.get(tmp / "plain.png")
+cache.get(tmp / "with_thumb.jpg")
+assert not cache.cached(tmp / "plain.jpg")  # 超出 2 张被淘汰
+
+cache2 = ThumbnailCache(cache_dir)
+assert cache2.get(tmp / "plain.jpg") == first
+assert (cache2.generated, cache2.disk_hits) == (0, 1)
+st = (tmp / "plain.jpg").stat()
+os.utime(tmp / "plain.jpg", ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+cache2.get(tmp / "plain.jpg")
+assert cache2.generated == 1
+
+# 4. 后台预取：重复提交只生成一次，预取后的读取不做 I/O，远低于 50 ms
+big = []
+for i in range(6):
+    path = tmp / f"big_{i}.jpg"
+    Image.frombytes("RGB", (160, 120), os.urandom(160 * 120 * 3)).resize((4000, 3000)).save(path, quality=90)
+    big.append(path)
+cache3 = ThumbnailCache(tmp / "cache3", workers=3)
+cache3.prefetch(big)
+cache3.prefetch(big + [tmp / "missing.jpg"])
+cache3.wait()
+assert cache3.generated == 6 and all(cache3.cached(p) for p in big)
+t0 = time.perf_counter()
+for p in big:
+    cache3.get(p)
+per_get = (time.perf_counter() - t0) / len(big)
+print(f"cached get: {per_get * 1e3:.2f} ms")
+assert per_get < 0.05
+cache3.close()
+
+shutil.rmtree(tmp)
+print("缩略图缓存测试通过")
@@ -0,0 +1,79 @@
+from pathlib import Path
+from contextlib import redirect_stdout
+from datetime import datetime
+import io
+import os
+import shutil
+import sys
+import tempfile
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+import numpy as np
+from PIL import Image
+import photo_organizer.organizer as organizer
+from photo_organizer.digest import DigestIndex, confirm_hash, confirm_match, perceptual_hash
+from photo_organizer.record import PhotoRecord
+
+tmp = Path(tempfile.mkdtemp())
+inp = tmp / "input"
+inp.mkdir()
+
+# a：水平渐变；a_resave：a 的低质量重存（真正的视觉重复）；
+# banded：每行仍从左到右变亮（dHash 与 a 完全相同），但上下分成明暗条带，画面不同；
+# squashed：a 拉伸成竖幅（dHash 相同，宽高比不同）
+ramp = np.tile(np.linspace(20, 160, 400), (300, 1))
+Image.fromarray(ramp.astype("uint8")).convert("RGB").save(inp / "a.jpg", quality=95)
+Image.open(inp / "a.jpg").save(inp / "a_resave.jpg", quality=60)
+banded = ramp.copy()
+banded[75:150] += 80
+banded[225:] += 80
+Image.fromarray(np.clip(banded, 0, 255).astype("uint8")).convert("RGB").save(inp / "banded.jpg", quality=95)
+Image.open(inp / "a.jpg").resize((300, 400)).save(tmp / "squashed.jpg", quality=95)
+for i in range(30):
+    Image.frombytes("RGB", (32, 24), os.urandom(32 * 24 * 3)).resize((320, 240)).save(inp / f"unique_{i:02d}.png")
+
+paths = {name: inp / f"{name}.jpg" for name in ("a", "a_resave", "banded")}
+paths["squashed"] = tmp / "squashed.jpg"
+assert len({perceptual_hash(p) for p in paths.values()}) == 1  # 单靠 dHash 四张都是“重复”
+
+# 1. 复核签名：重存通过；条带图被 wHash 否决；拉伸图被宽高比否决
+sig = {name: confirm_hash(p, "whash") for name, p in paths.items()}
+assert sig["a"].startswith("400x300:") and sig["squashed"].startswith("300x400:")
+assert confirm_match(sig["a"], sig["a_resave"])
+assert not confirm_match(sig["a"], sig["banded"]), (sig["a"], sig["banded"])
+assert not confirm_match(sig["a"], sig["squashed"])
+assert confirm_match(confirm_hash(paths["a"]), confirm_hash(paths["a_resave"]))  # 默认 pHash
+assert not confirm_match("", sig["a"]) and confirm_hash(tmp / "missing.jpg") == ""
+
+# 2. DigestIndex：候选组按复核签名细分，组首为最早拍摄者
+index = DigestIndex()
+recs = {}
+for day, name in enumerate(("banded", "a_resave", "a", "squashed"), 1):
+    rec = recs[name] = PhotoRecord(paths[name])
+    rec.date = datetime(2024, 1, day)
+    index.add_phash(rec)
+assert [len(g) for g in index.visual_candidates()] == [4]
+assert index.get_visual_duplicates_map() == {recs["banded"]: [recs["a_resave"], recs["a"], recs["squashed"]]}
+confirmed = index.get_visual_duplicates_map(confirm={r: sig[n] for n, r in recs.items()})
+assert confirmed == {recs["a_resave"]: [recs["a"]]}, confirmed
+
+# 3. 完整运行：复核哈希只为候选图片计算，唯一图片一张都不算；结果中条带图留在输出目录
+calls = []
+real_confirm = organizer.confirm_hash
+organizer.confirm_hash = lambda path, method="phash": calls.append(path) or real_confirm(path, method)
+try:
+    log = io.StringIO()
+    with redirect_stdout(log):
+        plain = organizer.organize_photos(inp, tmp / "out_plain", tmp / "dup_plain").review_groups
+        cascade = organizer.organize_photos(inp, tmp / "out", tmp / "dup", visual_confirm="whash").review_groups
+finally:
+    organizer.confirm_hash = real_confirm
+assert sorted(p.name for p in calls) == ["a.jpg", "a_resave.jpg", "banded.jpg"], calls
+assert "3 of 33 images were dHash candidates" in log.getvalue()
+assert [g["kind"] for g in plain] == ["visual"] and len(plain[0]["dupes"]) == 2
+assert [g["kind"] for g in cascade] == ["visual"] and len(cascade[0]["dupes"]) == 1
+assert len(list((tmp / "out_plain").rglob("*.*g"))) == 31
+assert len(list((tmp / "out").rglob("*.*g"))) == 32
+assert any("banded" in p.name for p in (tmp / "out").rglob("*.jpg"))
+
+shutil.rmtree(tmp)
+print("视觉去重级联测试通过")
@@ -0,0 +1,42 @@
+from pathlib import Path
+import os
+import shutil
+import sys
+import tempfile
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from photo_organizer import walker
+from photo_organizer.walker import walk_images
+
+# 构造目录树：多层子目录、大小写扩展名、非图片、被排除的 output / duplicates 子树
+root = Path(tempfile.mkdtemp())
+expected = set()
+for d in ["", "a", "a/b", "a/b/c", "z"]:
+    (root / d).mkdir(parents=True, exist_ok=True)
+    for name in ["x.jpg", "Y.JPEG", "z.Png"]:
+        (root / d / name).write_bytes(b"img")
+        expected.add(root / d / name)
+    (root / d / "notes.txt").write_text("skip")
+for d in ["output/2025/01", "duplicates"]:
+    (root / d).mkdir(parents=True)
+    (root / d / "kept.jpg").write_bytes(b"img")
+os.symlink(root / "a", root / "link_to_a")  # 目录链接不跟随
+
+# 记录 scandir 访问过的目录，确认被排除的子树完全没有进入
+visited = []
+real_scandir = os.scandir
+walker.os.scandir = lambda p: (visited.append(p), real_scandir(p))[1]
+
+exclude = [root / "output", root / "duplicates"]
+serial = list(walk_images(root, exclude=exclude))
+parallel = list(walk_images(root, exclude=exclude, threads=4))
+walker.os.scandir = real_scandir
+
+print(f"{len(serial)} images, {len(visited)} directory scans")
+assert {p for p, _ in serial} == expected
+assert [p for p, _ in serial] == [p for p, _ in parallel]  # 顺序与线程数无关
+assert not any("output" in p or "duplicates" in p or "link_to_a" in p for p in visited)
+for p, st in serial:
+    assert st.st_size == 3 and st.st_ino == p.stat().st_ino
+
+shutil.rmtree(root)
+print("目录遍历测试通过")
@@ -0,0 +1,167 @@
+from pathlib import Path
+from contextlib import redirect_stdout
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from PIL import Image
+import photo_organizer.streaming as streaming
+from photo_organizer.cache import DigestCache, CACHE_FILENAME
+from photo_organizer.watch import InboxWatcher, watch_photos, WATCH_STATE_FILENAME
+
+tmp = Path(tempfile.mkdtemp())
+inbox = tmp / "inbox"
+inbox.mkdir()
+
+
+def make(name: str, n: int = 16):
+    Image.frombytes("RGB", (n, n), os.urandom(n * n * 3)).save(inbox / name)
+
+
+# 1. 防抖：签名连续 settle 秒不变才交出；交出后不再重复；改动后重新交出；消失的文件被忘掉
+make("a.png")
+w = InboxWatcher(inbox, settle=5.0)
+assert w.poll(now=100.0) == [] and w.n_pending == 1
+assert w.poll(now=103.0) == []
+with open(inbox / "a.png", "ab") as f:  # 仍在写入：签名变化，重新计时
+    f.write(b"\0" * 10)
+assert w.poll(now=104.0) == []
+assert w.poll(now=108.0) == []
+assert [r.path.name for r in w.poll(now=109.0)] == ["a.png"]
+assert w.poll(now=200.0) == []
+st = (inbox / "a.png").stat()
+os.utime(inbox / "a.png", ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+assert w.poll(now=201.0) == [] and [r.path.name for r in w.poll(now=206.0)] == ["a.png"]
+(inbox / "a.png").unlink()
+assert w.poll(now=300.0) == [] and w.n_pending == 0 and not w._seen
+
+# 已交出的集合可持久化：新的监视器读回后不再交出未变的文件；消失的文件在保存时一并删去
+state = tmp / "state.json"
+make("b.png")
+make("c.png")
+w = InboxWatcher(inbox, settle=0.0, state_path=state)
+assert len(w.poll(now=0.0)) == 2
+w.save_state()
+w = InboxWatcher(inbox, settle=0.0, state_path=state)
+assert w.poll(now=1.0) == []
+(inbox / "b.png").unlink()
+make("d.png")
+assert [r.path.name for r in w.poll(now=2.0)] == ["d.png"]
+w.save_state()
+assert sorted(rel for rel, _, _ in json.loads(state.read_text())["seen"]) == ["c.png", "d.png"]
+assert InboxWatcher(tmp / "other", state_path=state)._seen == {}  # 属于另一个收件目录的状态被忽略
+for name in ("c.png", "d.png"):
+    (inbox / name).unlink()
+
+# 2. 持续整理：已有文件作为第一批；之后每批只处理新来的文件（pHash 调用次数 = 批大小）
+for i in range(20):
+    make(f"old_{i:02d}.png")
+shutil.copy2(inbox / "old_00.png", inbox / "old_00_copy.png")
+
+phash_calls = []
+real_phash = streaming.perceptual_hash
+streaming.perceptual_hash = lambda path: phash_calls.append(path) or real_phash(path)
+
+batches = []
+batch_seen = threading.Event()
+
+
+def on_batch(batch):
+    batches.append(sorted(r.path.name for r in batch))
+    batch_seen.set()
+
+
+stop = threading.Event()
+result = {}
+log = io.StringIO()
+
+
+def run():
+    with redirect_stdout(log):
+        result["groups"] = watch_photos(inbox, tmp / "out", tmp / "dup", interval=0.05, settle=0.2,
+                                        stop=stop, on_batch=on_batch)
+
+
+t = threading.Thread(target=run)
+t.start()
+assert batch_seen.wait(10)
+assert len(batches[0]) == 21 and len(phash_calls) == 21
+assert len(list((tmp / "out").rglob("*.png"))) == 20 and len(list((tmp / "dup").rglob("*.png"))) == 1
+
+batch_seen.clear()
+phash_calls.clear()
+# 在旁边准备好再整体改名进来，保证三张落在同一次轮询里
+staging = tmp / "staging"
+staging.mkdir()
+for name in ("new_0.png", "new_1.png"):
+    Image.frombytes("RGB", (16, 16), os.urandom(16 * 16 * 3)).save(staging / name)
+shutil.copy2(inbox / "old_05.png", staging / "old_05_copy.png")
+os.rename(staging, inbox / "phone")
+assert batch_seen.wait(10)
+assert batches[1] == ["new_0.png", "new_1.png", "old_05_copy.png"], batches
+assert len(phash_calls) == 3, phash_calls
+assert len(list((tmp / "out").rglob("*.png"))) == 22 and len(list((tmp / "dup").rglob("*.png"))) == 2
+
+# 没有新文件时不产生批次
+time.sleep(0.5)
+assert len(batches) == 2
+stop.set()
+t.join(10)
+assert not t.is_alive()
+streaming.perceptual_hash = real_phash
+
+groups = result["groups"]
+assert groups.counts() == {"md5": 2, "visual": 0}, groups
+out = log.getvalue()
+assert "[WATCH] batch: 3 new, placed=3" in out and "[SUMMARY] total=24" in out, out
+
+# 3. 每批结束即写入缓存：丢失监视状态后重启，第一批全部命中缓存、全部按已整理跳过
+with DigestCache(tmp / "out" / CACHE_FILENAME) as cache:
+    assert len(cache) >= 24
+(tmp / "out" / WATCH_STATE_FILENAME).unlink()
+stop = threading.Event()
+batches.clear()
+batch_seen.clear()
+log = io.StringIO()
+t = threading.Thread(target=run)
+t.start()
+assert batch_seen.wait(10)
+stop.set()
+t.join(10)
+assert len(batches[0]) == 24
+assert "placed=0, skipped_same=24" in log.getvalue(), log.getvalue()
+assert "cache_hits=0," not in log.getvalue()
+
+# 4. 监视状态保留时重启：已处理的文件只重放决策（不放置、不成批），新来的文件照样与它们去重
+n_out, n_dup = len(list((tmp / "out").rglob("*.png"))), len(list((tmp / "dup").rglob("*.png")))
+stop = threading.Event()
+batches.clear()
+batch_seen.clear()
+log = io.StringIO()
+t = threading.Thread(target=run)
+t.start()
+time.sleep(0.5)
+assert batches == [], batches
+staging = tmp / "staging2"
+staging.mkdir()
+Image.frombytes("RGB", (16, 16), os.urandom(16 * 16 * 3)).save(staging / "later.png")
+shutil.copy2(inbox / "old_07.png", staging / "old_07_from_phone.png")  # 换了名字的精确重复
+os.rename(staging, inbox / "phone2")
+assert batch_seen.wait(10)
+stop.set()
+t.join(10)
+assert batches == [["later.png", "old_07_from_phone.png"]], batches
+assert len(list((tmp / "out").rglob("*.png"))) == n_out + 1, log.getvalue()
+assert len(list((tmp / "dup").rglob("*.png"))) == n_dup + 1, log.getvalue()
+assert (tmp / "dup" / "old_07_from_phone.png").exists()
+out = log.getvalue()
+assert "[WATCH] restored dedup state from 24 previously processed files" in out, out
+assert "[SUMMARY] total=2," in out and "placed=2, skipped_same=0" in out, out
+
+shutil.rmtree(tmp)
+print("监视模式测试通过")